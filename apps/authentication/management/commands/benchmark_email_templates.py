@@ -0,0 +1,118 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.template import Context
+from django.template.loader import render_to_string
+from core.base.benchmark import benchmark_metadata, compare_metrics, load_results, percentiles, write_results
+from core.mail.templates import email_renderer
+
+
+# Templates sent by core.mail.tasks with typical contexts
+EMAILS = {
+    'emails/verification_email.html': {
+        'username': 'benchmark_user',
+        'verification_code': '123456',
+        'verification_url': 'https://example.com/verify-email',
+    },
+    'emails/password_reset_email.html': {
+        'username': 'benchmark_user',
+        'reset_code': '654321',
+        'reset_url': 'https://example.com/reset-password',
+    },
+    'emails/welcome_email.html': {
+        'username': 'benchmark_user',
+        'login_url': 'https://example.com/login',
+    },
+}
+
+COMMON_CONTEXT = {
+    'frontend_url': 'https://example.com',
+    'support_url': 'https://example.com/support',
+}
+
+# render_to_string: Django template loading per call; compiled: engine with cached templates;
+# layout: compiled + prerendered layout (what core.mail.tasks uses)
+MODES = ['render_to_string', 'compiled', 'layout']
+
+# Metrics printed by --compare (lower is better for all of them)
+COMPARED_METRICS = [f'results.{mode}.{metric}' for mode in MODES for metric in ('us_per_render', 'us.p99')]
+
+
+class Command(BaseCommand):
+    help = (
+        'Micro-benchmark email template rendering: render_to_string against templates '
+        'compiled once and rendering with the prerendered layout. Checks that all modes '
+        'produce the same HTML; results can be saved and compared across commits.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000, help='Renders per template and mode')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--compare', help='Results JSON of a previous run to compare with')
+
+    def handle(self, *args, **options):
+        email_renderer.clear()
+        email_renderer.warm()
+        renderers = {
+            'render_to_string': render_to_string,
+            'compiled': lambda name, context: email_renderer.engine.get_template(name).render(Context(context)),
+            'layout': email_renderer.render,
+        }
+
+        for name, context in EMAILS.items():
+            expected = render_to_string(name, {**context, **COMMON_CONTEXT})
+            for mode in MODES[1:]:
+                if renderers[mode](name, {**context, **COMMON_CONTEXT}) != expected:
+                    raise CommandError(f'{mode} renders {name} differently from render_to_string')
+
+        results = {}
+        for mode in MODES:
+            timings = []
+            for _ in range(options['iterations']):
+                for name, context in EMAILS.items():
+                    context = {**context, **COMMON_CONTEXT}
+                    started = time.perf_counter()
+                    renderers[mode](name, context)
+                    timings.append((time.perf_counter() - started) * 1e6)
+            results[mode] = {
+                'renders': len(timings),
+                'us_per_render': sum(timings) / len(timings),
+                'us': percentiles(timings),
+            }
+        baseline = results['render_to_string']['us_per_render']
+        for mode in MODES:
+            results[mode]['speedup'] = baseline / results[mode]['us_per_render']
+
+        report = {
+            'benchmark': 'email_templates',
+            'metadata': benchmark_metadata(),
+            'params': {'iterations': options['iterations'], 'templates': sorted(EMAILS)},
+            'results': results,
+        }
+        self.print_report(report)
+        if options['output']:
+            write_results(options['output'], report)
+            self.stdout.write(f"Results written to {options['output']}")
+        if options['compare']:
+            self.print_comparison(report, load_results(options['compare']))
+
+    def print_report(self, report):
+        git = report['metadata']['git'] or {}
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Email template benchmark @ {git.get('commit', 'unknown')[:12]} "
+            f"({report['params']['iterations']} iterations x {len(report['params']['templates'])} templates)"
+        ))
+        for mode, result in report['results'].items():
+            self.stdout.write(
+                f"  {mode:<18} {result['us_per_render']:>8.1f} us/render "
+                f"(p50 {result['us']['p50']:.1f}, p99 {result['us']['p99']:.1f}), "
+                f"speedup x{result['speedup']:.1f}"
+            )
+
+    def print_comparison(self, report, baseline):
+        if baseline.get('params') != report['params']:
+            self.stdout.write(self.style.WARNING('Baseline was run with different parameters'))
+        base_commit = ((baseline.get('metadata') or {}).get('git') or {}).get('commit', 'unknown')
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Compared with {base_commit[:12]}'))
+        for key, old, new, change in compare_metrics(report, baseline, COMPARED_METRICS):
+            change = f'{change:+.1f}%' if change is not None else 'n/a'
+            self.stdout.write(f'  {key.split(".", 1)[1]:<32} {old:>10.2f} -> {new:>10.2f}  {change}')
@@ -0,0 +1,109 @@
+import logging
+from django.conf import settings
+from redis.exceptions import RedisError
+from core.redis.client import redis_client
+from .models import ChatRoom
+
+logger = logging.getLogger(__name__)
+
+
+# Store a loaded participant set only if the room was not invalidated since the load started
+FILL_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('SADD', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+class RoomMembershipCache:
+    """
+    Cached participant sets of chat rooms.
+
+    A room's set is loaded with one query on the first check and reused until
+    participants change (invalidated from apps.chat.signals) or the TTL runs
+    out. A sentinel member marks a loaded set, so rooms without participants
+    and missing rooms are cached too. Invalidation bumps a per-room
+    generation; a set loaded while the generation changed is not stored, so
+    a removed participant is never written back.
+    """
+
+    SENTINEL = '-'
+
+    def __init__(self):
+        self._fill = None
+
+    @property
+    def enabled(self):
+        return settings.WS_AUTH_CACHE_ENABLED
+
+    def _key(self, room_id):
+        return f'chat:room_members:{room_id}'
+
+    def _generation_key(self, room_id):
+        return f'chat:room_members:{room_id}:gen'
+
+    def is_member(self, room_id, user_id):
+        if not self.enabled:
+            return self._is_member_db(room_id, user_id)
+
+        key, generation_key = self._key(room_id), self._generation_key(room_id)
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.exists(key)
+            pipe.sismember(key, str(user_id))
+            pipe.get(generation_key)
+            loaded, is_member, generation = pipe.execute()
+            if loaded:
+                return bool(is_member)
+
+            # Generation is read before the query: a change committed after it bumps the generation
+            member_ids = self._load_member_ids(room_id)
+            if self._fill is None:
+                self._fill = redis_client.register_script(FILL_SCRIPT)
+            self._fill(
+                keys=[key, generation_key],
+                args=[
+                    generation or '',
+                    settings.CHAT_ROOM_MEMBERS_TTL,
+                    self.SENTINEL,
+                    *[str(member_id) for member_id in member_ids],
+                ],
+            )
+            return user_id in member_ids
+        except RedisError as e:
+            logger.warning(f"Room membership cache unavailable: {e}")
+            return self._is_member_db(room_id, user_id)
+
+    def invalidate(self, *room_ids):
+        if not self.enabled or not room_ids:
+            return
+        try:
+            pipe = redis_client.pipeline()
+            for room_id in room_ids:
+                pipe.incr(self._generation_key(room_id))
+                # Outlives any load that started before this invalidation
+                pipe.expire(self._generation_key(room_id), settings.CHAT_ROOM_MEMBERS_TTL)
+            pipe.delete(*[self._key(room_id) for room_id in room_ids])
+            pipe.execute()
+        except RedisError as e:
+            logger.error(f"Failed to invalidate room membership cache: {e}")
+
+    def _load_member_ids(self, room_id):
+        return set(
+            ChatRoom.participants.through.objects.filter(
+                chatroom_id=room_id
+            ).values_list('user_id', flat=True)
+        )
+
+    def _is_member_db(self, room_id, user_id):
+        return ChatRoom.participants.through.objects.filter(
+            chatroom_id=room_id,
+            user_id=user_id
+        ).exists()
+
+
+room_membership_cache = RoomMembershipCache()
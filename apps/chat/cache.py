@@ -0,0 +1,231 @@
+import json
+import logging
+import uuid
+from django.conf import settings
+from redis.exceptions import RedisError
+from core.redis.client import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+# Push only into warm buffers (or ones being warmed): a cold buffer would otherwise hold a partial history
+PUSH_SCRIPT = """
+local state = redis.call('GET', KEYS[2])
+if not state then
+    return 0
+end
+redis.call('LPUSH', KEYS[1], ARGV[1])
+redis.call('LTRIM', KEYS[1], 0, tonumber(ARGV[2]) - 1)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+if state == '1' then
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+end
+return 1
+"""
+
+# Edits can't be applied to a buffer being warmed (the database read may miss them): give up the warm
+UPDATE_SCRIPT = """
+local state = redis.call('GET', KEYS[2])
+if state and state ~= '1' then
+    redis.call('DEL', KEYS[1], KEYS[2])
+    return 0
+end
+local items = redis.call('LRANGE', KEYS[1], 0, -1)
+for index, item in ipairs(items) do
+    local message = cjson.decode(item)
+    if tostring(message['id']) == ARGV[1] then
+        message['content'] = ARGV[2]
+        message['updated_at'] = ARGV[3]
+        redis.call('LSET', KEYS[1], index - 1, cjson.encode(message))
+        return 1
+    end
+end
+return 0
+"""
+
+# Start warming a cold buffer: pushes are collected from now on
+BEGIN_WARM_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+
+# Finish warming: messages pushed meanwhile that the database read missed (newest first), then the loaded ones
+WARM_SCRIPT = """
+if redis.call('GET', KEYS[2]) ~= ARGV[1] then
+    return 0
+end
+local size = tonumber(ARGV[2])
+local loaded = {}
+for index = 4, #ARGV do
+    loaded[tostring(cjson.decode(ARGV[index])['id'])] = true
+end
+local items = {}
+for _, item in ipairs(redis.call('LRANGE', KEYS[1], 0, -1)) do
+    if not loaded[tostring(cjson.decode(item)['id'])] then
+        table.insert(items, item)
+    end
+end
+for index = 4, #ARGV do
+    table.insert(items, ARGV[index])
+end
+redis.call('DEL', KEYS[1])
+if #items > 0 then
+    redis.call('RPUSH', KEYS[1], unpack(items, 1, math.min(#items, size)))
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+redis.call('SET', KEYS[2], 1, 'EX', ARGV[3])
+return 1
+"""
+
+
+class RecentMessageCache:
+    """
+    Bounded per-room ring buffer of the newest messages (newest first).
+
+    A room's buffer is warmed from the database on the first miss and then
+    kept current by new, edited and deleted messages, so WebSocket connects
+    and room lists normally don't touch the database. Redis failures are
+    treated as cache misses.
+
+    Warming is started (begin_warm) before the database read: messages
+    pushed during the read are collected and merged with the loaded ones
+    by id, and an edit or delete meanwhile cancels the warm.
+    """
+
+    # Seconds a warm may take before the buffer is left cold again
+    WARM_TIMEOUT = 30
+
+    def __init__(self):
+        self._push = None
+        self._update = None
+        self._begin_warm = None
+        self._warm = None
+
+    @property
+    def enabled(self):
+        return settings.CHAT_RECENT_CACHE_ENABLED
+
+    @property
+    def size(self):
+        return settings.CHAT_RECENT_CACHE_SIZE
+
+    @property
+    def ttl(self):
+        return settings.CHAT_RECENT_CACHE_TTL
+
+    def _keys(self, room_id):
+        return f'chat:recent:{room_id}', f'chat:recent:{room_id}:warm'
+
+    def get(self, room_id):
+        """Recent messages of the room, or None on a cache miss"""
+        if not self.enabled:
+            return None
+        messages_key, warm_key = self._keys(room_id)
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.get(warm_key)
+            pipe.lrange(messages_key, 0, -1)
+            warm, items = pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Recent message cache unavailable: {e}")
+            return None
+        if warm != '1':
+            return None
+        return [json.loads(item) for item in items]
+
+    def get_latest_many(self, room_ids):
+        """Map room_id -> newest message (or None) for warm rooms in one round trip"""
+        if not self.enabled or not room_ids:
+            return {}
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for room_id in room_ids:
+                messages_key, warm_key = self._keys(room_id)
+                pipe.get(warm_key)
+                pipe.lindex(messages_key, 0)
+            results = pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Recent message cache unavailable: {e}")
+            return {}
+
+        latest = {}
+        for index, room_id in enumerate(room_ids):
+            warm, item = results[index * 2], results[index * 2 + 1]
+            if warm == '1':
+                latest[room_id] = json.loads(item) if item else None
+        return latest
+
+    def begin_warm(self, room_id):
+        """
+        Start warming the room buffer; call before reading the messages from
+        the database. Returns token for warm, or None if the room is warm or
+        being warmed by another request.
+        """
+        if not self.enabled:
+            return None
+        token = f'warming:{uuid.uuid4().hex}'
+        try:
+            if self._begin_warm is None:
+                self._begin_warm = redis_client.register_script(BEGIN_WARM_SCRIPT)
+            started = self._begin_warm(keys=self._keys(room_id), args=[token, self.WARM_TIMEOUT])
+        except RedisError as e:
+            logger.warning(f"Failed to start warming recent message cache for room {room_id}: {e}")
+            return None
+        return token if started else None
+
+    def warm(self, room_id, messages, token):
+        """Fill room buffer with messages loaded from the database (newest first) after begin_warm"""
+        if not self.enabled or token is None:
+            return
+        try:
+            if self._warm is None:
+                self._warm = redis_client.register_script(WARM_SCRIPT)
+            self._warm(
+                keys=self._keys(room_id),
+                args=[token, self.size, self.ttl, *[json.dumps(message) for message in messages[:self.size]]]
+            )
+        except RedisError as e:
+            logger.warning(f"Failed to warm recent message cache for room {room_id}: {e}")
+
+    def push(self, room_id, message):
+        """Add new message to the room buffer"""
+        if not self.enabled:
+            return
+        try:
+            if self._push is None:
+                self._push = redis_client.register_script(PUSH_SCRIPT)
+            self._push(keys=self._keys(room_id), args=[json.dumps(message), self.size, self.ttl])
+        except RedisError as e:
+            logger.warning(f"Failed to push to recent message cache: {e}")
+            self.invalidate(room_id)
+
+    def update(self, room_id, message_id, content, updated_at):
+        """Apply message edit to the room buffer"""
+        if not self.enabled:
+            return
+        try:
+            if self._update is None:
+                self._update = redis_client.register_script(UPDATE_SCRIPT)
+            self._update(
+                keys=self._keys(room_id),
+                args=[str(message_id), content, updated_at.isoformat()]
+            )
+        except RedisError as e:
+            logger.warning(f"Failed to update recent message cache: {e}")
+            self.invalidate(room_id)
+
+    def invalidate(self, room_id):
+        """Drop room buffer; next read warms it again from the database"""
+        if not self.enabled:
+            return
+        try:
+            redis_client.delete(*self._keys(room_id))
+        except RedisError as e:
+            logger.error(f"Failed to invalidate recent message cache for room {room_id}: {e}")
+
+
+recent_message_cache = RecentMessageCache()
@@ -1,11 +1,21 @@
 import json
+import time
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
-from rest_framework_simplejwt.tokens import UntypedToken
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from django.contrib.auth import get_user_model
-from .models import ChatRoom, Message
+from django.conf import settings
+from django.utils import timezone
+from core.base.websocket_auth import websocket_authenticator
+from core.error_handling.exceptions import CustomValidationError
+from .models import ChatRoom, Message, ChatReadReceipt
+from .access import room_membership_cache
+from .cache import recent_message_cache
+from .fanout import room_fanout
+from .pagination import get_message_paginator
+from .persistence import message_write_buffer
+from .presence import presence_service, presence_broadcaster
+from .utils import message_to_dict
 import logging
 
 User = get_user_model()
@@ -39,9 +49,14 @@ class ChatConsumer(AsyncWebsocketConsumer):
         
         # Send recent messages
         await self.send_recent_messages()
+        
+        # Register presence and send who is online
+        await self.join_presence()
     
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
+        await self.leave_presence()
+        
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
@@ -54,6 +69,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
             data = json.loads(text_data)
             message_type = data.get('type', 'message')
             
+            # Any client activity keeps the connection live
+            if message_type != 'heartbeat':
+                await self.touch_presence()
+            
             if message_type == 'message':
                 await self.handle_new_message(data)
             elif message_type == 'update_message':
@@ -62,6 +81,13 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 await self.handle_delete_message(data)
             elif message_type == 'get_messages':
                 await self.handle_get_messages(data)
+            elif message_type == 'mark_read':
+                await self.handle_mark_read(data)
+            elif message_type == 'typing':
+                await self.handle_typing(data)
+            elif message_type == 'heartbeat':
+                # Idle clients send it every heartbeat_interval seconds (see presence_state)
+                await self.touch_presence(force=True)
                 
         except json.JSONDecodeError:
             await self.send(text_data=json.dumps({
@@ -84,21 +110,14 @@ class ChatConsumer(AsyncWebsocketConsumer):
         # Save message to database
         message = await self.save_message(content)
         if message:
-            # Send to room group
-            await self.channel_layer.group_send(
+            if self.presence_joined:
+                presence_broadcaster.set_typing(self.channel_layer, self.room_group_name, self.user.id, False)
+
+            # Send to room group (coalesced with other messages when the room is hot)
+            await room_fanout.publish_message(
+                self.channel_layer,
                 self.room_group_name,
-                {
-                    'type': 'chat_message',
-                    'message': {
-                        'id': message.id,
-                        'content': message.content,
-                        'sender': message.sender.username,
-                        'sender_id': message.sender.id,
-                        'created_at': message.created_at.isoformat(),
-                        'updated_at': message.updated_at.isoformat(),
-                        'is_deleted': message.is_deleted
-                    }
-                }
+                message_to_dict(message)
             )
     
     async def handle_update_message(self, data):
@@ -112,7 +131,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
         # Update message
         success = await self.update_message(message_id, new_content)
         if success:
-            await self.channel_layer.group_send(
+            await room_fanout.publish(
+                self.channel_layer,
                 self.room_group_name,
                 {
                     'type': 'message_updated',
@@ -131,7 +151,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
         # Delete message
         success = await self.delete_message(message_id)
         if success:
-            await self.channel_layer.group_send(
+            await room_fanout.publish(
+                self.channel_layer,
                 self.room_group_name,
                 {
                     'type': 'message_deleted',
@@ -140,104 +161,171 @@ class ChatConsumer(AsyncWebsocketConsumer):
             )
     
     async def handle_get_messages(self, data):
-        """Handle get messages request"""
-        page = data.get('page', 1)
-        page_size = data.get('page_size', 20)
+        """Handle get messages request (keyset pagination by cursor)"""
+        cursor = data.get('cursor')
+        page_size = data.get('page_size')
+        
+        try:
+            messages, next_cursor = await self.get_messages_paginated(cursor, page_size)
+        except CustomValidationError as e:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': e.detail
+            }))
+            return
         
-        messages = await self.get_messages_paginated(page, page_size)
         await self.send(text_data=json.dumps({
             'type': 'messages_history',
             'messages': messages,
-            'page': page,
-            'page_size': page_size
+            'next_cursor': next_cursor,
+            'page_size': len(messages)
         }))
     
-    async def chat_message(self, event):
-        """Send message to WebSocket"""
-        await self.send(text_data=json.dumps({
-            'type': 'new_message',
-            'message': event['message']
-        }))
+    async def handle_mark_read(self, data):
+        """Move user's read watermark up to message_id (or up to now)"""
+        read_at = await self.mark_read(data.get('message_id'))
+        if read_at:
+            await self.send(text_data=json.dumps({
+                'type': 'read_receipt',
+                'last_read_at': read_at.isoformat()
+            }))
     
-    async def message_updated(self, event):
-        """Send message update to WebSocket"""
-        await self.send(text_data=json.dumps({
-            'type': 'message_updated',
-            'message_id': event['message_id'],
-            'content': event['content'],
-            'updated_at': event['updated_at']
-        }))
+    async def handle_typing(self, data):
+        """Handle typing indicator (aggregated and throttled per room)"""
+        if self.presence_joined:
+            presence_broadcaster.set_typing(
+                self.channel_layer,
+                self.room_group_name,
+                self.user.id,
+                bool(data.get('is_typing', True))
+            )
     
-    async def message_deleted(self, event):
-        """Send message deletion to WebSocket"""
+    async def join_presence(self):
+        """Register connection in room presence and send online users to the client"""
+        self.presence_joined = False
+        if not presence_service.enabled:
+            return
+        
+        result = await self.presence_join()
+        if result is None:
+            return
+        online, was_online = result
+        self.presence_joined = True
+        self.last_heartbeat = time.monotonic()
+        
+        if not was_online:
+            presence_broadcaster.set_online(self.channel_layer, self.room_group_name, self.user.id)
         await self.send(text_data=json.dumps({
-            'type': 'message_deleted',
-            'message_id': event['message_id']
+            'type': 'presence_state',
+            'online': sorted(online),
+            'heartbeat_interval': presence_service.ttl // 3
         }))
     
+    async def touch_presence(self, force=False):
+        """Refresh heartbeat, at most a few times per TTL unless forced"""
+        if not self.presence_joined:
+            return
+        now = time.monotonic()
+        if not force and now - self.last_heartbeat < presence_service.ttl / 3:
+            return
+        self.last_heartbeat = now
+        back_online = await self.presence_heartbeat()
+        if back_online:
+            # The sweep announced this user offline
+            presence_broadcaster.set_online(self.channel_layer, self.room_group_name, self.user.id)
+    
+    async def leave_presence(self):
+        if not getattr(self, 'presence_joined', False):
+            return
+        self.presence_joined = False
+        went_offline = await self.presence_leave()
+        if went_offline:
+            presence_broadcaster.set_online(self.channel_layer, self.room_group_name, self.user.id, False)
+    
+    async def chat_frame(self, event):
+        """Forward pre-serialized room frame to WebSocket"""
+        await self.send(text_data=event['text'])
+    
     @database_sync_to_async
     def get_user_from_token(self):
         try:
-            # Get token from query parameters
-            query_string = self.scope.get('query_string', b'').decode()
-            token = None
-            
-            for param in query_string.split('&'):
-                if param.startswith('token='):
-                    token = param.split('=')[1]
-                    break
-            
-            if not token:
-                return None
-            
-            # Check token
-            UntypedToken(token)
-            
-            # Get user from token
-            from rest_framework_simplejwt.authentication import JWTAuthentication
-            jwt_auth = JWTAuthentication()
-            validated_token = jwt_auth.get_validated_token(token)
-            user = jwt_auth.get_user(validated_token)
-            
-            return user
-            
-        except (InvalidToken, TokenError, Exception) as e:
+            return websocket_authenticator.authenticate(self.scope)
+        except Exception as e:
             logger.error(f"Token validation error: {e}")
             return None
     
     @database_sync_to_async
     def check_room_access(self):
+        return room_membership_cache.is_member(self.room_id, self.user.id)
+    
+    @database_sync_to_async
+    def presence_join(self):
+        try:
+            return presence_service.join(self.room_id, self.user.id, self.channel_name)
+        except Exception as e:
+            logger.warning(f"Presence unavailable: {e}")
+            return None
+    
+    @database_sync_to_async
+    def presence_heartbeat(self):
         try:
-            room = ChatRoom.objects.get(id=self.room_id)
-            return room.participants.filter(id=self.user.id).exists()
-        except ChatRoom.DoesNotExist:
+            return presence_service.heartbeat(self.room_id, self.user.id, self.channel_name)
+        except Exception as e:
+            logger.warning(f"Presence heartbeat failed: {e}")
+            return False
+    
+    @database_sync_to_async
+    def presence_leave(self):
+        try:
+            return presence_service.leave(self.room_id, self.user.id, self.channel_name)
+        except Exception as e:
+            logger.warning(f"Presence leave failed: {e}")
             return False
     
     @database_sync_to_async
     def save_message(self, content):
         try:
-            room = ChatRoom.objects.get(id=self.room_id)
-            message = Message.objects.create(
-                room=room,
-                sender=self.user,
-                content=content
-            )
+            if message_write_buffer.enabled:
+                # Room access was checked on connect; row is persisted by the drainer
+                message = message_write_buffer.enqueue(self.room_id, self.user, content)
+            else:
+                room = ChatRoom.objects.get(id=self.room_id)
+                message = Message.objects.create(
+                    room=room,
+                    sender=self.user,
+                    content=content
+                )
+            recent_message_cache.push(self.room_id, message_to_dict(message))
             return message
         except Exception as e:
             logger.error(f"Error saving message: {e}")
             return None
     
+    def _get_room_message(self, message_id, own=False):
+        """Get message in this room, flushing write-behind buffer on miss"""
+        lookup = {
+            'id': message_id,
+            'room_id': self.room_id,
+            'is_deleted': False
+        }
+        if own:
+            lookup['sender'] = self.user
+        try:
+            return Message.objects.get(**lookup)
+        except Message.DoesNotExist:
+            if not message_write_buffer.enabled:
+                raise
+            # Message may still be waiting in the buffer
+            message_write_buffer.flush()
+            return Message.objects.get(**lookup)
+    
     @database_sync_to_async
     def update_message(self, message_id, new_content):
         try:
-            message = Message.objects.get(
-                id=message_id,
-                sender=self.user,
-                room_id=self.room_id,
-                is_deleted=False
-            )
+            message = self._get_room_message(message_id, own=True)
             message.content = new_content
             message.save()
+            recent_message_cache.update(self.room_id, message.id, message.content, message.updated_at)
             return message
         except Message.DoesNotExist:
             return None
@@ -248,14 +336,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
     def delete_message(self, message_id):
         try:
-            message = Message.objects.get(
-                id=message_id,
-                sender=self.user,
-                room_id=self.room_id,
-                is_deleted=False
-            )
+            message = self._get_room_message(message_id, own=True)
             message.is_deleted = True
             message.save()
+            recent_message_cache.invalidate(self.room_id)
             return True
         except Message.DoesNotExist:
             return False
@@ -264,54 +348,61 @@ class ChatConsumer(AsyncWebsocketConsumer):
             return False
     
     @database_sync_to_async
-    def get_messages_paginated(self, page, page_size):
+    def mark_read(self, message_id=None):
+        try:
+            if message_id:
+                read_at = self._get_room_message(message_id).created_at
+            else:
+                read_at = timezone.now()
+            return ChatReadReceipt.mark_read(self.room_id, self.user, read_at)
+        except Message.DoesNotExist:
+            return None
+        except Exception as e:
+            logger.error(f"Error marking messages as read: {e}")
+            return None
+    
+    @database_sync_to_async
+    def get_messages_paginated(self, cursor=None, page_size=None):
         try:
-            from django.core.paginator import Paginator
-            
             messages = Message.objects.filter(
                 room_id=self.room_id,
                 is_deleted=False
-            ).select_related('sender').order_by('-created_at')
-            
-            paginator = Paginator(messages, page_size)
-            page_obj = paginator.get_page(page)
+            ).select_related('sender')
             
-            return [
-                {
-                    'id': msg.id,
-                    'content': msg.content,
-                    'sender': msg.sender.username,
-                    'sender_id': msg.sender.id,
-                    'created_at': msg.created_at.isoformat(),
-                    'updated_at': msg.updated_at.isoformat(),
-                    'is_deleted': msg.is_deleted
-                }
-                for msg in page_obj
-            ]
+            page, next_cursor = get_message_paginator().paginate(messages, cursor, page_size)
+            return [message_to_dict(msg) for msg in page], next_cursor
+        except CustomValidationError:
+            raise
         except Exception as e:
             logger.error(f"Error getting messages: {e}")
-            return []
+            return [], None
     
     @database_sync_to_async
-    def get_recent_messages(self, limit=20):
+    def get_recent_messages(self, limit=None):
+        limit = limit or settings.CHAT_RECENT_CACHE_SIZE
         try:
+            cached = recent_message_cache.get(self.room_id)
+            if cached is not None:
+                return cached[:limit]
+            
+            warm_token = recent_message_cache.begin_warm(self.room_id)
+            if message_write_buffer.enabled:
+                # Buffered messages are in neither the database nor the cache yet
+                try:
+                    message_write_buffer.flush()
+                except Exception as e:
+                    logger.warning(f"Failed to flush chat write buffer before warming room {self.room_id}: {e}")
+                    if warm_token:
+                        recent_message_cache.invalidate(self.room_id)
+                        warm_token = None
             messages = Message.objects.filter(
                 room_id=self.room_id,
                 is_deleted=False
-            ).select_related('sender').order_by('-created_at')[:limit]
+            ).select_related('sender').order_by('-created_at', '-id')[:limit]
             
-            return [
-                {
-                    'id': msg.id,
-                    'content': msg.content,
-                    'sender': msg.sender.username,
-                    'sender_id': msg.sender.id,
-                    'created_at': msg.created_at.isoformat(),
-                    'updated_at': msg.updated_at.isoformat(),
-                    'is_deleted': msg.is_deleted
-                }
-                for msg in messages
-            ]
+            messages = [message_to_dict(msg) for msg in messages]
+            recent_message_cache.warm(self.room_id, messages, warm_token)
+            return messages
         except Exception as e:
             logger.error(f"Error getting recent messages: {e}")
             return []
@@ -321,5 +412,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         messages = await self.get_recent_messages()
         await self.send(text_data=json.dumps({
             'type': 'recent_messages',
-            'messages': messages
+            'messages': messages,
+            # Continue scrolling back with get_messages from here
+            'next_cursor': get_message_paginator().encode_cursor(messages[-1]) if messages else None
         }))
\ No newline at end of file
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import logging
+import time
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RoomFanout:
+    """
+    Per-process broadcaster for chat room groups.
+
+    Every frame is serialized to JSON once and shipped through the channel
+    layer as ready-to-send text, so consumers only forward it to the socket.
+    New messages in a hot room (another message was sent less than
+    flush_interval ago) are buffered and flushed as one `new_messages` frame
+    after flush_interval, or as soon as max_batch_size messages are waiting.
+    Messages in a quiet room go out immediately as a single `new_message`.
+    """
+
+    def __init__(self, flush_interval=None, max_batch_size=None):
+        if flush_interval is None:
+            flush_interval = settings.CHAT_FANOUT_FLUSH_INTERVAL_MS / 1000
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size or settings.CHAT_FANOUT_MAX_BATCH_SIZE
+        self._buffers = {}
+        self._flush_tasks = {}
+        self._last_sent = {}
+
+    async def publish_message(self, channel_layer, group, message):
+        """Broadcast new chat message, coalescing bursts in hot rooms"""
+        now = time.monotonic()
+        buffer = self._buffers.get(group)
+
+        if buffer is None and now - self._last_sent.get(group, 0) >= self.flush_interval:
+            self._last_sent[group] = now
+            await self._send(channel_layer, group, {'type': 'new_message', 'message': message})
+            return
+
+        buffer = self._buffers.setdefault(group, [])
+        buffer.append(message)
+
+        if len(buffer) >= self.max_batch_size:
+            await self.flush(channel_layer, group)
+        elif group not in self._flush_tasks:
+            self._flush_tasks[group] = asyncio.ensure_future(self._delayed_flush(channel_layer, group))
+
+    async def publish(self, channel_layer, group, frame):
+        """Broadcast any other frame (updates, deletes) without coalescing"""
+        # Keep ordering: buffered messages must reach clients before edits to them
+        await self.flush(channel_layer, group)
+        await self._send(channel_layer, group, frame)
+
+    async def flush(self, channel_layer, group):
+        """Send buffered messages of the group as one frame"""
+        task = self._flush_tasks.pop(group, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+
+        messages = self._buffers.pop(group, None)
+        if not messages:
+            return
+
+        self._last_sent[group] = time.monotonic()
+        if len(messages) == 1:
+            frame = {'type': 'new_message', 'message': messages[0]}
+        else:
+            frame = {'type': 'new_messages', 'messages': messages}
+        await self._send(channel_layer, group, frame)
+
+    async def _delayed_flush(self, channel_layer, group):
+        await asyncio.sleep(self.flush_interval)
+        try:
+            await self.flush(channel_layer, group)
+        except Exception as e:
+            logger.error(f"Error flushing chat fan-out buffer for {group}: {e}")
+
+    async def _send(self, channel_layer, group, frame):
+        await channel_layer.group_send(group, {
+            'type': 'chat.frame',
+            'text': json.dumps(frame)
+        })
+
+
+room_fanout = RoomFanout()
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.chat.partitions import add_months, archive_partitions, month_start, ARCHIVE_SCHEMA
+
+
+class Command(BaseCommand):
+    help = f'Detach old chat_message partitions and move them to the {ARCHIVE_SCHEMA} schema (or drop them)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-months', type=int, default=settings.CHAT_MESSAGE_ARCHIVE_AFTER_MONTHS,
+            help='Archive partitions of months older than this many months'
+        )
+        parser.add_argument('--drop', action='store_true', help='Drop detached partitions instead of archiving')
+        parser.add_argument('--dry-run', action='store_true', help='Only list partitions that would be affected')
+
+    def handle(self, *args, **options):
+        before = add_months(month_start(timezone.now()), -options['older_than_months'])
+        names = archive_partitions(before, drop=options['drop'], dry_run=options['dry_run'])
+
+        action = 'Would process' if options['dry_run'] else ('Dropped' if options['drop'] else 'Archived')
+        for name in names:
+            self.stdout.write(f'{action} {name}')
+        self.stdout.write(self.style.SUCCESS(f'{action} {len(names)} chat message partitions'))
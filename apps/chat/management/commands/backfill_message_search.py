@@ -0,0 +1,42 @@
+import time
+from django.contrib.postgres.search import SearchVector
+from django.core.management.base import BaseCommand
+from apps.chat.models import Message
+from apps.chat.search import SEARCH_CONFIG
+
+
+class Command(BaseCommand):
+    help = 'Fill search_vector of existing chat messages in batches (new writes are indexed by trigger)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per UPDATE')
+        parser.add_argument('--start-id', type=int, default=0, help='Resume after this message id')
+        parser.add_argument('--all', action='store_true', help='Recompute rows that are already indexed')
+        parser.add_argument('--sleep', type=float, default=0, help='Pause between batches, seconds')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = options['start_id']
+        total = 0
+
+        while True:
+            # Walk the primary key so every batch is a short index range scan
+            ids = list(
+                Message.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+
+            batch = Message.objects.filter(id__in=ids)
+            if not options['all']:
+                batch = batch.filter(search_vector__isnull=True)
+            total += batch.update(search_vector=SearchVector('content', config=SEARCH_CONFIG))
+            last_id = ids[-1]
+
+            self.stdout.write(f'Indexed {total} messages (last id {last_id})')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled search index for {total} messages'))
@@ -0,0 +1,292 @@
+import asyncio
+import gc
+import json
+import random
+import time
+import tracemalloc
+from contextlib import nullcontext
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from apps.authentication.models import User
+from apps.chat.models import ChatRoom
+from core.base.benchmark import (
+    QueryCounter, benchmark_metadata, compare_metrics, eager_tasks, isolated_redis, load_results, percentiles,
+    write_results
+)
+
+
+# Metrics printed by --compare (lower is better for all of them)
+COMPARED_METRICS = [
+    'results.connect_ms.p50',
+    'results.connect_ms.p99',
+    'results.latency_ms.p50',
+    'results.latency_ms.p95',
+    'results.latency_ms.p99',
+    'results.queries_per_message',
+    'results.queries_per_connection',
+    'results.memory_per_connection_kb',
+]
+
+FEATURE_SETTINGS = [
+    'CHAT_RECENT_CACHE_ENABLED', 'WS_AUTH_CACHE_ENABLED', 'CHAT_PRESENCE_ENABLED',
+    'CHAT_WRITE_BEHIND_ENABLED', 'CHAT_FANOUT_FLUSH_INTERVAL_MS', 'CHAT_FANOUT_MAX_BATCH_SIZE',
+]
+
+
+class Client:
+    """One simulated WebSocket connection to the ASGI app"""
+
+    def __init__(self, application, room_id, user):
+        self.room_id = room_id
+        self.communicator = ApplicationCommunicator(application, {
+            'type': 'websocket',
+            'path': f'/ws/chat/{room_id}/',
+            'query_string': f'token={AccessToken.for_user(user)}'.encode(),
+            'headers': [],
+            'subprotocols': [],
+        })
+
+    async def connect(self):
+        await self.communicator.send_input({'type': 'websocket.connect'})
+        message = await self.communicator.output_queue.get()
+        return message['type'] == 'websocket.accept'
+
+    async def send(self, content):
+        await self.communicator.send_input({
+            'type': 'websocket.receive',
+            'text': json.dumps({'type': 'message', 'content': content})
+        })
+
+    async def disconnect(self):
+        await self.communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await self.communicator.wait(5)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the chat WebSocket path in-process: ASGI app, in-memory channel layer '
+        'and a throwaway test database. Reports delivery latency, queries per message and '
+        'memory per connection; results can be saved and compared across commits.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=10, help='Number of rooms')
+        parser.add_argument('--clients', type=int, default=10, help='Connected clients per room')
+        parser.add_argument('--rate', type=float, default=1.0, help='Messages per second sent by each client')
+        parser.add_argument('--duration', type=float, default=10.0, help='Sending phase length, seconds')
+        parser.add_argument('--drain-timeout', type=float, default=10.0, help='Max wait for outstanding deliveries')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for send jitter')
+        parser.add_argument('--redis-db', type=int,
+                            help='Empty Redis database for Redis-backed chat features (caches, presence, '
+                                 'write-behind), flushed after the run; without it they are disabled')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the test database between runs')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--compare', help='Results JSON of a previous run to compare with')
+
+    def handle(self, *args, **options):
+        overrides = {
+            'CHANNEL_LAYERS': {
+                'default': {
+                    'BACKEND': 'channels.layers.InMemoryChannelLayer',
+                    'CONFIG': {'capacity': 10000},
+                }
+            },
+        }
+        options['without_redis'] = options['redis_db'] is None
+        if options['without_redis']:
+            overrides.update(
+                CHAT_RECENT_CACHE_ENABLED=False,
+                WS_AUTH_CACHE_ENABLED=False,
+                CHAT_PRESENCE_ENABLED=False,
+                CHAT_WRITE_BEHIND_ENABLED=False,
+            )
+
+        database_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb']
+        )
+        try:
+            # Benchmark room and user IDs collide with real ones: no shared Redis keys, no real broker
+            redis_context = nullcontext() if options['without_redis'] else isolated_redis(options['redis_db'])
+            with override_settings(**overrides), redis_context, eager_tasks():
+                rooms = self.setup_rooms(options['rooms'], options['clients'])
+                results = asyncio.run(self.run_benchmark(rooms, options))
+                features = {name: getattr(settings, name) for name in FEATURE_SETTINGS}
+                report = {
+                    'benchmark': 'chat',
+                    'metadata': benchmark_metadata(features=features),
+                    'params': {
+                        key: options[key]
+                        for key in ('rooms', 'clients', 'rate', 'duration', 'seed', 'without_redis')
+                    },
+                    'results': results,
+                }
+        finally:
+            connection.creation.destroy_test_db(database_name, verbosity=0, keepdb=options['keepdb'])
+
+        self.print_report(report)
+        if options['output']:
+            write_results(options['output'], report)
+            self.stdout.write(f"Results written to {options['output']}")
+        if options['compare']:
+            self.print_comparison(report, load_results(options['compare']))
+
+    def setup_rooms(self, room_count, clients_per_room):
+        """Create rooms with one fresh participant per client; returns [(room, [users])]"""
+        run_id = int(time.time())
+        users = User.objects.bulk_create([
+            User(username=f'bench_{run_id}_{index}', email=f'bench_{run_id}_{index}@example.com')
+            for index in range(room_count * clients_per_room)
+        ])
+        rooms = ChatRoom.objects.bulk_create([
+            ChatRoom(name=f'Benchmark {index}') for index in range(room_count)
+        ])
+
+        setup = []
+        memberships = []
+        for index, room in enumerate(rooms):
+            members = users[index * clients_per_room:(index + 1) * clients_per_room]
+            memberships += [
+                ChatRoom.participants.through(chatroom_id=room.id, user_id=user.id)
+                for user in members
+            ]
+            setup.append((room, members))
+        ChatRoom.participants.through.objects.bulk_create(memberships)
+        return setup
+
+    async def run_benchmark(self, rooms, options):
+        from banister_backend.asgi import application
+
+        clients = [Client(application, room.id, user) for room, members in rooms for user in members]
+
+        # Connect phase: latency, queries and Python heap growth per connection
+        # (connect latency includes tracemalloc overhead; compare runs with each other only)
+        gc.collect()
+        tracemalloc.start()
+        heap_before = tracemalloc.get_traced_memory()[0]
+        connect_times = []
+        connect_queries = QueryCounter()
+        with connect_queries.track():
+            for client in clients:
+                started = time.perf_counter()
+                if not await client.connect():
+                    raise RuntimeError(f'Connection to room {client.room_id} was rejected')
+                connect_times.append((time.perf_counter() - started) * 1000)
+        gc.collect()
+        heap_after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        sent_at = {}
+        latencies = []
+        readers = [asyncio.ensure_future(self.read_frames(client, sent_at, latencies)) for client in clients]
+
+        # Send phase: every client sends at `rate` with random phase offsets
+        random.seed(options['seed'])
+        message_queries = QueryCounter()
+        with message_queries.track():
+            send_started = time.perf_counter()
+            await asyncio.gather(*[
+                self.send_messages(client, index, options['rate'], options['duration'], sent_at)
+                for index, client in enumerate(clients)
+            ])
+            send_elapsed = time.perf_counter() - send_started
+
+            # Every message is delivered to each client of its room, the sender included
+            expected = len(sent_at) * options['clients']
+            deadline = time.perf_counter() + options['drain_timeout']
+            while len(latencies) < expected and time.perf_counter() < deadline:
+                await asyncio.sleep(0.05)
+            total_elapsed = time.perf_counter() - send_started
+
+        for reader in readers:
+            reader.cancel()
+        await asyncio.gather(*[client.disconnect() for client in clients], return_exceptions=True)
+
+        messages_sent = len(sent_at)
+        return {
+            'connections': len(clients),
+            'connect_ms': percentiles(connect_times),
+            'queries_per_connection': connect_queries.count / len(clients),
+            'memory_per_connection_kb': (heap_after - heap_before) / len(clients) / 1024,
+            'messages_sent': messages_sent,
+            'send_rate': messages_sent / send_elapsed if send_elapsed else 0,
+            'deliveries': len(latencies),
+            'deliveries_expected': expected,
+            'delivery_rate': len(latencies) / total_elapsed if total_elapsed else 0,
+            'latency_ms': percentiles([latency * 1000 for latency in latencies]),
+            'queries_per_message': message_queries.count / messages_sent if messages_sent else 0,
+        }
+
+    async def send_messages(self, client, index, rate, duration, sent_at):
+        interval = 1 / rate
+        started = time.perf_counter()
+        next_send = started + random.uniform(0, interval)
+        sequence = 0
+        while next_send < started + duration:
+            await asyncio.sleep(max(0, next_send - time.perf_counter()))
+            content = f'benchmark {index} {sequence}'
+            sent_at[content] = time.perf_counter()
+            await client.send(content)
+            sequence += 1
+            next_send += interval
+
+    async def read_frames(self, client, sent_at, latencies):
+        """Record delivery latency of every chat message reaching this client"""
+        while True:
+            message = await client.communicator.output_queue.get()
+            if message['type'] != 'websocket.send':
+                continue
+            received = time.perf_counter()
+            frame = json.loads(message['text'])
+            if frame['type'] == 'new_message':
+                items = [frame['message']]
+            elif frame['type'] == 'new_messages':
+                items = frame['messages']
+            else:
+                continue
+            for item in items:
+                sent = sent_at.get(item['content'])
+                if sent is not None:
+                    latencies.append(received - sent)
+
+    def print_report(self, report):
+        results = report['results']
+        git = report['metadata']['git'] or {}
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Chat benchmark @ {git.get('commit', 'unknown')[:12]} ({report['metadata']['database']})"
+        ))
+        self.stdout.write(
+            f"  connections: {results['connections']}, "
+            f"connect p50/p99: {results['connect_ms']['p50']:.1f}/{results['connect_ms']['p99']:.1f} ms, "
+            f"queries/connection: {results['queries_per_connection']:.1f}, "
+            f"memory/connection: {results['memory_per_connection_kb']:.1f} KB"
+        )
+        self.stdout.write(
+            f"  messages sent: {results['messages_sent']} ({results['send_rate']:.0f}/s), "
+            f"delivered: {results['deliveries']}/{results['deliveries_expected']} "
+            f"({results['delivery_rate']:.0f}/s), "
+            f"queries/message: {results['queries_per_message']:.2f}"
+        )
+        latency = results['latency_ms']
+        if latency:
+            self.stdout.write(
+                f"  delivery latency p50/p95/p99: "
+                f"{latency['p50']:.1f}/{latency['p95']:.1f}/{latency['p99']:.1f} ms (max {latency['max']:.1f})"
+            )
+        if results['deliveries'] < results['deliveries_expected']:
+            self.stdout.write(self.style.WARNING(
+                f"  {results['deliveries_expected'] - results['deliveries']} deliveries missing after drain timeout"
+            ))
+
+    def print_comparison(self, report, baseline):
+        if baseline.get('params') != report['params']:
+            self.stdout.write(self.style.WARNING('Baseline was run with different parameters'))
+        base_commit = ((baseline.get('metadata') or {}).get('git') or {}).get('commit', 'unknown')
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Compared with {base_commit[:12]}'))
+        for key, old, new, change in compare_metrics(report, baseline, COMPARED_METRICS):
+            change = f'{change:+.1f}%' if change is not None else 'n/a'
+            self.stdout.write(f'  {key.split(".", 1)[1]:<32} {old:>10.2f} -> {new:>10.2f}  {change}')
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.chat.partitions import ensure_partitions
+
+
+class Command(BaseCommand):
+    help = 'Create monthly chat_message partitions from the current month ahead'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead', type=int, default=settings.CHAT_MESSAGE_PARTITIONS_AHEAD,
+            help='Number of future months to create partitions for'
+        )
+
+    def handle(self, *args, **options):
+        created = ensure_partitions(options['months_ahead'])
+        for name in created:
+            self.stdout.write(f'Created {name}')
+        self.stdout.write(self.style.SUCCESS(f'Created {len(created)} chat message partitions'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from apps.chat.persistence import message_write_buffer
+
+
+class Command(BaseCommand):
+    help = 'Persist chat messages buffered by write-behind mode (including unflushed replays)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        flushed = message_write_buffer.flush(batch_size=options.get('batch_size'))
+        self.stdout.write(self.style.SUCCESS(f'Flushed {flushed} chat messages'))
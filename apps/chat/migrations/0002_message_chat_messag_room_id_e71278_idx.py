@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['room', 'is_deleted', 'created_at', 'id'], name='chat_messag_room_id_e71278_idx'),
+        ),
+    ]
@@ -0,0 +1,91 @@
+from django.db import migrations
+
+
+# Rebuild chat_message as a table partitioned by month of created_at.
+#
+# Partitioned tables need the partition key in every unique constraint, so the
+# primary key becomes (id, created_at); ids stay unique through the sequence.
+# Monthly partitions are created for the existing data plus three months
+# ahead, with a default partition as a safety net. Later partitions are
+# created by `manage.py create_message_partitions` (also run by celery beat).
+#
+# Rows are copied into the new table, so run it in a maintenance window on
+# large installations. Index and constraint names are kept, so the migration
+# state does not change.
+PARTITION_MESSAGES = """
+SET LOCAL TIME ZONE 'UTC';
+
+ALTER TABLE chat_message RENAME TO chat_message_unpartitioned;
+DO $$
+BEGIN
+    EXECUTE format(
+        'ALTER SEQUENCE %s RENAME TO chat_message_unpartitioned_id_seq',
+        pg_get_serial_sequence('chat_message_unpartitioned', 'id')
+    );
+END
+$$;
+
+CREATE SEQUENCE chat_message_id_seq;
+CREATE TABLE chat_message (
+    id bigint NOT NULL DEFAULT nextval('chat_message_id_seq'),
+    content text NOT NULL,
+    created_at timestamp with time zone NOT NULL,
+    updated_at timestamp with time zone NOT NULL,
+    is_deleted boolean NOT NULL,
+    room_id bigint NOT NULL,
+    sender_id bigint NOT NULL,
+    search_vector tsvector
+) PARTITION BY RANGE (created_at);
+ALTER SEQUENCE chat_message_id_seq OWNED BY chat_message.id;
+
+DO $$
+DECLARE
+    month timestamp with time zone := date_trunc(
+        'month', coalesce((SELECT min(created_at) FROM chat_message_unpartitioned), now())
+    );
+BEGIN
+    WHILE month <= date_trunc('month', now()) + interval '3 months' LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF chat_message FOR VALUES FROM (%L) TO (%L)',
+            'chat_message_p' || to_char(month, 'YYYY_MM'), month, month + interval '1 month'
+        );
+        month := month + interval '1 month';
+    END LOOP;
+END
+$$;
+CREATE TABLE chat_message_default PARTITION OF chat_message DEFAULT;
+
+INSERT INTO chat_message (id, content, created_at, updated_at, is_deleted, room_id, sender_id, search_vector)
+SELECT id, content, created_at, updated_at, is_deleted, room_id, sender_id, search_vector
+FROM chat_message_unpartitioned;
+
+-- Continue after ids already handed out (write-behind reserves them in blocks)
+SELECT setval('chat_message_id_seq', last_value, is_called) FROM chat_message_unpartitioned_id_seq;
+DROP TABLE chat_message_unpartitioned;
+
+ALTER TABLE chat_message ADD CONSTRAINT chat_message_pkey PRIMARY KEY (id, created_at);
+CREATE INDEX chat_messag_room_id_e71278_idx ON chat_message (room_id, is_deleted, created_at, id);
+CREATE INDEX chat_message_room_id_5e7d8d78 ON chat_message (room_id);
+CREATE INDEX chat_message_sender_id_991c686c ON chat_message (sender_id);
+CREATE INDEX chat_message_search_idx ON chat_message USING gin (search_vector);
+
+ALTER TABLE chat_message ADD CONSTRAINT chat_message_room_id_5e7d8d78_fk_chat_chatroom_id
+    FOREIGN KEY (room_id) REFERENCES chat_chatroom (id) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE chat_message ADD CONSTRAINT chat_message_sender_id_991c686c_fk_users_id
+    FOREIGN KEY (sender_id) REFERENCES users (id) DEFERRABLE INITIALLY DEFERRED;
+
+CREATE TRIGGER chat_message_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF content ON chat_message
+    FOR EACH ROW EXECUTE FUNCTION chat_message_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_message_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunSQL(PARTITION_MESSAGES),
+    ]
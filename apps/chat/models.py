@@ -1,12 +1,58 @@
+from datetime import datetime, timezone as dt_timezone
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from apps.authentication.models import User
 
+
+class ChatRoomQuerySet(models.QuerySet):
+    def with_summary(self, user):
+        """
+        Annotate participants_count, last message fields and the user's
+        unread_count with correlated subqueries, so listing rooms is a
+        single query regardless of page size.
+        """
+        participants = ChatRoom.participants.through.objects.filter(
+            chatroom_id=OuterRef('pk')
+        ).order_by().values('chatroom_id').annotate(count=Count('*')).values('count')
+        
+        last_message = Message.objects.filter(
+            room_id=OuterRef('pk'),
+            is_deleted=False
+        ).order_by('-created_at', '-id')
+        
+        last_read_at = ChatReadReceipt.objects.filter(
+            room_id=OuterRef(OuterRef('pk')),
+            user=user
+        ).values('last_read_at')[:1]
+        unread = Message.objects.filter(
+            room_id=OuterRef('pk'),
+            is_deleted=False,
+            created_at__gt=Coalesce(
+                Subquery(last_read_at),
+                Value(datetime(1970, 1, 1, tzinfo=dt_timezone.utc))
+            )
+        ).exclude(sender=user).order_by().values('room_id').annotate(count=Count('*')).values('count')
+        
+        return self.annotate(
+            participants_count=Coalesce(Subquery(participants), 0),
+            last_message_id=Subquery(last_message.values('id')[:1]),
+            last_message_content=Subquery(last_message.values('content')[:1]),
+            last_message_created_at=Subquery(last_message.values('created_at')[:1]),
+            unread_count=Coalesce(Subquery(unread), 0)
+        )
+
+
 class ChatRoom(models.Model):
     name = models.CharField(max_length=100)
     participants = models.ManyToManyField(User, related_name='chat_rooms')
     is_private = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = ChatRoomQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Chat Room'
@@ -22,11 +68,47 @@ class Message(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_deleted = models.BooleanField(default=False)
+    # Maintained by a database trigger from content (see migration 0004)
+    search_vector = SearchVectorField(null=True, editable=False)
     
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Message'
         verbose_name_plural = 'Messages'
+        indexes = [
+            # Keyset pagination of room history by (created_at, id)
+            models.Index(fields=['room', 'is_deleted', 'created_at', 'id']),
+            # Full-text search over content
+            GinIndex(fields=['search_vector'], name='chat_message_search_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.sender.username}: {self.content[:50]}"
+
+
+class ChatReadReceipt(models.Model):
+    """Per-user read watermark: messages created after last_read_at are unread"""
+    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name='read_receipts')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_read_receipts')
+    last_read_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['room', 'user']
+        verbose_name = 'Chat Read Receipt'
+        verbose_name_plural = 'Chat Read Receipts'
     
     def __str__(self):
-        return f"{self.sender.username}: {self.content[:50]}"
\ No newline at end of file
+        return f"{self.user.username} read room {self.room_id} up to {self.last_read_at}"
+    
+    @classmethod
+    def mark_read(cls, room_id, user, read_at):
+        """Move the watermark forward (never backwards)"""
+        receipt, created = cls.objects.get_or_create(
+            room_id=room_id,
+            user=user,
+            defaults={'last_read_at': read_at}
+        )
+        if not created and receipt.last_read_at < read_at:
+            cls.objects.filter(pk=receipt.pk, last_read_at__lt=read_at).update(last_read_at=read_at)
+        return read_at
@@ -0,0 +1,29 @@
+from django.conf import settings
+from core.base.pagination import KeysetPaginator, KeysetPagination
+
+
+# (created_at, id) is unique and backed by the (room, is_deleted, created_at, id) index
+MESSAGE_ORDERING = ('-created_at', '-id')
+
+
+def get_message_paginator():
+    """Keyset paginator for room message history (REST and WebSocket)"""
+    return KeysetPaginator(
+        ordering=MESSAGE_ORDERING,
+        page_size=settings.CHAT_MESSAGES_PAGE_SIZE,
+        max_page_size=settings.CHAT_MESSAGES_MAX_PAGE_SIZE
+    )
+
+
+class MessageKeysetPagination(KeysetPagination):
+    """Cursor pagination for message history"""
+    ordering = MESSAGE_ORDERING
+    page_size = settings.CHAT_MESSAGES_PAGE_SIZE
+    max_page_size = settings.CHAT_MESSAGES_MAX_PAGE_SIZE
+
+
+class MessageSearchPagination(KeysetPagination):
+    """Cursor pagination for search results, most relevant first"""
+    ordering = ('-rank', '-id')
+    page_size = settings.CHAT_MESSAGES_PAGE_SIZE
+    max_page_size = settings.CHAT_MESSAGES_MAX_PAGE_SIZE
@@ -0,0 +1,126 @@
+import logging
+from datetime import datetime, timezone as dt_timezone
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+PARENT_TABLE = 'chat_message'
+DEFAULT_PARTITION = 'chat_message_default'
+ARCHIVE_SCHEMA = 'chat_archive'
+
+
+def month_start(value):
+    """First moment (UTC) of the month of value"""
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month):
+    return f'{PARENT_TABLE}_p{month:%Y_%m}'
+
+
+def list_partitions():
+    """Monthly partitions of chat_message as [(month, table name)], oldest first"""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s AND child.relname <> %s
+        """, [PARENT_TABLE, DEFAULT_PARTITION])
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        month = datetime.strptime(name[len(PARENT_TABLE) + 2:], '%Y_%m').replace(tzinfo=dt_timezone.utc)
+        partitions.append((month, name))
+    return sorted(partitions)
+
+
+def create_partition(month):
+    """
+    Create the partition of one month. Rows of that month that landed in the
+    default partition (no partition existed at insert time) are moved into it.
+    """
+    name = partition_name(month)
+    bounds = [month, add_months(month, 1)]
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s)',
+            bounds
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(
+                f'CREATE TABLE {name} PARTITION OF {PARENT_TABLE} FOR VALUES FROM (%s) TO (%s)',
+                bounds
+            )
+            return name
+
+        logger.warning(f"Moving rows of {month:%Y-%m} out of {DEFAULT_PARTITION}")
+        cursor.execute(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}')
+        cursor.execute(
+            f'CREATE TABLE {name} PARTITION OF {PARENT_TABLE} FOR VALUES FROM (%s) TO (%s)',
+            bounds
+        )
+        cursor.execute(
+            f'INSERT INTO {PARENT_TABLE} SELECT * FROM {DEFAULT_PARTITION} '
+            f'WHERE created_at >= %s AND created_at < %s',
+            bounds
+        )
+        cursor.execute(
+            f'DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s',
+            bounds
+        )
+        cursor.execute(f'ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT')
+    return name
+
+
+def ensure_partitions(months_ahead):
+    """Create missing partitions from the current month to months_ahead; returns created names"""
+    existing = {month for month, name in list_partitions()}
+    current = month_start(timezone.now())
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month not in existing:
+            created.append(create_partition(month))
+    return created
+
+
+def archive_partitions(before, drop=False, dry_run=False):
+    """
+    Detach partitions of months before `before` from chat_message. Detached
+    tables are moved to the chat_archive schema (still queryable, ready for
+    pg_dump) or dropped. Returns affected table names.
+    """
+    names = [name for month, name in list_partitions() if month < month_start(before)]
+    if dry_run or not names:
+        return names
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not drop:
+            cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}')
+        for name in names:
+            cursor.execute(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}')
+            if drop:
+                cursor.execute(f'DROP TABLE {name}')
+                continue
+
+            # Detached partitions keep the foreign keys of the parent, which
+            # would block deleting rooms and users referenced by archived rows
+            cursor.execute(
+                "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+                [name]
+            )
+            for (constraint,) in cursor.fetchall():
+                cursor.execute(f'ALTER TABLE {name} DROP CONSTRAINT {constraint}')
+            cursor.execute(f'ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}')
+    return names
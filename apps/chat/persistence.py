@@ -0,0 +1,172 @@
+import json
+import logging
+import threading
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from core.redis.client import redis_client
+from .models import Message
+
+logger = logging.getLogger(__name__)
+
+
+# Atomically move up to ARGV[1] entries from the buffer to the processing list
+MOVE_BATCH_SCRIPT = """
+local items = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #items > 0 then
+    redis.call('RPUSH', KEYS[2], unpack(items))
+    redis.call('LTRIM', KEYS[1], #items, -1)
+end
+return items
+"""
+
+
+class MessageIdAllocator:
+    """Reserve message IDs from the chat_message sequence in blocks"""
+
+    def __init__(self, block_size=100):
+        self.block_size = block_size
+        self._ids = []
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        with self._lock:
+            if not self._ids:
+                self._ids = self._reserve_block()
+            return self._ids.pop(0)
+
+    def _reserve_block(self):
+        table = Message._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+                [table, self.block_size]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class MessageWriteBuffer:
+    """
+    Write-behind persistence for chat messages.
+
+    The consumer assigns the ID (reserved from the Postgres sequence) and the
+    drainer moves batches to a processing list and persists them with a
+    multi-row INSERT. Entries left in the processing list by a crashed drainer are
+    replayed on the next flush; rows that are already stored are skipped, so
+    replay is safe.
+    """
+
+    BUFFER_KEY = 'chat:write_buffer'
+    PROCESSING_KEY = 'chat:write_buffer:processing'
+    LOCK_KEY = 'chat:write_buffer:lock'
+    # Rows per INSERT statement
+    INSERT_BATCH_SIZE = 1000
+
+    def __init__(self):
+        self.id_allocator = MessageIdAllocator(settings.CHAT_WRITE_BEHIND_ID_BLOCK_SIZE)
+        self._move_batch = None
+
+    @property
+    def enabled(self):
+        return settings.CHAT_WRITE_BEHIND_ENABLED and connection.vendor == 'postgresql'
+
+    @property
+    def batch_size(self):
+        return settings.CHAT_WRITE_BEHIND_BATCH_SIZE
+
+    def enqueue(self, room_id, sender, content):
+        """Build message with final ID and timestamps and buffer it for persistence"""
+        now = timezone.now()
+        message = Message(
+            id=self.id_allocator.next_id(),
+            room_id=room_id,
+            sender=sender,
+            content=content,
+            created_at=now,
+            updated_at=now
+        )
+
+        length = redis_client.rpush(self.BUFFER_KEY, json.dumps({
+            'id': message.id,
+            'room_id': message.room_id,
+            'sender_id': sender.id,
+            'content': content,
+            'created_at': now.isoformat(),
+            'updated_at': now.isoformat()
+        }))
+
+        # Don't wait for the periodic drain once a full batch is waiting
+        if length % self.batch_size == 0:
+            from .tasks import flush_message_buffer_task
+            flush_message_buffer_task.delay()
+
+        return message
+
+    def flush(self, batch_size=None):
+        """Persist buffered messages; returns number of rows written"""
+        batch_size = batch_size or self.batch_size
+        total = 0
+
+        with redis_client.lock(self.LOCK_KEY, timeout=300, blocking_timeout=10):
+            # Replay entries of a drainer that died between move and delete
+            pending = redis_client.lrange(self.PROCESSING_KEY, 0, -1)
+            if pending:
+                logger.warning(f"Replaying {len(pending)} unflushed chat messages")
+                total += self._persist(pending)
+                redis_client.delete(self.PROCESSING_KEY)
+
+            while True:
+                items = self._get_move_batch()(
+                    keys=[self.BUFFER_KEY, self.PROCESSING_KEY],
+                    args=[batch_size]
+                )
+                if not items:
+                    break
+                total += self._persist(items)
+                redis_client.delete(self.PROCESSING_KEY)
+
+        return total
+
+    def _get_move_batch(self):
+        if self._move_batch is None:
+            self._move_batch = redis_client.register_script(MOVE_BATCH_SCRIPT)
+        return self._move_batch
+
+    def _persist(self, items):
+        rows = [json.loads(item) for item in items]
+        # Replayed rows may already be stored. chat_message is partitioned and
+        # its primary key is (id, created_at), so a conflict on insert can't
+        # catch them - skip known ids instead (drains are serialized by the lock)
+        existing = set(
+            Message.objects.filter(id__in=[row['id'] for row in rows]).values_list('id', flat=True)
+        )
+        rows = [row for row in rows if row['id'] not in existing]
+        if not rows:
+            return 0
+
+        # One INSERT with the timestamps clients already received: bulk_create
+        # would stamp flush time (auto_now_add/auto_now), and fixing that with
+        # an UPDATE rewrites the partition key
+        fields = [Message._meta.get_field(name) for name in (
+            'id', 'room', 'sender', 'content', 'created_at', 'updated_at', 'is_deleted'
+        )]
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        table = connection.ops.quote_name(Message._meta.db_table)
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Statements stay under the driver's parameter limit for any batch size
+            for start in range(0, len(rows), self.INSERT_BATCH_SIZE):
+                batch = rows[start:start + self.INSERT_BATCH_SIZE]
+                params = []
+                for row in batch:
+                    params += [
+                        row['id'], row['room_id'], row['sender_id'], row['content'],
+                        parse_datetime(row['created_at']), parse_datetime(row['updated_at']), False
+                    ]
+                placeholders = ', '.join(['(' + ', '.join(['%s'] * len(fields)) + ')'] * len(batch))
+                cursor.execute(f'INSERT INTO {table} ({columns}) VALUES {placeholders}', params)
+
+        return len(rows)
+
+
+message_write_buffer = MessageWriteBuffer()
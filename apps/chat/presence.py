@@ -0,0 +1,194 @@
+import asyncio
+import json
+import logging
+import time
+from django.conf import settings
+from redis.exceptions import RedisError
+from core.redis.client import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+def presence_frame(online=(), offline=(), typing=(), stopped_typing=()):
+    """Room frame with presence and typing changes since the previous frame"""
+    return {
+        'type': 'presence',
+        'online': sorted(online),
+        'offline': sorted(offline),
+        'typing': sorted(typing),
+        'stopped_typing': sorted(stopped_typing)
+    }
+
+
+class PresenceService:
+    """
+    Who is connected to which chat room.
+
+    Every WebSocket connection is a `user_id:channel_name` member of the
+    room's sorted set, scored by its last heartbeat. Connections that stop
+    heart-beating (crashed worker, lost network) fall out after the TTL: they
+    are ignored by reads and removed by the periodic sweep. A user is online
+    while at least one of their connections is live.
+    """
+
+    ROOMS_KEY = 'chat:presence:rooms'
+
+    @property
+    def enabled(self):
+        return settings.CHAT_PRESENCE_ENABLED
+
+    @property
+    def ttl(self):
+        return settings.CHAT_PRESENCE_TTL
+
+    def _key(self, room_id):
+        return f'chat:presence:{room_id}'
+
+    @staticmethod
+    def _user_ids(members):
+        return {int(member.split(':', 1)[0]) for member in members}
+
+    def join(self, room_id, user_id, channel_name):
+        """
+        Register connection; returns (online user ids, whether the user
+        was already online through another connection)
+        """
+        now = time.time()
+        key = self._key(room_id)
+        pipe = redis_client.pipeline()
+        pipe.zrangebyscore(key, now - self.ttl, '+inf')
+        pipe.zadd(key, {f'{user_id}:{channel_name}': now})
+        pipe.expire(key, self.ttl * 2)
+        pipe.sadd(self.ROOMS_KEY, room_id)
+        live_members = pipe.execute()[0]
+
+        online = self._user_ids(live_members)
+        was_online = user_id in online
+        online.add(user_id)
+        return online, was_online
+
+    def heartbeat(self, room_id, user_id, channel_name):
+        """
+        Keep connection live for another TTL; returns True when the user had
+        no live connection (expired or swept) and is back online
+        """
+        now = time.time()
+        key = self._key(room_id)
+        pipe = redis_client.pipeline()
+        pipe.zrangebyscore(key, now - self.ttl, '+inf')
+        pipe.zadd(key, {f'{user_id}:{channel_name}': now})
+        pipe.expire(key, self.ttl * 2)
+        # The sweep forgets rooms without live connections
+        pipe.sadd(self.ROOMS_KEY, room_id)
+        live_members = pipe.execute()[0]
+        return user_id not in self._user_ids(live_members)
+
+    def leave(self, room_id, user_id, channel_name):
+        """Remove connection; returns True when the user has no live connections left"""
+        key = self._key(room_id)
+        pipe = redis_client.pipeline()
+        pipe.zrem(key, f'{user_id}:{channel_name}')
+        pipe.zrangebyscore(key, time.time() - self.ttl, '+inf')
+        live_members = pipe.execute()[1]
+        return user_id not in self._user_ids(live_members)
+
+    def get_online(self, room_ids):
+        """Map room_id -> set of online user ids, in one round trip"""
+        if not room_ids:
+            return {}
+        cutoff = time.time() - self.ttl
+        pipe = redis_client.pipeline(transaction=False)
+        for room_id in room_ids:
+            pipe.zrangebyscore(self._key(room_id), cutoff, '+inf')
+        results = pipe.execute()
+        return {
+            room_id: self._user_ids(members)
+            for room_id, members in zip(room_ids, results)
+        }
+
+    def sweep(self):
+        """
+        Drop expired connections of all rooms.
+        Returns map room_id -> user ids that went offline.
+        """
+        cutoff = time.time() - self.ttl
+        offline = {}
+
+        for room_id in redis_client.smembers(self.ROOMS_KEY):
+            key = self._key(room_id)
+            pipe = redis_client.pipeline()
+            pipe.zrangebyscore(key, '-inf', cutoff)
+            pipe.zremrangebyscore(key, '-inf', cutoff)
+            pipe.zrangebyscore(key, f'({cutoff}', '+inf')
+            expired, _, live_members = pipe.execute()
+
+            if not live_members:
+                redis_client.srem(self.ROOMS_KEY, room_id)
+
+            gone = self._user_ids(expired) - self._user_ids(live_members)
+            if gone:
+                offline[int(room_id)] = gone
+
+        return offline
+
+
+class PresenceBroadcaster:
+    """
+    Per-process aggregator of presence and typing changes.
+
+    Changes of a room group are collected and sent as one `presence` frame
+    at most once per interval; only the last state of each user within the
+    interval is sent, so typing bursts and reconnect flapping collapse.
+    """
+
+    def __init__(self, interval=None):
+        if interval is None:
+            interval = settings.CHAT_PRESENCE_BROADCAST_INTERVAL_MS / 1000
+        self.interval = interval
+        self._pending = {}
+        self._flush_tasks = {}
+
+    def set_online(self, channel_layer, group, user_id, online=True):
+        self._update(channel_layer, group, 'status', user_id, online)
+
+    def set_typing(self, channel_layer, group, user_id, typing=True):
+        self._update(channel_layer, group, 'typing', user_id, typing)
+
+    def _update(self, channel_layer, group, kind, user_id, value):
+        pending = self._pending.setdefault(group, {'status': {}, 'typing': {}})
+        pending[kind][user_id] = value
+        if kind == 'status' and not value:
+            # Gone users can't keep typing
+            pending['typing'][user_id] = False
+
+        if group not in self._flush_tasks:
+            self._flush_tasks[group] = asyncio.ensure_future(self._delayed_flush(channel_layer, group))
+
+    async def flush(self, channel_layer, group):
+        self._flush_tasks.pop(group, None)
+        pending = self._pending.pop(group, None)
+        if not pending:
+            return
+
+        status, typing = pending['status'], pending['typing']
+        frame = presence_frame(
+            online=[user_id for user_id, online in status.items() if online],
+            offline=[user_id for user_id, online in status.items() if not online],
+            typing=[user_id for user_id, value in typing.items() if value],
+            stopped_typing=[user_id for user_id, value in typing.items() if not value]
+        )
+        await channel_layer.group_send(group, {
+            'type': 'chat.frame',
+            'text': json.dumps(frame)
+        })
+
+    async def _delayed_flush(self, channel_layer, group):
+        await asyncio.sleep(self.interval)
+        try:
+            await self.flush(channel_layer, group)
+        except Exception as e:
+            logger.error(f"Error flushing presence changes for {group}: {e}")
+
+
+presence_service = PresenceService()
+presence_broadcaster = PresenceBroadcaster()
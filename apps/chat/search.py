@@ -0,0 +1,31 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from .models import Message
+
+# Text search configuration; must match the trigger in migration 0004
+SEARCH_CONFIG = 'simple'
+
+
+def search_messages(user, query, room_id=None, sender_id=None):
+    """
+    Messages from the user's rooms matching a web-search style query
+    ("quoted phrase", -excluded, or), annotated with relevance `rank`.
+    Matching is answered by the GIN index on search_vector.
+    """
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    messages = Message.objects.filter(
+        room_id__in=user.chat_rooms.values('id'),
+        is_deleted=False,
+        search_vector=search_query
+    )
+    if room_id is not None:
+        messages = messages.filter(room_id=room_id)
+    if sender_id is not None:
+        messages = messages.filter(sender_id=sender_id)
+    
+    # ts_rank() returns real; as double precision the value survives the
+    # round trip through the pagination cursor exactly
+    return messages.annotate(
+        rank=Cast(SearchRank(F('search_vector'), search_query), FloatField())
+    ).select_related('sender')
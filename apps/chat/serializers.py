@@ -1,3 +1,4 @@
+from django.utils.dateparse import parse_datetime
 from core.base.common_imports import *
 from core.error_handling import ErrorCode
 from .models import ChatRoom, Message
@@ -30,6 +31,14 @@ class MessageSerializer(BaseMessageSerializer):
         read_only_fields = ['id', 'sender_username', 'created_at', 'updated_at']
 
 
+class MessageSearchResultSerializer(MessageSerializer):
+    rank = serializers.FloatField(read_only=True)
+    
+    class Meta(MessageSerializer.Meta):
+        fields = ['id', 'room', 'content', 'sender_username', 'created_at', 'updated_at', 'rank']
+        read_only_fields = fields
+
+
 class MessageCreateSerializer(BaseMessageSerializer):
     class Meta:
         model = Message
@@ -42,23 +51,38 @@ class MessageUpdateSerializer(BaseMessageSerializer):
         fields = ['content']
 
 class ChatRoomSerializer(serializers.ModelSerializer):
-    participants_count = serializers.IntegerField(source='participants.count', read_only=True)
+    """Room summary; expects a queryset annotated with ChatRoom.objects.with_summary()"""
+    participants_count = serializers.IntegerField(read_only=True)
+    unread_count = serializers.IntegerField(read_only=True)
     last_message = serializers.SerializerMethodField()
     
     class Meta:
         model = ChatRoom
-        fields = ['id', 'name', 'participants_count', 'is_private', 'created_at', 'last_message']
-        read_only_fields = ['id', 'participants_count', 'created_at']
+        fields = ['id', 'name', 'participants_count', 'unread_count', 'is_private', 'created_at', 'last_message']
+        read_only_fields = ['id', 'participants_count', 'unread_count', 'created_at']
     
     def get_last_message(self, obj):
-        last_message = obj.messages.filter(is_deleted=False).first()
-        if last_message:
+        # Warm recent message cache wins: with write-behind enabled it is
+        # ahead of the database
+        last_messages = self.context.get('last_messages', {})
+        if obj.id in last_messages:
+            cached = last_messages[obj.id]
+            if cached is None:
+                return None
             return {
-                'id': last_message.id,
-                'content': last_message.content,
-                'created_at': last_message.created_at
+                'id': cached['id'],
+                'content': cached['content'],
+                # Rendered like the datetime of the database path
+                'created_at': parse_datetime(cached['created_at'])
             }
-        return None
+        
+        if obj.last_message_id is None:
+            return None
+        return {
+            'id': obj.last_message_id,
+            'content': obj.last_message_content,
+            'created_at': obj.last_message_created_at
+        }
 
 class ChatRoomCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete
+from django.dispatch import receiver
+from .access import room_membership_cache
+from .models import ChatRoom
+
+
+@receiver(m2m_changed, sender=ChatRoom.participants.through)
+def invalidate_room_members_on_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Drop cached participant sets when room membership changes"""
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    
+    if not reverse:
+        room_ids = [instance.pk]
+    elif action == 'pre_clear':
+        # user.chat_rooms.clear() - pk_set is empty, collect rooms before they go
+        room_ids = list(instance.chat_rooms.values_list('pk', flat=True))
+    else:
+        room_ids = list(pk_set or [])
+    
+    transaction.on_commit(lambda: room_membership_cache.invalidate(*room_ids))
+
+
+@receiver(post_delete, sender=ChatRoom)
+def invalidate_room_members_on_delete(sender, instance, **kwargs):
+    """Drop cached participant set of deleted room"""
+    transaction.on_commit(lambda: room_membership_cache.invalidate(instance.pk))
@@ -0,0 +1,53 @@
+import json
+from asgiref.sync import async_to_sync
+from celery import shared_task
+from channels.layers import get_channel_layer
+from django.conf import settings
+from .partitions import ensure_partitions
+from .persistence import message_write_buffer
+from .presence import presence_service, presence_frame
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=3)
+def flush_message_buffer_task(self):
+    """Persist chat messages buffered by write-behind mode"""
+    try:
+        flushed = message_write_buffer.flush()
+        return f"Flushed {flushed} chat messages"
+    except Exception as e:
+        logger.error(f"Failed to flush chat message buffer: {e}")
+        if self.request.retries < self.max_retries:
+            raise self.retry(countdown=5, exc=e)
+        return f"Chat message flush failed: {str(e)}"
+
+
+@shared_task
+def sweep_presence_task():
+    """Drop expired presence entries and announce users who went offline"""
+    try:
+        offline = presence_service.sweep()
+    except Exception as e:
+        logger.error(f"Failed to sweep chat presence: {e}")
+        return f"Presence sweep failed: {str(e)}"
+    
+    channel_layer = get_channel_layer()
+    for room_id, user_ids in offline.items():
+        async_to_sync(channel_layer.group_send)(f'chat_{room_id}', {
+            'type': 'chat.frame',
+            'text': json.dumps(presence_frame(offline=user_ids))
+        })
+    return f"Swept presence of {len(offline)} rooms"
+
+
+@shared_task
+def create_message_partitions_task():
+    """Make sure chat_message partitions exist for the coming months"""
+    try:
+        created = ensure_partitions(settings.CHAT_MESSAGE_PARTITIONS_AHEAD)
+        return f"Created {len(created)} chat message partitions"
+    except Exception as e:
+        logger.error(f"Failed to create chat message partitions: {e}")
+        return f"Partition creation failed: {str(e)}"
@@ -1,16 +1,19 @@
 from django.urls import path
 from .views import (
-    ChatRoomListCreateView, ChatRoomDetailView,
-    MessageListCreateView, MessageDetailView, MessageListByRoomView
+    ChatRoomListCreateView, ChatRoomDetailView, ChatRoomMarkReadView, ChatRoomOnlineView,
+    MessageListCreateView, MessageDetailView, MessageListByRoomView, MessageSearchView
 )
 
 urlpatterns = [
     # Chat Room URLs
     path('rooms/', ChatRoomListCreateView.as_view(), name='chatroom-list-create'),
+    path('rooms/online/', ChatRoomOnlineView.as_view(), name='chatroom-online'),
     path('rooms/<int:pk>/', ChatRoomDetailView.as_view(), name='chatroom-detail'),
+    path('rooms/<int:pk>/read/', ChatRoomMarkReadView.as_view(), name='chatroom-mark-read'),
     
     # Message URLs
     path('messages/', MessageListCreateView.as_view(), name='message-list-create'),
+    path('messages/search/', MessageSearchView.as_view(), name='message-search'),
     path('messages/<int:pk>/', MessageDetailView.as_view(), name='message-detail'),
     path('rooms/<int:room_id>/messages/', MessageListByRoomView.as_view(), name='message-list-by-room'),
 ]
\ No newline at end of file
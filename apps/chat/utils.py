@@ -0,0 +1,11 @@
+def message_to_dict(message):
+    """Serialize message for WebSocket payloads"""
+    return {
+        'id': message.id,
+        'content': message.content,
+        'sender': message.sender.username,
+        'sender_id': message.sender.id,
+        'created_at': message.created_at.isoformat(),
+        'updated_at': message.updated_at.isoformat(),
+        'is_deleted': message.is_deleted
+    }
@@ -1,10 +1,18 @@
 from core.base.common_imports import *
-from .models import ChatRoom, Message
+from redis.exceptions import RedisError
+from .models import ChatRoom, Message, ChatReadReceipt
 from .serializers import (
     ChatRoomSerializer, ChatRoomCreateSerializer, ChatRoomUpdateSerializer,
-    MessageSerializer, MessageCreateSerializer, MessageUpdateSerializer
+    MessageSerializer, MessageCreateSerializer, MessageUpdateSerializer,
+    MessageSearchResultSerializer
 )
 from .permissions import ChatPermissions
+from .pagination import MessageKeysetPagination, MessageSearchPagination
+from .presence import presence_service
+from .access import room_membership_cache
+from .cache import recent_message_cache
+from .search import search_messages
+from .utils import message_to_dict
 
 
 class ChatRoomListCreateView(OptimizedListCreateView, ChatPermissions):
@@ -13,6 +21,12 @@ class ChatRoomListCreateView(OptimizedListCreateView, ChatPermissions):
     def get_serializer_class(self):
         return ChatRoomCreateSerializer if self.request.method == 'POST' else ChatRoomSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method == 'GET':
+            return queryset.with_summary(self.request.user)
+        return queryset
+
     @swagger_list_create(
         description="Create new chat room",
         response_schema=CHAT_ROOM_RESPONSE_SCHEMA,
@@ -25,6 +39,20 @@ class ChatRoomListCreateView(OptimizedListCreateView, ChatPermissions):
         chat_room = serializer.save()
         chat_room.participants.add(self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        rooms = page if page is not None else list(queryset)
+        
+        # Last messages of warm rooms come from the recent message cache in one round trip
+        context = self.get_serializer_context()
+        context['last_messages'] = recent_message_cache.get_latest_many([room.id for room in rooms])
+        serializer = self.get_serializer(rooms, many=True, context=context)
+        
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
 
 class ChatRoomDetailView(OptimizedRetrieveUpdateDestroyView, ChatPermissions):
     queryset = ChatRoom.objects.all()
@@ -34,6 +62,110 @@ class ChatRoomDetailView(OptimizedRetrieveUpdateDestroyView, ChatPermissions):
             return ChatRoomUpdateSerializer
         return ChatRoomSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method == 'GET':
+            return queryset.with_summary(self.request.user)
+        return queryset
+
+
+class ChatRoomMarkReadView(BaseAPIView):
+    """Mark room messages as read up to a message (or up to now)"""
+
+    @swagger_auto_schema(
+        operation_description="Move the current user's read watermark in a room. "
+                              "Without message_id everything up to now is marked as read",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'message_id': openapi.Schema(type=openapi.TYPE_INTEGER)
+            }
+        ),
+        responses={
+            200: openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'message': openapi.Schema(type=openapi.TYPE_STRING),
+                    'last_read_at': openapi.Schema(type=openapi.TYPE_STRING)
+                }
+            ),
+            404: ERROR_404_SCHEMA
+        }
+    )
+    @transaction.atomic
+    def post(self, request, pk):
+        if not ChatRoom.objects.filter(id=pk, participants=request.user).exists():
+            raise CustomValidationError(ErrorCode.CHAT_ACCESS_DENIED)
+        
+        message_id = request.data.get('message_id')
+        if message_id:
+            try:
+                read_at = Message.objects.get(id=message_id, room_id=pk).created_at
+            except (Message.DoesNotExist, ValueError):
+                raise CustomValidationError(ErrorCode.MESSAGE_NOT_FOUND)
+        else:
+            read_at = timezone.now()
+        
+        ChatReadReceipt.mark_read(pk, request.user, read_at)
+        return self.get_success_response(
+            data={'last_read_at': read_at.isoformat()},
+            message='Messages marked as read'
+        )
+
+
+class ChatRoomOnlineView(BaseAPIView):
+    """Online participants of several rooms at once"""
+    
+    MAX_ROOMS = 100
+
+    @swagger_auto_schema(
+        operation_description="Online user ids per room. Rooms the user is not a participant of are skipped",
+        manual_parameters=[
+            openapi.Parameter(
+                'room_ids', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True,
+                description="Comma-separated room ids"
+            ),
+        ],
+        responses={
+            200: openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'message': openapi.Schema(type=openapi.TYPE_STRING),
+                    'online': openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        additional_properties=openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Schema(type=openapi.TYPE_INTEGER)
+                        )
+                    )
+                }
+            )
+        }
+    )
+    def get(self, request):
+        try:
+            room_ids = [int(room_id) for room_id in request.query_params.get('room_ids', '').split(',') if room_id]
+        except ValueError:
+            raise CustomValidationError(ErrorCode.INVALID_DATA, 'room_ids must be comma-separated integers')
+        if not room_ids or len(room_ids) > self.MAX_ROOMS:
+            raise CustomValidationError(ErrorCode.INVALID_DATA, f'Pass 1 to {self.MAX_ROOMS} room_ids')
+        if not presence_service.enabled:
+            raise CustomValidationError(ErrorCode.SYSTEM_SERVICE_UNAVAILABLE)
+        
+        room_ids = list(ChatRoom.objects.filter(
+            id__in=room_ids,
+            participants=request.user
+        ).values_list('id', flat=True))
+        
+        try:
+            online = presence_service.get_online(room_ids)
+        except RedisError as e:
+            logger.warning(f"Presence unavailable: {e}")
+            raise CustomValidationError(ErrorCode.SYSTEM_SERVICE_UNAVAILABLE)
+        
+        return self.get_success_response(
+            data={'online': {str(room_id): sorted(user_ids) for room_id, user_ids in online.items()}}
+        )
 
 
 
@@ -52,7 +184,10 @@ class MessageListCreateView(OptimizedListCreateView, ChatPermissions):
         return super().create(request, *args, **kwargs)
 
     def perform_create(self, serializer):
-        serializer.save(sender=self.request.user)
+        message = serializer.save(sender=self.request.user)
+        transaction.on_commit(
+            lambda: recent_message_cache.push(message.room_id, message_to_dict(message))
+        )
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -73,6 +208,14 @@ class MessageDetailView(OptimizedRetrieveUpdateDestroyView, ChatPermissions):
     def get_queryset(self):
         return super().get_queryset().filter(is_deleted=False)
 
+    def perform_update(self, serializer):
+        message = serializer.save()
+        transaction.on_commit(
+            lambda: recent_message_cache.update(
+                message.room_id, message.id, message.content, message.updated_at
+            )
+        )
+
     @swagger_auto_schema(
         operation_description="Update message",
         request_body=MessageUpdateSerializer,
@@ -118,6 +261,7 @@ class MessageDetailView(OptimizedRetrieveUpdateDestroyView, ChatPermissions):
         # Soft delete
         message.is_deleted = True
         message.save()
+        recent_message_cache.invalidate(message.room_id)
         
         return Response({
             'message': 'Message deleted successfully'
@@ -125,25 +269,30 @@ class MessageDetailView(OptimizedRetrieveUpdateDestroyView, ChatPermissions):
 
 
 class MessageListByRoomView(SwaggerMixin, ListAPIView, RoleBasedQuerysetMixin, ChatPermissions):
-    """Get messages for a specific room with pagination"""
+    """Get messages for a specific room with keyset (cursor) pagination"""
     serializer_class = MessageSerializer
+    pagination_class = MessageKeysetPagination
 
     def get_queryset(self):
         room_id = self.kwargs.get('room_id')
         return Message.objects.filter(
             room_id=room_id,
             is_deleted=False
-        ).select_related('sender').order_by('-created_at')
+        ).select_related('sender')
 
     @swagger_auto_schema(
-        operation_description="Get messages for a specific room",
+        operation_description="Get messages for a specific room, newest first. "
+                              "Pass `next_cursor` from the previous page as `cursor` to scroll back",
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        ],
         responses={
             200: openapi.Schema(
                 type=openapi.TYPE_OBJECT,
                 properties={
-                    'count': openapi.Schema(type=openapi.TYPE_INTEGER),
                     'next': openapi.Schema(type=openapi.TYPE_STRING),
-                    'previous': openapi.Schema(type=openapi.TYPE_STRING),
+                    'next_cursor': openapi.Schema(type=openapi.TYPE_STRING),
                     'results': openapi.Schema(
                         type=openapi.TYPE_ARRAY,
                         items=openapi.Schema(
@@ -165,12 +314,53 @@ class MessageListByRoomView(SwaggerMixin, ListAPIView, RoleBasedQuerysetMixin, C
     def get(self, request, *args, **kwargs):
         # Check if user has access to the room
         room_id = self.kwargs.get('room_id')
-        try:
-            room = ChatRoom.objects.get(id=room_id)
-            if not room.participants.filter(id=request.user.id).exists():
-                raise CustomValidationError(ErrorCode.PERMISSION_DENIED)
-        except ChatRoom.DoesNotExist:
-            raise CustomValidationError(ErrorCode.USER_NOT_FOUND)
+        if not room_membership_cache.is_member(room_id, request.user.id):
+            if not ChatRoom.objects.filter(id=room_id).exists():
+                raise CustomValidationError(ErrorCode.USER_NOT_FOUND)
+            raise CustomValidationError(ErrorCode.PERMISSION_DENIED)
         
         return super().get(request, *args, **kwargs)
 
+
+
+class MessageSearchView(SwaggerMixin, ListAPIView, ChatPermissions):
+    """Full-text search over messages of the user's rooms"""
+    serializer_class = MessageSearchResultSerializer
+    pagination_class = MessageSearchPagination
+    queryset = Message.objects.none()
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return super().get_queryset()
+        
+        params = self.request.query_params
+        query = params.get('q', '').strip()
+        if not query:
+            raise CustomValidationError(ErrorCode.MISSING_REQUIRED_FIELD, 'q is required')
+        
+        try:
+            room_id = int(params['room_id']) if params.get('room_id') else None
+            sender_id = int(params['sender_id']) if params.get('sender_id') else None
+        except ValueError:
+            raise CustomValidationError(ErrorCode.INVALID_DATA, 'room_id and sender_id must be integers')
+        
+        if room_id is not None and not room_membership_cache.is_member(room_id, self.request.user.id):
+            raise CustomValidationError(ErrorCode.CHAT_ACCESS_DENIED)
+        
+        return search_messages(self.request.user, query, room_id=room_id, sender_id=sender_id)
+
+    @swagger_auto_schema(
+        operation_description="Search messages of the user's rooms, most relevant first. "
+                              "`q` supports web-search syntax: \"exact phrase\", -exclude, or. "
+                              "Pass `next_cursor` from the previous page as `cursor` to get more results",
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('room_id', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter('sender_id', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        ],
+        tags=["Chat Messages"]
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
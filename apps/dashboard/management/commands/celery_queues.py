@@ -0,0 +1,36 @@
+import json
+from django.core.management.base import BaseCommand
+from banister_backend.celery import app
+from banister_backend.queues import WORKER_POOLS, queue_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Show depth, oldest message age and recent queue wait (p50/p95/p99) of every Celery '
+        'queue, in priority order, and the worker pools consuming them'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Print stats as JSON')
+
+    def handle(self, *args, **options):
+        stats = queue_stats(app)
+        if options['json']:
+            self.stdout.write(json.dumps(stats, indent=2))
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{'queue':<14} {'depth':>7} {'oldest':>9} {'wait p50':>9} {'p95':>8} {'p99':>8}  pools"
+        ))
+        for queue, queue_stat in stats.items():
+            wait = queue_stat['wait_seconds']
+            pools = ', '.join(name for name, pool in WORKER_POOLS.items() if queue in pool['queues'])
+            self.stdout.write(
+                f"{queue:<14} {queue_stat['depth']:>7} {self._seconds(queue_stat['oldest_age_seconds']):>9} "
+                f"{self._seconds(wait.get('p50')):>9} {self._seconds(wait.get('p95')):>8} "
+                f"{self._seconds(wait.get('p99')):>8}  {pools or self.style.WARNING('no pool')}"
+            )
+
+    @staticmethod
+    def _seconds(value):
+        return f'{value:.1f}s' if value is not None else '-'
@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class NotificationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.notifications'
-    verbose_name = 'Notifications' 
\ No newline at end of file
+    verbose_name = 'Notifications'
+    
+    def ready(self):
+        import apps.notifications.signals 
\ No newline at end of file
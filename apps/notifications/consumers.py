@@ -0,0 +1,69 @@
+import json
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from core.base.websocket_auth import websocket_authenticator
+from core.notifications.unread import unread_counter, notifications_group, unread_count_frame
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    """Live unread notification counter of the connected user"""
+    
+    async def connect(self):
+        """Handle WebSocket connection"""
+        self.user = await self.get_user_from_token()
+        if not self.user:
+            await self.close()
+            return
+        
+        self.group_name = notifications_group(self.user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        
+        # Current value; later changes arrive as notification frames
+        await self.send_unread_count()
+    
+    async def disconnect(self, close_code):
+        """Handle WebSocket disconnection"""
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+    
+    async def receive(self, text_data):
+        """Handle incoming WebSocket message"""
+        try:
+            data = json.loads(text_data)
+            if data.get('type') == 'get_unread_count':
+                await self.send_unread_count()
+        except json.JSONDecodeError:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': 'Invalid JSON'
+            }))
+        except Exception as e:
+            logger.error(f"Error in notification receive: {e}")
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': 'Internal server error'
+            }))
+    
+    async def send_unread_count(self):
+        count = await self.get_unread_count()
+        await self.send(text_data=json.dumps(unread_count_frame(count)))
+    
+    async def notification_frame(self, event):
+        """Forward pre-serialized notification frame to WebSocket"""
+        await self.send(text_data=event['text'])
+    
+    @database_sync_to_async
+    def get_user_from_token(self):
+        try:
+            return websocket_authenticator.authenticate(self.scope)
+        except Exception as e:
+            logger.error(f"Token validation error: {e}")
+            return None
+    
+    @database_sync_to_async
+    def get_unread_count(self):
+        return unread_counter.get(self.user.id)
@@ -0,0 +1,194 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from apps.authentication.models import User, UserFCMToken
+from core.base.benchmark import (
+    QueryCounter, benchmark_metadata, compare_metrics, eager_tasks, isolated_redis, load_results, write_results
+)
+from core.firebase.backends import LoopbackBackend
+from core.firebase.service import firebase_service
+from core.notifications.service import notification_service
+
+
+PATHS = ['per_user', 'send_to_multiple_users', 'send_to_admins']
+
+# Metrics per recipient count and path printed by --compare (lower is better for all of them)
+COMPARED_METRICS = ['ms_per_recipient', 'queries_per_recipient', 'fcm_requests_per_recipient']
+
+FEATURE_SETTINGS = ['NOTIFICATION_BULK_CHUNK_SIZE', 'NOTIFICATION_PUSH_MAX_RETRIES']
+
+NOTIFICATION_TYPE = 'Announcement'
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark notification fan-out in-process on a throwaway test database and a dedicated '
+        'Redis database, with Celery tasks run eagerly. Pushes go '
+        'to the loopback backend with simulated FCM latency. Reports wall time, queries and '
+        'FCM requests per recipient for the per-user path (send_notification in a loop) and '
+        'the bulk paths (send_to_multiple_users, send_to_admins); results can be saved and '
+        'compared across commits.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipients', default='100,1000,10000',
+                            help='Comma separated recipient counts')
+        parser.add_argument('--tokens-per-user', type=int, default=1, help='Active FCM tokens per recipient')
+        parser.add_argument('--invalid-tokens', type=float, default=0.0,
+                            help='Share of tokens FCM reports as unregistered (0-1)')
+        parser.add_argument('--latency-ms', type=int, default=20, help='Simulated FCM round trip per request')
+        parser.add_argument('--per-user-max', type=int, default=1000,
+                            help='Skip the per-user path above this many recipients')
+        parser.add_argument('--redis-db', type=int, required=True,
+                            help='Empty Redis database for counters and idempotency keys, flushed after the run')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the test database between runs')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--compare', help='Results JSON of a previous run to compare with')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['recipients'].split(',') if size.strip()]
+        overrides = {
+            'CHANNEL_LAYERS': {
+                'default': {
+                    'BACKEND': 'channels.layers.InMemoryChannelLayer',
+                    'CONFIG': {'capacity': 10000},
+                }
+            },
+            # Everything inline: no broker, digests off so every recipient is notified now
+            'NOTIFICATION_PUSH_ASYNC': False,
+            'NOTIFICATION_DIGEST_WINDOW_SECONDS': 0,
+            'PUSH_LOOPBACK_LATENCY_MS': options['latency_ms'],
+            'PUSH_LOOPBACK_INVALID_TOKEN_PREFIX': 'invalid-',
+        }
+
+        database_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb']
+        )
+        backend = firebase_service._backend
+        try:
+            # Recipient IDs collide with real users: no shared Redis keys, no tasks on the real broker
+            with override_settings(**overrides), isolated_redis(options['redis_db']), eager_tasks():
+                firebase_service._backend = LoopbackBackend()
+                results = {}
+                for size in sizes:
+                    results[str(size)] = self.run_size(size, options)
+                features = {name: getattr(settings, name) for name in FEATURE_SETTINGS}
+                report = {
+                    'benchmark': 'notifications',
+                    'metadata': benchmark_metadata(features=features),
+                    'params': {
+                        key: options[key]
+                        for key in ('recipients', 'tokens_per_user', 'invalid_tokens', 'latency_ms', 'per_user_max')
+                    },
+                    'results': results,
+                }
+        finally:
+            firebase_service._backend = backend
+            connection.creation.destroy_test_db(database_name, verbosity=0, keepdb=options['keepdb'])
+
+        self.print_report(report)
+        if options['output']:
+            write_results(options['output'], report)
+            self.stdout.write(f"Results written to {options['output']}")
+        if options['compare']:
+            self.print_comparison(report, load_results(options['compare']))
+
+    def run_size(self, size, options):
+        results = {}
+        for path in PATHS:
+            if path == 'per_user' and size > options['per_user_max']:
+                results[path] = {'skipped': True}
+                continue
+            # Fresh recipients per path: tokens pruned by one path don't change the next
+            users = self.setup_recipients(size, options['tokens_per_user'], options['invalid_tokens'])
+            try:
+                results[path] = self.measure(path, users)
+            finally:
+                # Retire instead of delete (no cascades): later send_to_admins runs reach only their own
+                User.objects.filter(id__in=[user.id for user in users]).update(role='customer')
+        return results
+
+    def setup_recipients(self, count, tokens_per_user, invalid_share):
+        """Create admins (send_to_admins reaches exactly them) with active FCM tokens"""
+        run_id = time.time_ns()
+        users = User.objects.bulk_create([
+            User(username=f'bench_{run_id}_{index}', email=f'bench_{run_id}_{index}@example.com', role='admin')
+            for index in range(count)
+        ])
+        tokens = [
+            (user, f'{run_id}-{user.id}-{index}')
+            for user in users for index in range(tokens_per_user)
+        ]
+        invalid_every = round(1 / invalid_share) if invalid_share else 0
+        UserFCMToken.objects.bulk_create([
+            UserFCMToken(
+                user=user,
+                token=f'invalid-{token}' if invalid_every and position % invalid_every == 0 else token,
+                device_type='android'
+            )
+            for position, (user, token) in enumerate(tokens)
+        ], batch_size=1000)
+        return users
+
+    def measure(self, path, users):
+        backend = firebase_service.backend
+        backend.reset()
+        queries = QueryCounter()
+        with queries.track():
+            started = time.perf_counter()
+            if path == 'per_user':
+                for user in users:
+                    notification_service.send_notification(user, NOTIFICATION_TYPE, data={'benchmark': path})
+            elif path == 'send_to_multiple_users':
+                notification_service.send_to_multiple_users(
+                    [user.id for user in users], NOTIFICATION_TYPE, data={'benchmark': path}, async_send=False
+                )
+            else:
+                notification_service.send_to_admins(NOTIFICATION_TYPE, data={'benchmark': path}, async_send=False)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+        recipients = len(users)
+        return {
+            'recipients': recipients,
+            'wall_ms': elapsed_ms,
+            'ms_per_recipient': elapsed_ms / recipients,
+            'queries': queries.count,
+            'queries_per_recipient': queries.count / recipients,
+            'fcm_requests': backend.requests,
+            'fcm_requests_per_recipient': backend.requests / recipients,
+            'pushes_sent': backend.count,
+        }
+
+    def print_report(self, report):
+        git = report['metadata']['git'] or {}
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Notification benchmark @ {git.get('commit', 'unknown')[:12]} ({report['metadata']['database']}, "
+            f"FCM latency {report['params']['latency_ms']} ms)"
+        ))
+        for size, paths in report['results'].items():
+            for path, result in paths.items():
+                if result.get('skipped'):
+                    self.stdout.write(f"  {size:>6} {path:<24} skipped (--per-user-max)")
+                    continue
+                self.stdout.write(
+                    f"  {size:>6} {path:<24} {result['wall_ms']:>10.0f} ms "
+                    f"({result['ms_per_recipient']:.2f} ms/recipient), "
+                    f"queries/recipient: {result['queries_per_recipient']:.2f}, "
+                    f"FCM requests: {result['fcm_requests']}, pushes: {result['pushes_sent']}"
+                )
+
+    def print_comparison(self, report, baseline):
+        if baseline.get('params') != report['params']:
+            self.stdout.write(self.style.WARNING('Baseline was run with different parameters'))
+        base_commit = ((baseline.get('metadata') or {}).get('git') or {}).get('commit', 'unknown')
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Compared with {base_commit[:12]}'))
+        keys = [
+            f'results.{size}.{path}.{metric}'
+            for size, paths in report['results'].items() for path in paths for metric in COMPARED_METRICS
+        ]
+        for key, old, new, change in compare_metrics(report, baseline, keys):
+            change = f'{change:+.1f}%' if change is not None else 'n/a'
+            self.stdout.write(f'  {key.split(".", 1)[1]:<56} {old:>10.2f} -> {new:>10.2f}  {change}')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from core.notifications.retention import notification_retention
+
+
+class Command(BaseCommand):
+    help = 'Delete notifications older than their retention window, in throttled batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Rows per DELETE')
+        parser.add_argument('--sleep', type=float, help='Pause between batches, seconds')
+        parser.add_argument('--dry-run', action='store_true', help='Only count expired notifications')
+
+    def handle(self, *args, **options):
+        report = notification_retention.run(
+            batch_size=options['batch_size'],
+            sleep=options['sleep'],
+            dry_run=options['dry_run']
+        )
+
+        action = 'Would delete' if options['dry_run'] else 'Deleted'
+        for notification_type, deleted in report['by_type'].items():
+            self.stdout.write(f'{notification_type}: {deleted}')
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {report['deleted']} notifications in {report['batches']} batches "
+            f"({report['duration_seconds']}s)"
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from apps.notifications.models import PushDeadLetter
+from core.notifications.delivery import push_delivery
+
+
+class Command(BaseCommand):
+    help = 'Send dead-lettered push messages again (they are removed from the dead letters)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--error-code', action='append', help='Only letters with this error code (repeatable)')
+        parser.add_argument('--limit', type=int, default=10000, help='Maximum number of letters to requeue')
+        parser.add_argument('--dry-run', action='store_true', help='Only count letters that would be requeued')
+
+    def handle(self, *args, **options):
+        letters = PushDeadLetter.objects.order_by('id')
+        if options['error_code']:
+            letters = letters.filter(error_code__in=options['error_code'])
+        letters = letters[:options['limit']]
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Would requeue {letters.count()} push messages'))
+            return
+
+        requeued = push_delivery.requeue(letters)
+        self.stdout.write(self.style.SUCCESS(f'Requeued {requeued} push messages'))
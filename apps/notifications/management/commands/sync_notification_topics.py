@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from apps.authentication.models import User
+from core.notifications.topics import notification_topics
+
+
+class Command(BaseCommand):
+    help = 'Subscribe active FCM tokens of all users (or given users) to their role and service topics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', help='Only this user id (repeatable)')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(fcm_tokens__is_active=True).distinct().order_by('id')
+        if options['user']:
+            users = users.filter(id__in=options['user'])
+
+        synced = 0
+        for user in users.iterator():
+            result = notification_topics.sync_user(user)
+            synced += result['tokens']
+        self.stdout.write(self.style.SUCCESS(f'Synced topic subscriptions of {synced} tokens'))
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PushDeadLetter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_id', models.BigIntegerField(blank=True, null=True)),
+                ('notification_type', models.CharField(max_length=100)),
+                ('token', models.CharField(max_length=255)),
+                ('idempotency_key', models.CharField(db_index=True, max_length=255)),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('data', models.JSONField(default=dict)),
+                ('error_code', models.CharField(max_length=100)),
+                ('error_message', models.TextField(blank=True)),
+                ('attempts', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='push_dead_letters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Push Dead Letter',
+                'verbose_name_plural': 'Push Dead Letters',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['error_code', 'created_at'], name='notificatio_error_c_25a735_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0006_userfcmtoken'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notifications', '0004_notification_retention_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationBroadcastCursor',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='broadcast_cursor', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('last_broadcast_id', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Notification Broadcast Cursor',
+                'verbose_name_plural': 'Notification Broadcast Cursors',
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificationBroadcast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=255)),
+                ('notification_type', models.CharField(max_length=100)),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('data', models.JSONField(default=dict)),
+                ('push_sent', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Notification Broadcast',
+                'verbose_name_plural': 'Notification Broadcasts',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['topic', 'id'], name='notificatio_topic_4b8e18_idx')],
+            },
+        ),
+    ]
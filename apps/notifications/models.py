@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from apps.authentication.models import User
 
 class Notification(models.Model):
@@ -6,12 +7,88 @@ class Notification(models.Model):
     notification_type = models.CharField(max_length=100)  # e.g. "ClientSendBookingNotificationToAdmin"
     data = models.JSONField(default=dict)  # Additional data
     is_read = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: inbox rows of broadcasts keep the broadcast time
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Notification'
         verbose_name_plural = 'Notifications'
+        indexes = [
+            # Counting unread notifications of a user
+            models.Index(fields=['user', 'is_read']),
+            # Inbox pages of a user (keyset on created_at, id)
+            models.Index(fields=['user', 'created_at', 'id']),
+            # Retention: oldest rows first, overall and per type
+            models.Index(fields=['created_at']),
+            models.Index(fields=['notification_type', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Notification {self.id} - {self.notification_type} for {self.user.username}"
+
+class PushDeadLetter(models.Model):
+    """Push message that could not be delivered (permanent FCM error or retries exhausted)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='push_dead_letters')
+    # Not a foreign key: the notification may be deleted while its failed push is kept
+    notification_id = models.BigIntegerField(null=True, blank=True)
+    notification_type = models.CharField(max_length=100)
+    token = models.CharField(max_length=255)
+    idempotency_key = models.CharField(max_length=255, db_index=True)
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+    data = models.JSONField(default=dict)
+    error_code = models.CharField(max_length=100)
+    error_message = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Push Dead Letter'
+        verbose_name_plural = 'Push Dead Letters'
+        indexes = [
+            models.Index(fields=['error_code', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Push {self.idempotency_key} to {self.user_id} failed: {self.error_code}"
+
+
+class NotificationBroadcast(models.Model):
+    """
+    Notification sent once to an FCM topic (all users of a role or service).
+    In-app Notification rows are created lazily when a recipient opens the inbox.
+    """
+    topic = models.CharField(max_length=255)
+    notification_type = models.CharField(max_length=100)
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+    data = models.JSONField(default=dict)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    push_sent = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Notification Broadcast'
+        verbose_name_plural = 'Notification Broadcasts'
+        indexes = [
+            models.Index(fields=['topic', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"Broadcast {self.id} - {self.notification_type} to {self.topic}"
+
+
+class NotificationBroadcastCursor(models.Model):
+    """Last broadcast materialized into the user's inbox"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='broadcast_cursor')
+    last_broadcast_id = models.BigIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Notification Broadcast Cursor'
+        verbose_name_plural = 'Notification Broadcast Cursors'
     
     def __str__(self):
-        return f"Notification {self.id} - {self.notification_type} for {self.user.username}"
\ No newline at end of file
+        return f"{self.user_id} read broadcasts up to {self.last_broadcast_id}"
@@ -0,0 +1,13 @@
+from django.conf import settings
+from core.base.pagination import KeysetPagination
+
+
+# (created_at, id) is unique and backed by the (user, created_at, id) index
+INBOX_ORDERING = ('-created_at', '-id')
+
+
+class NotificationInboxPagination(KeysetPagination):
+    """Cursor pagination for the user's inbox, newest first"""
+    ordering = INBOX_ORDERING
+    page_size = settings.NOTIFICATION_INBOX_PAGE_SIZE
+    max_page_size = settings.NOTIFICATION_INBOX_MAX_PAGE_SIZE
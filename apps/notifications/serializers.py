@@ -1,6 +1,8 @@
 from core.base.common_imports import *
 from core.error_handling import ErrorCode
-from .models import Notification
+from apps.authentication.models import User
+from apps.services.models import Service
+from .models import Notification, NotificationBroadcast
 
 
 class BaseNotificationSerializer(OptimizedModelSerializer):
@@ -43,4 +45,32 @@ class NotificationCreateSerializer(BaseNotificationSerializer):
 class NotificationUpdateSerializer(BaseNotificationSerializer):
     class Meta:
         model = Notification
-        fields = ['is_read']
\ No newline at end of file
+        fields = ['is_read']
+
+class NotificationBroadcastSerializer(serializers.Serializer):
+    """Broadcast to all users of a role or of a service (exactly one of them)"""
+    role = serializers.ChoiceField(choices=User.ROLE_CHOICES, required=False)
+    service_id = serializers.IntegerField(required=False)
+    notification_type = serializers.CharField(max_length=100, default='Announcement')
+    title = serializers.CharField(max_length=255, required=False)
+    body = serializers.CharField(required=False)
+    data = serializers.DictField(required=False, default=dict)
+    
+    def validate_notification_type(self, value):
+        from core.notifications.service import NotificationService
+        if value not in NotificationService.NOTIFICATION_TYPES.values():
+            ErrorCode.INVALID_DATA.raise_error()
+        return value
+    
+    def validate(self, attrs):
+        if ('role' in attrs) == ('service_id' in attrs):
+            ErrorCode.INVALID_DATA.raise_error('Specify either role or service_id')
+        if 'service_id' in attrs and not Service.objects.filter(id=attrs['service_id']).exists():
+            ErrorCode.SERVICE_NOT_FOUND.raise_error()
+        return attrs
+
+
+class NotificationBroadcastResponseSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = NotificationBroadcast
+        fields = ['id', 'topic', 'notification_type', 'title', 'body', 'data', 'created_at']
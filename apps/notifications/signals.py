@@ -0,0 +1,21 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from apps.bookings.models import Booking
+from apps.services.models import Service
+
+
+@receiver(post_save, sender=Booking)
+def subscribe_customer_to_service_topic(sender, instance, created, **kwargs):
+    """Booking customers receive broadcasts of the booked service"""
+    if created:
+        from core.notifications.tasks import sync_topic_subscriptions_task
+        transaction.on_commit(lambda: sync_topic_subscriptions_task.delay(instance.customer_id))
+
+
+@receiver(post_save, sender=Service)
+def subscribe_provider_to_service_topic(sender, instance, created, **kwargs):
+    """Providers receive broadcasts of their services"""
+    if created:
+        from core.notifications.tasks import sync_topic_subscriptions_task
+        transaction.on_commit(lambda: sync_topic_subscriptions_task.delay(instance.provider_id))
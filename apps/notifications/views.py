@@ -1,10 +1,13 @@
 from core.base.common_imports import *
 from .models import Notification
 from .serializers import (
-    NotificationSerializer, NotificationCreateSerializer, NotificationUpdateSerializer
+    NotificationSerializer, NotificationCreateSerializer, NotificationUpdateSerializer,
+    NotificationBroadcastSerializer, NotificationBroadcastResponseSerializer
 )
 from .permissions import NotificationPermissions
+from .pagination import NotificationInboxPagination
 from core.notifications.service import notification_service
+from core.notifications.unread import unread_counter
 
 
 class NotificationListCreateView(OptimizedListCreateView, NotificationPermissions):
@@ -21,8 +24,83 @@ class NotificationListCreateView(OptimizedListCreateView, NotificationPermission
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
 
+    def list(self, request, *args, **kwargs):
+        # Broadcasts become inbox notifications when the inbox is opened
+        notification_service.materialize_broadcasts(request.user)
+        return super().list(request, *args, **kwargs)
+
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        notification = serializer.save(user=self.request.user)
+        if not notification.is_read:
+            transaction.on_commit(lambda: unread_counter.add([notification.user_id]))
+
+
+class NotificationInboxView(SwaggerMixin, ListAPIView):
+    """Current user's notifications with keyset (cursor) pagination"""
+    serializer_class = NotificationSerializer
+    pagination_class = NotificationInboxPagination
+    queryset = Notification.objects.none()
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return super().get_queryset()
+        
+        # Always the user's own inbox, whatever the role
+        queryset = Notification.objects.filter(user=self.request.user)
+        params = self.request.query_params
+        
+        notification_types = [value for value in params.get('type', '').split(',') if value]
+        if notification_types:
+            queryset = queryset.filter(notification_type__in=notification_types)
+        
+        is_read = params.get('is_read')
+        if is_read is not None:
+            if is_read not in ('true', 'false'):
+                raise CustomValidationError(ErrorCode.INVALID_DATA, 'is_read must be true or false')
+            queryset = queryset.filter(is_read=is_read == 'true')
+        
+        return queryset
+
+    @swagger_auto_schema(
+        operation_description="Get current user's notifications, newest first. "
+                              "Pass `next_cursor` from the previous page as `cursor` to get older ones",
+        manual_parameters=[
+            openapi.Parameter('type', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description='Notification types, comma separated'),
+            openapi.Parameter('is_read', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN),
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        ],
+        responses={
+            200: openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'next': openapi.Schema(type=openapi.TYPE_STRING),
+                    'next_cursor': openapi.Schema(type=openapi.TYPE_STRING),
+                    'results': openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        items=openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                'id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                                'user': openapi.Schema(type=openapi.TYPE_INTEGER),
+                                'notification_type': openapi.Schema(type=openapi.TYPE_STRING),
+                                'data': openapi.Schema(type=openapi.TYPE_OBJECT),
+                                'is_read': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                                'created_at': openapi.Schema(type=openapi.TYPE_STRING)
+                            }
+                        )
+                    )
+                }
+            ),
+            400: ERROR_400_SCHEMA
+        },
+        tags=["Notifications"]
+    )
+    def get(self, request, *args, **kwargs):
+        # Broadcasts become inbox notifications when the inbox is opened
+        notification_service.materialize_broadcasts(request.user)
+        return super().get(request, *args, **kwargs)
 
 
 class NotificationDetailView(OptimizedRetrieveUpdateDestroyView, NotificationPermissions):
@@ -33,6 +111,15 @@ class NotificationDetailView(OptimizedRetrieveUpdateDestroyView, NotificationPer
             return NotificationUpdateSerializer
         return NotificationSerializer
 
+    def perform_update(self, serializer):
+        notification = serializer.save()
+        transaction.on_commit(lambda: unread_counter.refresh(notification.user_id))
+
+    def perform_destroy(self, instance):
+        user_id = instance.user_id
+        super().perform_destroy(instance)
+        transaction.on_commit(lambda: unread_counter.refresh(user_id))
+
 
 class NotificationMarkAsReadView(BaseAPIView):
     """Mark notification as read"""
@@ -51,17 +138,18 @@ class NotificationMarkAsReadView(BaseAPIView):
     )
     @transaction.atomic
     def patch(self, request, pk):
-        try:
-            notification = Notification.objects.get(
-                id=pk,
-                user=request.user
-            )
-            notification.is_read = True
-            notification.save()
-            
-            return self.get_success_response(message='Notification marked as read')
-        except Notification.DoesNotExist:
+        updated = Notification.objects.filter(
+            id=pk,
+            user=request.user,
+            is_read=False
+        ).update(is_read=True)
+        
+        if updated:
+            transaction.on_commit(lambda: unread_counter.add([request.user.id], -1))
+        elif not Notification.objects.filter(id=pk, user=request.user).exists():
             raise CustomValidationError(ErrorCode.USER_NOT_FOUND)
+        
+        return self.get_success_response(message='Notification marked as read')
 
 
 class NotificationDeleteAllView(BaseAPIView):
@@ -84,6 +172,7 @@ class NotificationDeleteAllView(BaseAPIView):
         deleted_count, _ = Notification.objects.filter(
             user=request.user
         ).delete()
+        transaction.on_commit(lambda: unread_counter.reset(request.user.id))
         
         return self.get_success_response(
             data={'deleted_count': deleted_count},
@@ -112,6 +201,7 @@ class NotificationMarkAllAsReadView(BaseAPIView):
             user=request.user,
             is_read=False
         ).update(is_read=True)
+        transaction.on_commit(lambda: unread_counter.reset(request.user.id))
         
         return self.get_success_response(
             data={'updated_count': updated_count},
@@ -120,10 +210,11 @@ class NotificationMarkAllAsReadView(BaseAPIView):
 
 
 class NotificationUnreadCountView(BaseAPIView):
-    """Get unread notifications count for current user"""
+    """Get unread notifications count for current user (live updates: ws/notifications/)"""
     
     @swagger_auto_schema(
-        operation_description="Get unread notifications count",
+        operation_description="Get unread notifications count. Clients should subscribe to "
+                              "ws/notifications/ for changes instead of polling",
         responses={
             200: openapi.Schema(
                 type=openapi.TYPE_OBJECT,
@@ -134,10 +225,47 @@ class NotificationUnreadCountView(BaseAPIView):
         }
     )
     def get(self, request):
-        unread_count = Notification.objects.filter(
-            user=request.user,
-            is_read=False
-        ).count()
+        notification_service.materialize_broadcasts(request.user)
+        unread_count = unread_counter.get(request.user.id)
         
         return self.get_success_response(data={'unread_count': unread_count})
 
+
+
+class NotificationBroadcastView(BaseAPIView, NotificationPermissions):
+    """Send one notification to all users of a role or service via FCM topic"""
+    
+    @swagger_auto_schema(
+        operation_description="Broadcast notification to a role or service audience. One FCM topic message "
+                              "is sent; inbox notifications are created when recipients open their inbox",
+        request_body=NotificationBroadcastSerializer,
+        responses={
+            201: NotificationBroadcastResponseSerializer,
+            400: ERROR_400_SCHEMA
+        },
+        tags=["Notifications"]
+    )
+    @transaction.atomic
+    def post(self, request):
+        self.check_permission('send_notifications')
+        serializer = NotificationBroadcastSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        options = {
+            'notification_type': data['notification_type'],
+            'data': data['data'],
+            'title': data.get('title'),
+            'body': data.get('body'),
+            'created_by': request.user
+        }
+        if 'role' in data:
+            broadcast = notification_service.broadcast_to_role(data['role'], **options)
+        else:
+            broadcast = notification_service.broadcast_to_service(data['service_id'], **options)
+        
+        return self.get_success_response(
+            data=NotificationBroadcastResponseSerializer(broadcast).data,
+            message='Broadcast queued',
+            status_code=status.HTTP_201_CREATED
+        )
@@ -0,0 +1,4 @@
+# Load Celery app with Django so shared_task uses its broker configuration
+from .celery import app as celery_app
+
+__all__ = ('celery_app',)
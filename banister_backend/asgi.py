@@ -3,6 +3,7 @@ from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 import apps.chat.routing
+import apps.notifications.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'banister_backend.settings')
 
@@ -10,7 +11,8 @@ application = ProtocolTypeRouter({
     "http": get_asgi_application(),
     "websocket": AuthMiddlewareStack(
         URLRouter(
-            apps.chat.routing.websocket_urlpatterns
+            apps.chat.routing.websocket_urlpatterns +
+            apps.notifications.routing.websocket_urlpatterns
         )
     ),
 })
\ No newline at end of file
@@ -1,7 +1,10 @@
 import os
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import celeryd_init
 from django.conf import settings
+from kombu import Queue
+from .queues import QUEUES, DEFAULT_QUEUE, WORKER_POOLS
 
 # Set environment variable for Django settings
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'banister_backend.settings')
@@ -14,6 +17,8 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 
 # Auto-discover tasks in Django applications
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
+# Core packages with tasks are not Django apps
+app.autodiscover_tasks(['core.mail', 'core.notifications', 'core.backup'])
 
 # Redis configuration
 app.conf.update(
@@ -34,12 +39,41 @@ app.conf.update(
     beat_sync_every=1,
 )
 
-# Task routes (simplified)
+# Queue topology (see queues.py): declared queues, highest priority first
+app.conf.task_queues = [Queue(name, routing_key=name) for name in QUEUES]
+app.conf.task_default_queue = DEFAULT_QUEUE
+app.conf.task_create_missing_queues = False
+# Workers consuming several queues drain them in priority order, not round robin
+app.conf.broker_transport_options = {'queue_order_strategy': 'priority'}
+
+# Task routes
 app.conf.task_routes = {
+    # Verification and reset codes are awaited by users - never behind bulk mail
+    'core.mail.tasks.send_verification_email_task': {'queue': 'email_high'},
+    'core.mail.tasks.send_password_reset_email_task': {'queue': 'email_high'},
     'core.mail.*': {'queue': 'email'},
     'core.notifications.*': {'queue': 'notifications'},
+    'core.backup.*': {'queue': 'backups'},
+    'apps.chat.*': {'queue': 'workers'},
 }
 
+
+# Worker pool named by WORKER_QUEUE_POOL (not CELERY_WORKER_*: the celery CLI reads those as
+# worker options). Concurrency and prefetch are set when the app is loaded: the worker CLI fills
+# -c / --prefetch-multiplier from this config before any worker signal, unless they are given.
+WORKER_POOL = WORKER_POOLS[os.environ['WORKER_QUEUE_POOL']] if os.getenv('WORKER_QUEUE_POOL') else None
+if WORKER_POOL:
+    app.conf.worker_concurrency = WORKER_POOL['concurrency']
+    app.conf.worker_prefetch_multiplier = WORKER_POOL['prefetch_multiplier']
+
+
+@celeryd_init.connect
+def configure_worker_pool(sender=None, instance=None, **kwargs):
+    """Consume only the queues of the worker pool (-Q on the command line wins)"""
+    if WORKER_POOL:
+        instance.app.amqp.queues.select(WORKER_POOL['queues'])
+
+
 # Periodic task settings
 app.conf.beat_schedule = {
     'database-backup': {
@@ -54,8 +88,30 @@ app.conf.beat_schedule = {
         'task': 'core.backup.tasks.cleanup_notifications_task',
         'schedule': crontab(hour=0, minute=0, day_of_week=1),  # Every Monday at midnight
     },
+    'create-chat-message-partitions': {
+        'task': 'apps.chat.tasks.create_message_partitions_task',
+        'schedule': crontab(hour=1, minute=0, day_of_week=1),  # Every Monday at 01:00
+    },
 }
 
+# Periodic tasks that depend on settings are added once the configuration is
+# loaded (settings are not ready yet when this module is imported by Django)
+@app.on_after_configure.connect
+def setup_chat_periodic_tasks(sender, **kwargs):
+    # Drain chat messages buffered by write-behind mode
+    if settings.CHAT_WRITE_BEHIND_ENABLED:
+        sender.conf.beat_schedule['flush-chat-message-buffer'] = {
+            'task': 'apps.chat.tasks.flush_message_buffer_task',
+            'schedule': settings.CHAT_WRITE_BEHIND_FLUSH_INTERVAL,
+        }
+    
+    # Expire presence of connections that stopped sending heartbeats
+    if settings.CHAT_PRESENCE_ENABLED:
+        sender.conf.beat_schedule['sweep-chat-presence'] = {
+            'task': 'apps.chat.tasks.sweep_presence_task',
+            'schedule': settings.CHAT_PRESENCE_SWEEP_INTERVAL,
+        }
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}') 
\ No newline at end of file
@@ -0,0 +1,136 @@
+"""
+Celery queue topology and queue metrics
+
+Queues are listed highest priority first. Workers are started per pool
+(WORKER_QUEUE_POOL) and a worker consuming several queues drains them in
+this order (Redis queue_order_strategy=priority), so verification and reset
+codes are taken before notifications, other mail and chat jobs. Backups
+run on their own pool and never hold a slot other queues need.
+"""
+
+import json
+import logging
+import time
+from datetime import datetime
+from celery.signals import before_task_publish, task_prerun
+from django.conf import settings
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+
+QUEUES = [
+    'email_high',       # verification and password reset codes
+    'notifications',    # push delivery, digests, broadcasts
+    'email',            # other email, bulk chunks
+    'workers',          # chat jobs, default for unrouted tasks
+    'backups',          # database and MinIO backups, retention
+]
+
+DEFAULT_QUEUE = 'workers'
+
+# Worker pools: queues (in priority order), processes and messages reserved per process
+WORKER_POOLS = {
+    'transactional': {'queues': ['email_high'], 'concurrency': 2, 'prefetch_multiplier': 1},
+    'default': {
+        'queues': ['email_high', 'notifications', 'email', 'workers'],
+        'concurrency': 4,
+        'prefetch_multiplier': 1,
+    },
+    'backups': {'queues': ['backups'], 'concurrency': 1, 'prefetch_multiplier': 1},
+}
+
+# Redis transport keeps messages with priority > 0 in separate lists
+PRIORITY_STEPS = [0, 3, 6, 9]
+PRIORITY_SEPARATOR = '\x06\x16'
+
+
+def _waits_key(queue):
+    return f'celery:queue:waits:{queue}'
+
+
+@before_task_publish.connect
+def stamp_published_at(headers=None, **kwargs):
+    """Publish time in message headers: queue age and wait are measured from it"""
+    if headers is not None and settings.CELERY_QUEUE_METRICS_ENABLED:
+        headers['published_at'] = time.time()
+
+
+@task_prerun.connect
+def record_queue_wait(task=None, **kwargs):
+    """Store how long the task waited in its queue (recent samples per queue)"""
+    if task is None or not settings.CELERY_QUEUE_METRICS_ENABLED:
+        return
+    request = task.request
+    published_at = getattr(request, 'published_at', None)
+    queue = (request.delivery_info or {}).get('routing_key')
+    if not published_at or not queue or request.is_eager:
+        return
+
+    started = published_at
+    if request.eta:
+        # Countdown / eta time is not queue wait
+        try:
+            eta = request.eta if isinstance(request.eta, datetime) else datetime.fromisoformat(request.eta)
+            started = max(started, eta.timestamp())
+        except (TypeError, ValueError):
+            pass
+
+    from core.redis.client import redis_client
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.lpush(_waits_key(queue), round(max(0.0, time.time() - started), 3))
+        pipe.ltrim(_waits_key(queue), 0, settings.CELERY_QUEUE_METRICS_SAMPLES - 1)
+        pipe.execute()
+    except RedisError as e:
+        logger.debug(f"Failed to record queue wait: {e}")
+
+
+def queue_stats(app):
+    """
+    Depth, age of the oldest message and recent waits of every queue
+
+    Returns:
+        {queue: {'depth', 'oldest_age_seconds', 'wait_seconds': {p50, p95, p99, ...}}}
+    """
+    from core.base.benchmark import percentiles
+    from core.redis.client import redis_client
+
+    stats = {}
+    with app.connection_for_read() as connection:
+        broker = connection.default_channel.client
+        for queue in QUEUES:
+            keys = [queue] + [f'{queue}{PRIORITY_SEPARATOR}{step}' for step in PRIORITY_STEPS[1:]]
+            depth = sum(broker.llen(key) for key in keys)
+
+            oldest_age = None
+            for key in keys:
+                # Messages are LPUSHed and consumed from the tail: the tail is the oldest
+                raw = broker.lindex(key, -1)
+                published_at = _published_at(raw)
+                if published_at is not None:
+                    age = time.time() - published_at
+                    oldest_age = age if oldest_age is None else max(oldest_age, age)
+
+            try:
+                waits = [float(value) for value in redis_client.lrange(_waits_key(queue), 0, -1)]
+            except RedisError as e:
+                logger.warning(f"Queue wait samples unavailable: {e}")
+                waits = []
+
+            stats[queue] = {
+                'depth': depth,
+                'oldest_age_seconds': round(oldest_age, 3) if oldest_age is not None else None,
+                'wait_seconds': percentiles(waits),
+                'wait_samples': len(waits),
+            }
+    return stats
+
+
+def _published_at(raw):
+    if not raw:
+        return None
+    try:
+        return json.loads(raw).get('headers', {}).get('published_at')
+    except (ValueError, AttributeError):
+        return None
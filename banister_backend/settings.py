@@ -35,6 +35,7 @@ EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@banister.com')
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', '30'))
 
 # Application definition
 
@@ -181,6 +182,13 @@ FIREBASE_CONFIG = {
     'appId': os.getenv('FIREBASE_APP_ID')
 }
 
+# Push transport: Firebase, or core.firebase.backends.LoopbackBackend to send nothing (dev, load tests)
+PUSH_BACKEND = os.getenv('PUSH_BACKEND', 'core.firebase.backends.FirebaseBackend')
+# Loopback: simulated round trip per request, tokens failing as unregistered, recorded messages kept
+PUSH_LOOPBACK_LATENCY_MS = int(os.getenv('PUSH_LOOPBACK_LATENCY_MS', '0'))
+PUSH_LOOPBACK_INVALID_TOKEN_PREFIX = os.getenv('PUSH_LOOPBACK_INVALID_TOKEN_PREFIX', 'invalid-')
+PUSH_LOOPBACK_MAX_RECORDED = int(os.getenv('PUSH_LOOPBACK_MAX_RECORDED', '1000'))
+
 # Swagger settings
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
@@ -320,11 +328,22 @@ REDIS_PORT = int(os.getenv('REDIS_PORT'))
 REDIS_DB = int(os.getenv('REDIS_DB'))
 REDIS_PASSWORD = os.getenv('REDIS_PASSWORD')
 
+# Queue metrics (see banister_backend/queues.py, manage.py celery_queues): recent waits kept per queue
+CELERY_QUEUE_METRICS_ENABLED = os.getenv('CELERY_QUEUE_METRICS_ENABLED', 'True') == 'True'
+CELERY_QUEUE_METRICS_SAMPLES = int(os.getenv('CELERY_QUEUE_METRICS_SAMPLES', '1000'))
+
 # Email Queue Configuration
 EMAIL_QUEUE_NAME = os.getenv('EMAIL_QUEUE_NAME')
 EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE'))
 EMAIL_RETRY_ATTEMPTS = int(os.getenv('EMAIL_RETRY_ATTEMPTS'))
 EMAIL_RETRY_DELAY = int(os.getenv('EMAIL_RETRY_DELAY'))
+# Open SMTP connections kept per process and reused across tasks (see core.mail.connection)
+EMAIL_POOL_SIZE = int(os.getenv('EMAIL_POOL_SIZE', '2'))
+EMAIL_POOL_MAX_MESSAGES = int(os.getenv('EMAIL_POOL_MAX_MESSAGES', '100'))
+EMAIL_POOL_IDLE_TIMEOUT = int(os.getenv('EMAIL_POOL_IDLE_TIMEOUT', '60'))
+EMAIL_POOL_HEALTH_CHECK_INTERVAL = int(os.getenv('EMAIL_POOL_HEALTH_CHECK_INTERVAL', '10'))
+# Email templates compiled once per process (see core.mail.templates); disable to pick up template edits
+EMAIL_TEMPLATE_CACHE_ENABLED = os.getenv('EMAIL_TEMPLATE_CACHE_ENABLED', 'True') == 'True'
 
 # Channels Configuration
 ASGI_APPLICATION = 'banister_backend.asgi.application'
@@ -337,3 +356,71 @@ CHANNEL_LAYERS = {
         },
     },
 }
+
+# Chat Configuration
+CHAT_MESSAGES_PAGE_SIZE = int(os.getenv('CHAT_MESSAGES_PAGE_SIZE', '20'))
+CHAT_MESSAGES_MAX_PAGE_SIZE = int(os.getenv('CHAT_MESSAGES_MAX_PAGE_SIZE', '100'))
+# Room broadcasts: messages arriving within the flush interval are sent as one frame
+CHAT_FANOUT_FLUSH_INTERVAL_MS = int(os.getenv('CHAT_FANOUT_FLUSH_INTERVAL_MS', '50'))
+CHAT_FANOUT_MAX_BATCH_SIZE = int(os.getenv('CHAT_FANOUT_MAX_BATCH_SIZE', '50'))
+# Write-behind persistence: messages are broadcast first and stored in batches (PostgreSQL only)
+CHAT_WRITE_BEHIND_ENABLED = os.getenv('CHAT_WRITE_BEHIND_ENABLED', 'False') == 'True'
+CHAT_WRITE_BEHIND_BATCH_SIZE = int(os.getenv('CHAT_WRITE_BEHIND_BATCH_SIZE', '500'))
+CHAT_WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv('CHAT_WRITE_BEHIND_FLUSH_INTERVAL', '2'))
+CHAT_WRITE_BEHIND_ID_BLOCK_SIZE = int(os.getenv('CHAT_WRITE_BEHIND_ID_BLOCK_SIZE', '100'))
+# Per-room ring buffer of recent messages used on connect and in room lists
+CHAT_RECENT_CACHE_ENABLED = os.getenv('CHAT_RECENT_CACHE_ENABLED', 'True') == 'True'
+CHAT_RECENT_CACHE_SIZE = int(os.getenv('CHAT_RECENT_CACHE_SIZE', '20'))
+CHAT_RECENT_CACHE_TTL = int(os.getenv('CHAT_RECENT_CACHE_TTL', '86400'))
+# WebSocket auth: validated tokens and room participant sets are cached in Redis
+WS_AUTH_CACHE_ENABLED = os.getenv('WS_AUTH_CACHE_ENABLED', 'True') == 'True'
+WS_AUTH_USER_TTL = int(os.getenv('WS_AUTH_USER_TTL', '300'))
+CHAT_ROOM_MEMBERS_TTL = int(os.getenv('CHAT_ROOM_MEMBERS_TTL', '3600'))
+# Presence: connections without a heartbeat for CHAT_PRESENCE_TTL seconds count as gone
+CHAT_PRESENCE_ENABLED = os.getenv('CHAT_PRESENCE_ENABLED', 'True') == 'True'
+CHAT_PRESENCE_TTL = int(os.getenv('CHAT_PRESENCE_TTL', '60'))
+CHAT_PRESENCE_SWEEP_INTERVAL = int(os.getenv('CHAT_PRESENCE_SWEEP_INTERVAL', '30'))
+CHAT_PRESENCE_BROADCAST_INTERVAL_MS = int(os.getenv('CHAT_PRESENCE_BROADCAST_INTERVAL_MS', '1000'))
+# Monthly partitions of chat_message: created ahead by celery beat, archived manually
+CHAT_MESSAGE_PARTITIONS_AHEAD = int(os.getenv('CHAT_MESSAGE_PARTITIONS_AHEAD', '3'))
+CHAT_MESSAGE_ARCHIVE_AFTER_MONTHS = int(os.getenv('CHAT_MESSAGE_ARCHIVE_AFTER_MONTHS', '12'))
+
+# Notifications Configuration
+# Users per bulk INSERT / token query when one notification goes to many users
+NOTIFICATION_BULK_CHUNK_SIZE = int(os.getenv('NOTIFICATION_BULK_CHUNK_SIZE', '1000'))
+# Push delivery: sent by Celery workers, failed tokens retried with exponential backoff
+NOTIFICATION_PUSH_ASYNC = os.getenv('NOTIFICATION_PUSH_ASYNC', 'True') == 'True'
+NOTIFICATION_PUSH_MAX_RETRIES = int(os.getenv('NOTIFICATION_PUSH_MAX_RETRIES', '5'))
+NOTIFICATION_PUSH_RETRY_BACKOFF = int(os.getenv('NOTIFICATION_PUSH_RETRY_BACKOFF', '10'))
+NOTIFICATION_PUSH_RETRY_BACKOFF_MAX = int(os.getenv('NOTIFICATION_PUSH_RETRY_BACKOFF_MAX', '600'))
+# How long idempotency keys of sent pushes are kept (must outlive all retries)
+NOTIFICATION_PUSH_IDEMPOTENCY_TTL = int(os.getenv('NOTIFICATION_PUSH_IDEMPOTENCY_TTL', '86400'))
+# Unread counters are cached in Redis and pushed to ws/notifications/; counted again from the database after the TTL
+NOTIFICATION_UNREAD_COUNT_TTL = int(os.getenv('NOTIFICATION_UNREAD_COUNT_TTL', '86400'))
+# Retention of notifications: days per type ("Reminder:14,Welcome:7"), others use the default
+NOTIFICATION_RETENTION_DAYS = int(os.getenv('NOTIFICATION_RETENTION_DAYS', '60'))
+NOTIFICATION_RETENTION_DAYS_BY_TYPE = {
+    notification_type.strip(): int(days)
+    for notification_type, days in (
+        item.split(':') for item in os.getenv('NOTIFICATION_RETENTION_DAYS_BY_TYPE', '').split(',') if item.strip()
+    )
+}
+NOTIFICATION_RETENTION_BATCH_SIZE = int(os.getenv('NOTIFICATION_RETENTION_BATCH_SIZE', '5000'))
+NOTIFICATION_RETENTION_BATCH_SLEEP_MS = int(os.getenv('NOTIFICATION_RETENTION_BATCH_SLEEP_MS', '100'))
+# Broadcasts: FCM topics per role and per service, prefixed to keep environments apart
+NOTIFICATION_TOPIC_PREFIX = os.getenv('NOTIFICATION_TOPIC_PREFIX', 'banister')
+# Inbox rows are made of broadcasts older than this (lower IDs may still be committing)
+NOTIFICATION_BROADCAST_COMMIT_LAG_SECONDS = int(os.getenv('NOTIFICATION_BROADCAST_COMMIT_LAG_SECONDS', '10'))
+# Digests: bursts of these types per user are merged into one notification per window (0 disables)
+NOTIFICATION_DIGEST_TYPES = [
+    notification_type.strip()
+    for notification_type in os.getenv(
+        'NOTIFICATION_DIGEST_TYPES', 'ClientSendBookingNotificationToAdmin,PROVIDER_INTERVIEW_REQUEST'
+    ).split(',')
+    if notification_type.strip()
+]
+NOTIFICATION_DIGEST_WINDOW_SECONDS = int(os.getenv('NOTIFICATION_DIGEST_WINDOW_SECONDS', '60'))
+NOTIFICATION_DIGEST_MAX_ITEMS = int(os.getenv('NOTIFICATION_DIGEST_MAX_ITEMS', '50'))
+# Inbox (notifications/inbox/): keyset pages on the (user, created_at, id) index
+NOTIFICATION_INBOX_PAGE_SIZE = int(os.getenv('NOTIFICATION_INBOX_PAGE_SIZE', '20'))
+NOTIFICATION_INBOX_MAX_PAGE_SIZE = int(os.getenv('NOTIFICATION_INBOX_MAX_PAGE_SIZE', '100'))
@@ -52,16 +52,9 @@ class LocalBackupService:
         return backup_file
     
     def cleanup_old_notifications(self):
-        from apps.notifications.models import Notification
-        from datetime import timedelta
-        from django.utils import timezone
+        from core.notifications.retention import notification_retention
         
-        two_months_ago = timezone.now() - timedelta(days=60)
-        deleted_count = Notification.objects.filter(
-            created_at__lt=two_months_ago
-        ).delete()[0]
-        
-        return deleted_count
+        return notification_retention.run()
     
     def _cleanup_old_backups(self, pattern, keep_count=7):
         backup_files = glob.glob(f"{self.backup_dir}/{pattern}")
@@ -47,8 +47,8 @@ def minio_backup_task(self):
 @shared_task(bind=True, max_retries=3)
 def cleanup_notifications_task(self):
     try:
-        deleted_count = local_backup_service.cleanup_old_notifications()
-        return f"Cleaned up {deleted_count} old notifications"
+        report = local_backup_service.cleanup_old_notifications()
+        return f"Cleaned up {report['deleted']} old notifications in {report['duration_seconds']}s"
     except Exception as e:
         if self.request.retries < self.max_retries:
             raise self.retry(countdown=60, exc=e)
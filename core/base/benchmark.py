@@ -0,0 +1,175 @@
+"""
+Helpers shared by benchmark management commands
+"""
+
+import json
+import platform
+import subprocess
+import threading
+from contextlib import contextmanager
+
+import django
+import redis
+from celery import current_app
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+
+def percentiles(values, points=(50, 95, 99)):
+    """Nearest-rank percentiles of values plus min/max/mean; empty dict for no values"""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    result = {
+        f'p{point}': ordered[min(len(ordered) - 1, max(0, round(point / 100 * len(ordered)) - 1))]
+        for point in points
+    }
+    result.update({
+        'min': ordered[0],
+        'max': ordered[-1],
+        'mean': sum(ordered) / len(ordered),
+    })
+    return result
+
+
+class QueryCounter:
+    """
+    Count SQL statements on every database connection, including the ones
+    opened later in worker threads (database_sync_to_async, executors).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def _install(self, sender=None, connection=None, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    @contextmanager
+    def track(self):
+        for conn in connections.all():
+            self._install(connection=conn)
+        connection_created.connect(self._install)
+        try:
+            yield self
+        finally:
+            connection_created.disconnect(self._install)
+            for conn in connections.all():
+                if self in conn.execute_wrappers:
+                    conn.execute_wrappers.remove(self)
+
+
+def git_revision():
+    """Current commit of the working tree (None outside a git checkout)"""
+    def run(*args):
+        return subprocess.run(
+            ['git', *args], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip()
+
+    try:
+        commit = run('rev-parse', 'HEAD')
+        if not commit:
+            return None
+        return {
+            'commit': commit,
+            'branch': run('rev-parse', '--abbrev-ref', 'HEAD'),
+            'dirty': bool(run('status', '--porcelain', '--untracked-files=no')),
+        }
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+@contextmanager
+def isolated_redis(db):
+    """
+    Point redis_client at Redis database db for a benchmark run and empty it afterwards
+
+    Benchmark rows live in a test database whose IDs collide with real rooms
+    and users, so their caches, counters and buffers must not share keys
+    with the application. db must differ from REDIS_DB and be empty.
+    """
+    from core.redis.client import redis_client
+
+    if db == settings.REDIS_DB:
+        raise CommandError(f'Redis database {db} is the application database (REDIS_DB)')
+    client = redis.Redis(
+        host=settings.REDIS_HOST or 'redis',
+        port=settings.REDIS_PORT,
+        db=db,
+        password=settings.REDIS_PASSWORD or None,
+        decode_responses=True,
+        socket_connect_timeout=2,
+        socket_timeout=2,
+    )
+    if client.dbsize():
+        raise CommandError(f'Redis database {db} is not empty; benchmarks need a dedicated database')
+
+    application_client, redis_client.client = redis_client.client, client
+    try:
+        yield client
+    finally:
+        redis_client.client = application_client
+        client.flushdb()
+        client.close()
+
+
+@contextmanager
+def eager_tasks():
+    """Run Celery tasks in-process: nothing a benchmark queues reaches the real broker and workers"""
+    conf = current_app.conf
+    previous, conf.task_always_eager = conf.task_always_eager, True
+    try:
+        yield
+    finally:
+        conf.task_always_eager = previous
+
+
+def benchmark_metadata(**extra):
+    """Environment of a benchmark run, stored next to results for comparisons"""
+    return {
+        'timestamp': timezone.now().isoformat(),
+        'git': git_revision(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'platform': platform.platform(),
+        **extra,
+    }
+
+
+def write_results(path, results):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_metrics(current, baseline, keys):
+    """[(key, baseline, current, change %)] for dotted metric keys present in both runs"""
+    def lookup(data, key):
+        for part in key.split('.'):
+            if not isinstance(data, dict) or part not in data:
+                return None
+            data = data[part]
+        return data
+
+    rows = []
+    for key in keys:
+        old, new = lookup(baseline, key), lookup(current, key)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old * 100 if old else None
+        rows.append((key, old, new, change))
+    return rows
@@ -0,0 +1,165 @@
+"""
+Keyset (cursor) pagination shared by REST views and WebSocket consumers
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from core.error_handling.enums import ErrorCode
+from core.error_handling.exceptions import CustomValidationError
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by a unique ordering instead of LIMIT/OFFSET.
+
+    The cursor encodes the ordering values of the last row on the page, so the
+    next page is a plain range scan on the index that backs the ordering and
+    costs the same no matter how deep the client has scrolled. No COUNT(*) is
+    issued. The last ordering field must be unique (normally ``id``).
+    """
+
+    def __init__(self, ordering=('-created_at', '-id'), page_size=20, max_page_size=100):
+        self.ordering = tuple(ordering)
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+
+    @property
+    def fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def get_page_size(self, page_size=None):
+        """Clamp requested page size to [1, max_page_size]"""
+        try:
+            page_size = int(page_size) if page_size is not None else self.page_size
+        except (TypeError, ValueError):
+            page_size = self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, row):
+        """Build an opaque cursor from a model instance or a values() dict"""
+        values = []
+        for field in self.fields:
+            value = row[field] if isinstance(row, dict) else getattr(row, field)
+            if isinstance(value, (datetime, date)):
+                value = value.isoformat()
+            elif isinstance(value, Decimal):
+                value = str(value)
+            values.append(value)
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor, model=None):
+        """Decode cursor into ordering values, converting them with model fields"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError('Cursor does not match ordering')
+
+            if model is not None:
+                converted = []
+                for field_name, value in zip(self.fields, values):
+                    try:
+                        field = model._meta.get_field(field_name)
+                    except FieldDoesNotExist:
+                        # Annotated value (e.g. search rank) - keep as is
+                        converted.append(value)
+                        continue
+                    converted.append(field.to_python(value))
+                values = converted
+            return values
+        except (ValueError, TypeError, ValidationError, UnicodeDecodeError):
+            raise CustomValidationError(ErrorCode.INVALID_DATA, 'Invalid pagination cursor')
+
+    def get_seek_filter(self, values):
+        """
+        Rows strictly after the cursor in ordering order:
+        (a < va) OR (a = va AND b < vb) OR ...
+        """
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            branch = Q(**{f'{name}__{lookup}': values[index]})
+            for previous, value in zip(self.fields[:index], values[:index]):
+                branch &= Q(**{previous: value})
+            condition |= branch
+        return condition
+
+    def paginate(self, queryset, cursor=None, page_size=None):
+        """
+        Return (rows, next_cursor). next_cursor is None on the last page.
+        """
+        page_size = self.get_page_size(page_size)
+        queryset = queryset.order_by(*self.ordering)
+
+        if cursor:
+            values = self.decode_cursor(cursor, queryset.model)
+            queryset = queryset.filter(self.get_seek_filter(values))
+
+        # Fetch one extra row to know whether there is a next page
+        rows = list(queryset[:page_size + 1])
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        next_cursor = self.encode_cursor(rows[-1]) if has_next and rows else None
+        return rows, next_cursor
+
+
+class KeysetPagination(BasePagination):
+    """DRF pagination class on top of KeysetPaginator"""
+
+    ordering = ('-created_at', '-id')
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = None
+    max_page_size = 100
+
+    def get_paginator(self):
+        return KeysetPaginator(
+            ordering=self.ordering,
+            page_size=self.page_size or settings.REST_FRAMEWORK.get('PAGE_SIZE', 20),
+            max_page_size=self.max_page_size
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        paginator = self.get_paginator()
+        self.rows, self.next_cursor = paginator.paginate(
+            queryset,
+            cursor=request.query_params.get(self.cursor_query_param),
+            page_size=request.query_params.get(self.page_size_query_param)
+        )
+        return self.rows
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+            'results': data
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'next_cursor': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,95 @@
+"""
+JWT authentication for WebSocket consumers with validation memoization
+"""
+
+import hashlib
+import json
+import logging
+import time
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from redis.exceptions import RedisError
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError, AuthenticationFailed
+
+from core.redis.client import redis_client
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+
+class WebSocketAuthenticator:
+    """
+    Resolve the user behind the `token` query parameter of a WebSocket scope.
+
+    The token is validated once; its claims and a snapshot of the user are
+    cached in Redis under a hash of the token until the token expires (capped
+    by WS_AUTH_USER_TTL so deactivated users are picked up), so reconnects
+    cost one Redis round trip instead of JWT validation plus a user query.
+    """
+
+    USER_FIELDS = ['id', 'username', 'role', 'is_active']
+
+    @property
+    def enabled(self):
+        return settings.WS_AUTH_CACHE_ENABLED
+
+    def get_token(self, scope):
+        query_string = scope.get('query_string', b'').decode()
+        tokens = parse_qs(query_string).get('token')
+        return tokens[0] if tokens else None
+
+    def authenticate(self, scope):
+        """Return user for the scope token or None (sync, call via database_sync_to_async)"""
+        token = self.get_token(scope)
+        if not token:
+            return None
+
+        cache_key = f'ws:auth:{hashlib.sha256(token.encode()).hexdigest()}'
+        snapshot = self._get_cached(cache_key)
+        if snapshot is not None:
+            return self._build_user(snapshot)
+
+        try:
+            jwt_auth = JWTAuthentication()
+            validated_token = jwt_auth.get_validated_token(token)
+            user = jwt_auth.get_user(validated_token)
+        except (InvalidToken, TokenError, AuthenticationFailed) as e:
+            logger.warning(f"Token validation error: {e}")
+            return None
+
+        self._set_cached(cache_key, user, validated_token.get('exp'))
+        return user
+
+    def _get_cached(self, cache_key):
+        if not self.enabled:
+            return None
+        try:
+            cached = redis_client.get(cache_key)
+        except RedisError as e:
+            logger.warning(f"WebSocket auth cache unavailable: {e}")
+            return None
+        return json.loads(cached) if cached else None
+
+    def _set_cached(self, cache_key, user, exp):
+        if not self.enabled or not exp:
+            return
+        ttl = min(int(exp - time.time()), settings.WS_AUTH_USER_TTL)
+        if ttl <= 0:
+            return
+        snapshot = {field: getattr(user, field) for field in self.USER_FIELDS}
+        try:
+            redis_client.set(cache_key, json.dumps(snapshot), ex=ttl)
+        except RedisError as e:
+            logger.warning(f"Failed to cache WebSocket auth: {e}")
+
+    def _build_user(self, snapshot):
+        # Saved-instance state; any other field is loaded on first access.
+        # from_db() expects values in concrete field order
+        field_names = [field.attname for field in User._meta.concrete_fields if field.attname in snapshot]
+        return User.from_db('default', field_names, [snapshot[name] for name in field_names])
+
+
+websocket_authenticator = WebSocketAuthenticator()
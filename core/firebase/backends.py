@@ -0,0 +1,187 @@
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from firebase_admin import credentials, messaging, initialize_app, get_app
+from django.conf import settings
+
+
+class BasePushBackend:
+    """
+    Transport of FCM messages used by FirebaseService (see PUSH_BACKEND)
+
+    Methods take firebase_admin.messaging objects and return what
+    firebase_admin.messaging returns, so FirebaseService handles responses
+    the same way whatever the backend.
+    """
+
+    @property
+    def available(self):
+        """Whether messages can be sent"""
+        return True
+
+    def send(self, message):
+        """Send one Message; returns message id"""
+        raise NotImplementedError
+
+    def send_each(self, messages):
+        """Send Messages in one batch request; returns BatchResponse"""
+        raise NotImplementedError
+
+    def send_multicast(self, multicast_message):
+        """Send MulticastMessage; returns BatchResponse"""
+        raise NotImplementedError
+
+    def subscribe_to_topic(self, tokens, topic):
+        """Returns TopicManagementResponse"""
+        raise NotImplementedError
+
+    def unsubscribe_from_topic(self, tokens, topic):
+        """Returns TopicManagementResponse"""
+        raise NotImplementedError
+
+
+class FirebaseBackend(BasePushBackend):
+    """
+    Firebase Cloud Messaging
+
+    The Firebase app is initialized from firebase-service-account.json on
+    first use, not at import, so processes that never send a push don't
+    read credentials. Initialization runs once per process under a lock.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    @property
+    def app(self):
+        if not self._initialized:
+            with self._lock:
+                if not self._initialized:
+                    self._app = self._initialize_firebase()
+                    self._initialized = True
+        return self._app
+
+    @property
+    def available(self):
+        return self.app is not None
+
+    def _initialize_firebase(self):
+        """Initialize Firebase app using firebase-service-account.json"""
+        try:
+            firebase_config_path = os.path.join(settings.BASE_DIR, 'firebase-service-account.json')
+
+            if not os.path.exists(firebase_config_path):
+                print("Firebase service account file not found at firebase-service-account.json")
+                return None
+
+            try:
+                # Already initialized in this process (e.g. by another module)
+                return get_app()
+            except ValueError:
+                pass
+
+            app = initialize_app(credentials.Certificate(firebase_config_path))
+            print("Firebase initialized successfully")
+            return app
+
+        except Exception as e:
+            print(f"Firebase initialization error: {str(e)}")
+            return None
+
+    def send(self, message):
+        return messaging.send(message, app=self.app)
+
+    def send_each(self, messages):
+        return messaging.send_each(messages, app=self.app)
+
+    def send_multicast(self, multicast_message):
+        return messaging.send_multicast(multicast_message, app=self.app)
+
+    def subscribe_to_topic(self, tokens, topic):
+        return messaging.subscribe_to_topic(tokens, topic, app=self.app)
+
+    def unsubscribe_from_topic(self, tokens, topic):
+        return messaging.unsubscribe_from_topic(tokens, topic, app=self.app)
+
+
+class LoopbackBackend(BasePushBackend):
+    """
+    In-process backend for development and load tests - nothing leaves the process
+
+    Every message succeeds after PUSH_LOOPBACK_LATENCY_MS (one simulated
+    round trip per request), except tokens starting with
+    PUSH_LOOPBACK_INVALID_TOKEN_PREFIX, which fail as unregistered so token
+    pruning can be exercised. Sent messages are recorded in `sent`
+    (the last PUSH_LOOPBACK_MAX_RECORDED) and counted in `count`; FCM API
+    requests are counted in `requests`.
+    """
+
+    def __init__(self):
+        self.sent = deque(maxlen=settings.PUSH_LOOPBACK_MAX_RECORDED)
+        self.count = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.sent.clear()
+            self.count = 0
+            self.requests = 0
+
+    def _round_trip(self):
+        with self._lock:
+            self.requests += 1
+        if settings.PUSH_LOOPBACK_LATENCY_MS:
+            time.sleep(settings.PUSH_LOOPBACK_LATENCY_MS / 1000)
+
+    def _is_invalid(self, token):
+        prefix = settings.PUSH_LOOPBACK_INVALID_TOKEN_PREFIX
+        return bool(prefix and token and token.startswith(prefix))
+
+    def _record(self, messages):
+        with self._lock:
+            self.sent.extend(messages)
+            self.count += len(messages)
+
+    def _response(self, token):
+        if self._is_invalid(token):
+            return messaging.SendResponse(None, messaging.UnregisteredError('Requested entity was not found.'))
+        return messaging.SendResponse({'name': f'loopback/{uuid.uuid4().hex}'}, None)
+
+    def send(self, message):
+        self._round_trip()
+        if self._is_invalid(message.token):
+            raise messaging.UnregisteredError('Requested entity was not found.')
+        self._record([message])
+        return f'loopback/{uuid.uuid4().hex}'
+
+    def send_each(self, messages):
+        self._round_trip()
+        self._record([message for message in messages if not self._is_invalid(message.token)])
+        return messaging.BatchResponse([self._response(message.token) for message in messages])
+
+    def send_multicast(self, multicast_message):
+        return self.send_each([
+            messaging.Message(
+                data=multicast_message.data,
+                notification=multicast_message.notification,
+                token=token
+            )
+            for token in multicast_message.tokens
+        ])
+
+    def subscribe_to_topic(self, tokens, topic):
+        return self._topic_response(tokens)
+
+    def unsubscribe_from_topic(self, tokens, topic):
+        return self._topic_response(tokens)
+
+    def _topic_response(self, tokens):
+        self._round_trip()
+        return messaging.TopicManagementResponse({
+            'results': [{'error': 'NOT_FOUND'} if self._is_invalid(token) else {} for token in tokens]
+        })
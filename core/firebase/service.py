@@ -1,34 +1,53 @@
-import os
-import json
-from firebase_admin import credentials, messaging, initialize_app
+import threading
+from firebase_admin import exceptions, messaging
 from django.conf import settings
+from django.utils.module_loading import import_string
 
 class FirebaseService:
-    """Centralized Firebase service for push notifications"""
+    """
+    Centralized Firebase service for push notifications
+
+    Messages go through the backend named by PUSH_BACKEND (Firebase by
+    default, see core.firebase.backends), created on first use.
+    """
+    
+    # FCM accepts at most 500 messages per batch request
+    MAX_BATCH_SIZE = 500
+    
+    # and at most 1000 tokens per topic (un)subscribe request
+    MAX_TOPIC_BATCH_SIZE = 1000
+    
+    # Errors that will not go away on retry (dead token, malformed message, bad credentials)
+    PERMANENT_ERRORS = (
+        messaging.UnregisteredError,
+        messaging.SenderIdMismatchError,
+        messaging.ThirdPartyAuthError,
+        exceptions.InvalidArgumentError,
+        exceptions.NotFoundError,
+        exceptions.PermissionDeniedError,
+        exceptions.UnauthenticatedError,
+    )
     
     def __init__(self):
-        self.app = None
-        self._initialize_firebase()
+        self._backend = None
+        self._lock = threading.Lock()
     
-    def _initialize_firebase(self):
-        """Initialize Firebase app using firebase-service-account.json"""
-        try:
-            firebase_config_path = os.path.join(settings.BASE_DIR, 'firebase-service-account.json')
-            
-            if not os.path.exists(firebase_config_path):
-                print("Firebase service account file not found at firebase-service-account.json")
-                return
-            
-            cred = credentials.Certificate(firebase_config_path)
-            self.app = initialize_app(cred)
-            print("Firebase initialized successfully")
-            
-        except Exception as e:
-            print(f"Firebase initialization error: {str(e)}")
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = import_string(settings.PUSH_BACKEND)()
+        return self._backend
+    
+    @property
+    def available(self):
+        """Whether pushes can be sent (Firebase is initialized on first check)"""
+        return self.backend.available
     
     def send_notification(self, user_token, title, body, data=None):
         """Send push notification via Firebase"""
-        if not self.app or not user_token:
+        if not self.available or not user_token:
             return False, "Firebase not initialized or no user token"
         
         try:
@@ -44,7 +63,7 @@ class FirebaseService:
                 message_data['data'] = data
             
             message = messaging.Message(**message_data)
-            response = messaging.send(message)
+            response = self.backend.send(message)
             return True, response
             
         except Exception as e:
@@ -52,7 +71,7 @@ class FirebaseService:
     
     def send_to_multiple(self, tokens, title, body, data=None):
         """Send notification to multiple devices"""
-        if not self.app or not tokens:
+        if not self.available or not tokens:
             return False, "Firebase not initialized or no tokens"
         
         try:
@@ -67,15 +86,56 @@ class FirebaseService:
             if data:
                 message_data['data'] = data
             
-            response = messaging.send_multicast(messaging.MulticastMessage(**message_data))
+            response = self.backend.send_multicast(messaging.MulticastMessage(**message_data))
             return True, response
             
         except Exception as e:
             return False, f"Firebase multicast error: {str(e)}"
     
+    def send_each(self, messages, title, body):
+        """
+        Send individual messages in one FCM batch request.
+        messages: list of {'token': ..., 'data': {...}} (at most MAX_BATCH_SIZE)
+        """
+        if not self.available or not messages:
+            return False, "Firebase not initialized or no messages"
+        
+        try:
+            notification = messaging.Notification(title=title, body=body)
+            response = self.backend.send_each([
+                messaging.Message(
+                    notification=notification,
+                    token=message['token'],
+                    data=message.get('data') or None
+                )
+                for message in messages
+            ])
+            return True, response
+            
+        except Exception as e:
+            return False, f"Firebase batch error: {str(e)}"
+    
+    @classmethod
+    def is_retryable_error(cls, error):
+        """Whether a failed message may succeed later (quota, unavailable, internal errors)"""
+        return not isinstance(error, cls.PERMANENT_ERRORS)
+    
+    @staticmethod
+    def is_invalid_token_error(error):
+        """Whether the token itself is dead (app uninstalled, token expired or from another project)"""
+        if isinstance(error, (messaging.UnregisteredError, messaging.SenderIdMismatchError)):
+            return True
+        # INVALID_ARGUMENT is also returned for malformed payloads - only blame the token when FCM does
+        return isinstance(error, exceptions.InvalidArgumentError) and 'registration token' in str(error).lower()
+    
+    @staticmethod
+    def error_code(error):
+        """Short error name of a failed message, e.g. UnregisteredError"""
+        return type(error).__name__ if error is not None else ''
+    
     def send_to_topic(self, topic, title, body, data=None):
         """Send notification to topic subscribers"""
-        if not self.app:
+        if not self.available:
             return False, "Firebase not initialized"
         
         try:
@@ -91,10 +151,32 @@ class FirebaseService:
                 message_data['data'] = data
             
             message = messaging.Message(**message_data)
-            response = messaging.send(message)
+            response = self.backend.send(message)
             return True, response
             
         except Exception as e:
             return False, f"Firebase topic error: {str(e)}"
+    
+    def subscribe_to_topic(self, tokens, topic):
+        """Subscribe devices to topic; returns (success, number of failed tokens)"""
+        return self._manage_topic(self.backend.subscribe_to_topic, tokens, topic)
+    
+    def unsubscribe_from_topic(self, tokens, topic):
+        """Unsubscribe devices from topic; returns (success, number of failed tokens)"""
+        return self._manage_topic(self.backend.unsubscribe_from_topic, tokens, topic)
+    
+    def _manage_topic(self, method, tokens, topic):
+        if not self.available or not tokens:
+            return False, "Firebase not initialized or no tokens"
+        
+        try:
+            failed = 0
+            for start in range(0, len(tokens), self.MAX_TOPIC_BATCH_SIZE):
+                response = method(tokens[start:start + self.MAX_TOPIC_BATCH_SIZE], topic)
+                failed += response.failure_count
+            return True, failed
+            
+        except Exception as e:
+            return False, f"Firebase topic management error: {str(e)}"
 
 firebase_service = FirebaseService()
\ No newline at end of file
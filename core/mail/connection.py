@@ -0,0 +1,169 @@
+import logging
+import os
+import smtplib
+import threading
+import time
+from typing import List, Optional
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+
+# Connection-level failures: the message may go through on a fresh connection
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class PooledConnection:
+    def __init__(self, backend):
+        self.backend = backend
+        self.last_used = time.monotonic()
+        self.sent = 0
+
+
+class SMTPConnectionPool:
+    """
+    Per-process pool of open EMAIL_BACKEND connections
+
+    SMTP connections (TLS handshake and login done) are kept open between
+    sends and tasks instead of one connection per email. Idle connections
+    older than EMAIL_POOL_IDLE_TIMEOUT or that sent EMAIL_POOL_MAX_MESSAGES
+    are closed; ones idle longer than EMAIL_POOL_HEALTH_CHECK_INTERVAL are
+    checked with NOOP before reuse. A message failing on a dropped
+    connection is sent once more on a new one. Forked worker processes
+    start with an empty pool.
+    """
+
+    def __init__(self):
+        self._idle = []
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def send_messages(self, messages) -> int:
+        """
+        Send EmailMessages over pooled connections
+
+        Args:
+            messages: EmailMessage instances
+
+        Returns:
+            Number of messages sent; raises the first error once all were tried
+        """
+        errors = self.send_each(messages)
+        for error in errors:
+            if error is not None:
+                raise error
+        return len(errors)
+
+    def send_each(self, messages) -> List[Optional[Exception]]:
+        """
+        Send EmailMessages one by one over pooled connections
+
+        Args:
+            messages: EmailMessage instances
+
+        Returns:
+            Error of every message (None when sent), in order
+        """
+        messages = list(messages)
+        errors = []
+        connection = None
+        for message in messages:
+            try:
+                if connection is None:
+                    connection = self._checkout()
+            except Exception as e:
+                # Server unreachable - no point trying the rest now
+                logger.error(f"Failed to open email connection: {e}")
+                errors += [e] * (len(messages) - len(errors))
+                break
+
+            try:
+                connection = self._send(connection, message)
+                errors.append(None)
+            except Exception as e:
+                # State of the SMTP session is unknown after a failure
+                self._close(connection)
+                connection = None
+                errors.append(e)
+
+        if connection is not None:
+            self._checkin(connection)
+        return errors
+
+    def _send(self, connection: PooledConnection, message) -> PooledConnection:
+        """Send message; returns the connection it went over (a new one after reconnecting)"""
+        try:
+            connection.backend.send_messages([message])
+        except CONNECTION_ERRORS as e:
+            logger.warning(f"SMTP connection lost ({e}), reconnecting")
+            self._close(connection)
+            connection = self._open()
+            connection.backend.send_messages([message])
+        connection.sent += 1
+        return connection
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self._close(connection)
+
+    def _checkout(self) -> PooledConnection:
+        while True:
+            with self._lock:
+                if self._pid != os.getpid():
+                    # Sockets inherited from the parent process belong to it
+                    self._idle, self._pid = [], os.getpid()
+                connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                return self._open()
+
+            idle_for = time.monotonic() - connection.last_used
+            if idle_for > settings.EMAIL_POOL_IDLE_TIMEOUT or connection.sent >= settings.EMAIL_POOL_MAX_MESSAGES:
+                self._close(connection)
+            elif idle_for > settings.EMAIL_POOL_HEALTH_CHECK_INTERVAL and not self._is_alive(connection):
+                self._close(connection)
+            else:
+                return connection
+
+    def _checkin(self, connection: PooledConnection):
+        connection.last_used = time.monotonic()
+        with self._lock:
+            if len(self._idle) < settings.EMAIL_POOL_SIZE and self._pid == os.getpid():
+                self._idle.append(connection)
+                return
+        self._close(connection)
+
+    @staticmethod
+    def _open() -> PooledConnection:
+        backend = get_connection(fail_silently=False)
+        backend.open()
+        return PooledConnection(backend)
+
+    @staticmethod
+    def _is_alive(connection: PooledConnection) -> bool:
+        smtp = getattr(connection.backend, 'connection', None)
+        if smtp is None:
+            # Not an SMTP backend (console, locmem) - nothing to check
+            return True
+        try:
+            return smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @staticmethod
+    def _close(connection: PooledConnection):
+        try:
+            connection.backend.close()
+        except Exception as e:
+            logger.debug(f"Error closing email connection: {e}")
+
+
+smtp_pool = SMTPConnectionPool()
+
+
+@worker_process_shutdown.connect
+def close_smtp_pool(**kwargs):
+    smtp_pool.close_all()
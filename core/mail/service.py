@@ -1,6 +1,7 @@
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
+from django.db import transaction
 from core.error_handling.enums import ErrorCode
 from core.error_handling.exceptions import CustomValidationError
 import logging
@@ -50,58 +51,51 @@ class EmailService:
             logger.error(f"Failed to send email to {recipient_email}: {e}")
             raise CustomValidationError(ErrorCode.EMAIL_SEND_FAILED)
     
+    @staticmethod
+    def send_transactional_email(email_type, user, code=None, async_send=True):
+        """
+        Send transactional email (verification, password_reset, welcome)
+        
+        Args:
+            email_type: Key of TRANSACTIONAL_EMAILS
+            user: Recipient user
+            code: Verification or reset code
+            async_send: Whether to send email asynchronously via Celery (one task,
+                verification and reset codes on the high priority queue). The task
+                is queued once the current transaction commits, so the worker finds
+                the user row
+        """
+        from .tasks import queue_transactional_email, _send_transactional_email_sync
+        
+        try:
+            if async_send:
+                user_id = user.id
+                transaction.on_commit(lambda: queue_transactional_email(email_type, user_id, code))
+                return None
+            return _send_transactional_email_sync(email_type, user, code)
+            
+        except Exception as e:
+            logger.error(f"Failed to send {email_type} email to {user.email}: {e}")
+            raise CustomValidationError(ErrorCode.EMAIL_SEND_FAILED)
+    
     @staticmethod
     def send_verification_email(user, verification_code, async_send=True):
         """Send email verification email"""
-        context = {
-            'username': user.username,
-            'verification_code': verification_code.code,
-            'verification_url': f"{getattr(settings, 'FRONTEND_URL', '')}/verify-email"
-        }
-        
-        return EmailService.send_email(
-            subject='Verify Your Email - Banister',
-            recipient_email=user.email,
-            template_name='emails/verification_email.html',
-            context=context,
-            plain_message=f'Your verification code is: {verification_code.code}',
-            async_send=async_send
+        return EmailService.send_transactional_email(
+            'verification', user, verification_code.code, async_send=async_send
         )
     
     @staticmethod
     def send_password_reset_email(user, reset_code, async_send=True):
         """Send password reset email"""
-        context = {
-            'username': user.username,
-            'reset_code': reset_code.code,
-            'reset_url': f"{getattr(settings, 'FRONTEND_URL', '')}/reset-password"
-        }
-        
-        return EmailService.send_email(
-            subject='Reset Your Password - Banister',
-            recipient_email=user.email,
-            template_name='emails/password_reset_email.html',
-            context=context,
-            plain_message=f'Your password reset code is: {reset_code.code}',
-            async_send=async_send
+        return EmailService.send_transactional_email(
+            'password_reset', user, reset_code.code, async_send=async_send
         )
     
     @staticmethod
     def send_welcome_email(user, async_send=True):
         """Send welcome email to new user"""
-        context = {
-            'username': user.username,
-            'login_url': f"{getattr(settings, 'FRONTEND_URL', '')}/login"
-        }
-        
-        return EmailService.send_email(
-            subject='Welcome to Banister! 🎉',
-            recipient_email=user.email,
-            template_name='emails/welcome_email.html',
-            context=context,
-            plain_message=f'Welcome {user.username}! Thank you for joining Banister.',
-            async_send=async_send
-        )
+        return EmailService.send_transactional_email('welcome', user, async_send=async_send)
 
 
 # Create singleton instance
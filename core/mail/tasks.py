@@ -1,26 +1,26 @@
+from smtplib import SMTPRecipientsRefused, SMTPResponseException
 from celery import shared_task
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from django.core.mail import EmailMultiAlternatives
 from django.conf import settings
 from core.error_handling.enums import ErrorCode
 from core.error_handling.exceptions import CustomValidationError
+from .connection import smtp_pool
+from .templates import email_renderer
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def _send_email_sync(subject, recipient_email, template_name, context=None, plain_message=None):
+def _render_email(template_name, context=None, plain_message=None):
     """
-    Synchronous email sending function (shared between service and tasks)
+    Render email template; returns (html_message, plain_message)
     
     Args:
-        subject: Email subject
-        recipient_email: Recipient email address
         template_name: Template name (e.g., 'emails/verification_email.html')
         context: Template context variables
         plain_message: Plain text fallback message
     """
-    context = context or {}
+    context = dict(context or {})
     
     # Add common context variables
     context.update({
@@ -28,22 +28,50 @@ def _send_email_sync(subject, recipient_email, template_name, context=None, plai
         'support_url': f"{getattr(settings, 'FRONTEND_URL', '')}/support"
     })
     
-    # Render HTML template
-    html_message = render_to_string(template_name, context)
+    # Render HTML template (compiled once per process, layout prerendered)
+    html_message = email_renderer.render(template_name, context)
     
     # Use plain message if provided, otherwise extract from HTML
     if not plain_message:
         plain_message = f"Please check the HTML version of this email."
     
-    # Send email
-    send_mail(
+    return html_message, plain_message
+
+
+def _make_email(subject, recipient_email, html_message, plain_message):
+    message = EmailMultiAlternatives(
         subject=subject,
-        message=plain_message,
+        body=plain_message,
         from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[recipient_email],
-        html_message=html_message,
-        fail_silently=False,
+        to=[recipient_email]
     )
+    message.attach_alternative(html_message, 'text/html')
+    return message
+
+
+def _is_permanent_email_error(error):
+    """Whether the server rejected the message for good (5xx reply, refused recipient)"""
+    if isinstance(error, SMTPRecipientsRefused):
+        return True
+    return isinstance(error, SMTPResponseException) and error.smtp_code >= 500
+
+
+def _send_email_sync(subject, recipient_email, template_name, context=None, plain_message=None):
+    """
+    Synchronous email sending function (shared between service and tasks)
+    
+    Args:
+        subject: Email subject
+        recipient_email: Recipient email address
+        template_name: Template name (e.g., 'emails/verification_email.html')
+        context: Template context variables
+        plain_message: Plain text fallback message
+    """
+    html_message, plain_message = _render_email(template_name, context, plain_message)
+    message = _make_email(subject, recipient_email, html_message, plain_message)
+    
+    # Send over a pooled connection (no SMTP handshake per email)
+    smtp_pool.send_messages([message])
     
     logger.info(f"Email sent successfully to {recipient_email}")
     return True
@@ -72,87 +100,115 @@ def send_email_task(self, subject, recipient_email, template_name, context=None,
         raise CustomValidationError(ErrorCode.EMAIL_SEND_FAILED)
 
 
-@shared_task(bind=True, max_retries=3)
-def send_verification_email_task(self, user_id, verification_code):
-    """Celery task for sending verification email"""
-    try:
-        from apps.authentication.models import User
-        
-        user = User.objects.get(id=user_id)
-        context = {
+# Transactional emails: what is sent for each type (code: verification or reset code)
+TRANSACTIONAL_EMAILS = {
+    'verification': {
+        'subject': 'Verify Your Email - Banister',
+        'template_name': 'emails/verification_email.html',
+        'context': lambda user, code: {
             'username': user.username,
-            'verification_code': verification_code,
+            'verification_code': code,
             'verification_url': f"{getattr(settings, 'FRONTEND_URL', '')}/verify-email"
-        }
-        
-        return send_email_task.delay(
-            subject='Verify Your Email - Banister',
-            recipient_email=user.email,
-            template_name='emails/verification_email.html',
-            context=context,
-            plain_message=f'Your verification code is: {verification_code}'
-        )
+        },
+        'plain_message': lambda user, code: f'Your verification code is: {code}',
+    },
+    'password_reset': {
+        'subject': 'Reset Your Password - Banister',
+        'template_name': 'emails/password_reset_email.html',
+        'context': lambda user, code: {
+            'username': user.username,
+            'reset_code': code,
+            'reset_url': f"{getattr(settings, 'FRONTEND_URL', '')}/reset-password"
+        },
+        'plain_message': lambda user, code: f'Your password reset code is: {code}',
+    },
+    'welcome': {
+        'subject': 'Welcome to Banister! 🎉',
+        'template_name': 'emails/welcome_email.html',
+        'context': lambda user, code: {
+            'username': user.username,
+            'login_url': f"{getattr(settings, 'FRONTEND_URL', '')}/login"
+        },
+        'plain_message': lambda user, code: f'Welcome {user.username}! Thank you for joining Banister.',
+    },
+}
+
+# Users wait for these codes - they go to the email_high queue, away from bulk mail
+HIGH_PRIORITY_EMAILS = {'verification', 'password_reset'}
+HIGH_PRIORITY_QUEUE = 'email_high'
+
+
+def _send_transactional_email_sync(email_type, user, code=None):
+    """Render and send a transactional email to user"""
+    email = TRANSACTIONAL_EMAILS[email_type]
+    return _send_email_sync(
+        subject=email['subject'],
+        recipient_email=user.email,
+        template_name=email['template_name'],
+        context=email['context'](user, code),
+        plain_message=email['plain_message'](user, code)
+    )
+
+
+def queue_transactional_email(email_type, user_id, code=None):
+    """Queue a transactional email; verification and reset codes go to the high priority queue"""
+    options = {'queue': HIGH_PRIORITY_QUEUE} if email_type in HIGH_PRIORITY_EMAILS else {}
+    return send_transactional_email_task.apply_async(args=[email_type, user_id, code], **options)
+
+
+def _run_transactional_email_task(task, email_type, user_id, code=None):
+    from apps.authentication.models import User
+    
+    try:
+        user = User.objects.get(id=user_id)
+    except User.DoesNotExist as e:
+        # Queued from a transaction that is not visible yet (or rolled back)
+        if task.request.retries < task.max_retries:
+            raise task.retry(countdown=settings.EMAIL_RETRY_DELAY, exc=e)
+        logger.error(f"Failed to send {email_type} email: user {user_id} not found")
+        return f"User {user_id} not found"
+    
+    try:
+        _send_transactional_email_sync(email_type, user, code)
+        return f"{email_type} email sent to {user.email}"
         
     except Exception as e:
-        logger.error(f"Failed to send verification email: {e}")
-        if self.request.retries < self.max_retries:
-            raise self.retry(countdown=60, exc=e)
+        logger.error(f"Failed to send {email_type} email to {user.email}: {e}")
+        if task.request.retries < task.max_retries:
+            raise task.retry(countdown=settings.EMAIL_RETRY_DELAY, exc=e)
         raise CustomValidationError(ErrorCode.EMAIL_SEND_FAILED)
 
 
+@shared_task(bind=True, max_retries=3)
+def send_transactional_email_task(self, email_type, user_id, code=None):
+    """
+    Celery task rendering and sending a transactional email in one hop
+    
+    Args:
+        email_type: Key of TRANSACTIONAL_EMAILS (verification, password_reset, welcome)
+        user_id: Recipient user ID
+        code: Verification or reset code
+    """
+    return _run_transactional_email_task(self, email_type, user_id, code)
+
+
+# Older entry points, sending in one hop as well (routed like their email types in celery.py)
+@shared_task(bind=True, max_retries=3)
+def send_verification_email_task(self, user_id, verification_code):
+    """Celery task for sending verification email"""
+    return _run_transactional_email_task(self, 'verification', user_id, verification_code)
+
+
 @shared_task(bind=True, max_retries=3)
 def send_password_reset_email_task(self, user_id, reset_code):
     """Celery task for sending password reset email"""
-    try:
-        from apps.authentication.models import User
-        
-        user = User.objects.get(id=user_id)
-        context = {
-            'username': user.username,
-            'reset_code': reset_code,
-            'reset_url': f"{getattr(settings, 'FRONTEND_URL', '')}/reset-password"
-        }
-        
-        return send_email_task.delay(
-            subject='Reset Your Password - Banister',
-            recipient_email=user.email,
-            template_name='emails/password_reset_email.html',
-            context=context,
-            plain_message=f'Your password reset code is: {reset_code}'
-        )
-        
-    except Exception as e:
-        logger.error(f"Failed to send password reset email: {e}")
-        if self.request.retries < self.max_retries:
-            raise self.retry(countdown=60, exc=e)
-        raise CustomValidationError(ErrorCode.EMAIL_SEND_FAILED)
+    return _run_transactional_email_task(self, 'password_reset', user_id, reset_code)
 
 
 @shared_task(bind=True, max_retries=3)
 def send_welcome_email_task(self, user_id):
     """Celery task for sending welcome email"""
-    try:
-        from apps.authentication.models import User
-        
-        user = User.objects.get(id=user_id)
-        context = {
-            'username': user.username,
-            'login_url': f"{getattr(settings, 'FRONTEND_URL', '')}/login"
-        }
-        
-        return send_email_task.delay(
-            subject='Welcome to Banister! 🎉',
-            recipient_email=user.email,
-            template_name='emails/welcome_email.html',
-            context=context,
-            plain_message=f'Welcome {user.username}! Thank you for joining Banister.'
-        )
-        
-    except Exception as e:
-        logger.error(f"Failed to send welcome email: {e}")
-        if self.request.retries < self.max_retries:
-            raise self.retry(countdown=60, exc=e)
-        raise CustomValidationError(ErrorCode.EMAIL_SEND_FAILED)
+    return _run_transactional_email_task(self, 'welcome', user_id)
 
 
 @shared_task(bind=True, max_retries=3)
@@ -160,33 +216,93 @@ def send_bulk_email_task(self, email_list, subject, template_name, context=None)
     """
     Celery task for sending bulk emails
     
+    The template is rendered once (the context is shared by all recipients)
+    and recipients are split into chunks of EMAIL_BATCH_SIZE, each sent by
+    one send_email_chunk_task over one pooled SMTP connection. A retry gets
+    only the recipients whose chunks were not queued yet.
+    
     Args:
         email_list: List of email addresses
         subject: Email subject
         template_name: Template name
         context: Template context variables
     """
+    email_list = list(dict.fromkeys(email for email in email_list if email))
+    queued = 0
     try:
-        context = context or {}
-        results = []
+        html_message, plain_message = _render_email(template_name, context)
         
-        for email in email_list:
-            try:
-                result = send_email_task.delay(
-                    subject=subject,
-                    recipient_email=email,
-                    template_name=template_name,
-                    context=context
-                )
-                results.append(result)
-            except Exception as e:
-                logger.error(f"Failed to queue email for {email}: {e}")
-                results.append(None)
+        chunks = 0
+        for start in range(0, len(email_list), settings.EMAIL_BATCH_SIZE):
+            chunk = email_list[start:start + settings.EMAIL_BATCH_SIZE]
+            send_email_chunk_task.delay(
+                recipients=chunk,
+                subject=subject,
+                html_message=html_message,
+                plain_message=plain_message
+            )
+            queued += len(chunk)
+            chunks += 1
         
-        return f"Queued {len(results)} emails"
+        return f"Queued {len(email_list)} emails in {chunks} chunks"
         
     except Exception as e:
-        logger.error(f"Failed to send bulk emails: {e}")
+        logger.error(f"Failed to send bulk emails after queueing {queued} of {len(email_list)}: {e}")
         if self.request.retries < self.max_retries:
-            raise self.retry(countdown=60, exc=e)
-        raise CustomValidationError(ErrorCode.EMAIL_SEND_FAILED)
\ No newline at end of file
+            raise self.retry(
+                countdown=60,
+                exc=e,
+                args=[],
+                kwargs={
+                    'email_list': email_list[queued:],
+                    'subject': subject,
+                    'template_name': template_name,
+                    'context': context
+                }
+            )
+        raise CustomValidationError(ErrorCode.EMAIL_SEND_FAILED)
+
+
+@shared_task(bind=True)
+def send_email_chunk_task(self, recipients, subject, html_message, plain_message):
+    """
+    Celery task sending one chunk of a bulk email over one SMTP connection
+    
+    Addresses that failed with temporary errors are retried (only them) up
+    to EMAIL_RETRY_ATTEMPTS times, EMAIL_RETRY_DELAY seconds apart.
+    Addresses the server rejected (5xx) are not retried.
+    
+    Returns:
+        Dict with sent count, failed and retrying addresses
+    """
+    messages = [_make_email(subject, email, html_message, plain_message) for email in recipients]
+    errors = smtp_pool.send_each(messages)
+    
+    report = {'sent': 0, 'failed': [], 'retrying': []}
+    retry = []
+    for email, error in zip(recipients, errors):
+        if error is None:
+            report['sent'] += 1
+        elif _is_permanent_email_error(error) or self.request.retries >= settings.EMAIL_RETRY_ATTEMPTS:
+            logger.error(f"Failed to send email to {email}: {error}")
+            report['failed'].append(email)
+        else:
+            retry.append(email)
+    
+    logger.info(
+        f"Email chunk (attempt {self.request.retries + 1}): {report['sent']}/{len(recipients)} sent, "
+        f"{len(report['failed'])} failed, {len(retry)} to retry"
+    )
+    if retry:
+        report['retrying'] = retry
+        send_email_chunk_task.apply_async(
+            kwargs={
+                'recipients': retry,
+                'subject': subject,
+                'html_message': html_message,
+                'plain_message': plain_message
+            },
+            countdown=settings.EMAIL_RETRY_DELAY,
+            retries=self.request.retries + 1
+        )
+    return report
@@ -0,0 +1,152 @@
+import logging
+import threading
+from pathlib import Path
+from celery.signals import worker_process_init
+from django.conf import settings
+from django.template import Context, Engine
+from django.template.base import Node, TextNode, VariableNode
+from django.template.loader import render_to_string
+from django.template.loader_tags import BlockNode, ExtendsNode
+
+logger = logging.getLogger(__name__)
+
+
+# Stands for the content block while the layout is rendered
+CONTENT_PLACEHOLDER = '\x00email-content\x00'
+
+
+class EmailTemplateRenderer:
+    """
+    Email rendering with compiled templates and a prerendered layout
+
+    Templates are compiled once per process (at worker start, see warm) by
+    an engine with the cached loader, whatever DEBUG is. Emails extending a
+    layout with only a `content` block are rendered in two parts: the
+    layout around the block is rendered once per distinct value of the
+    variables it uses (e.g. subject) and cached as two strings; per email
+    only the content block is rendered and put between them. Output is the
+    same as render_to_string. Other templates are rendered whole.
+    """
+
+    LAYOUT_CACHE_SIZE = 256
+
+    def __init__(self):
+        self._engine = None
+        self._plans = {}
+        self._layouts = {}
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            options = settings.TEMPLATES[0]
+            self._engine = Engine(
+                dirs=[str(path) for path in options.get('DIRS', [])],
+                loaders=[('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ])],
+                debug=False,
+            )
+        return self._engine
+
+    def render(self, template_name, context=None):
+        """Render email template to HTML (same output as render_to_string)"""
+        if not settings.EMAIL_TEMPLATE_CACHE_ENABLED:
+            return render_to_string(template_name, context)
+
+        context = context or {}
+        template, block, layout_name, layout_variables = self._plan(template_name)
+        if block is None:
+            return template.render(Context(context))
+
+        head, tail = self._layout(layout_name, layout_variables, context)
+        render_context = Context(context)
+        with render_context.render_context.push_state(template), render_context.bind_template(template):
+            return head + block.nodelist.render(render_context) + tail
+
+    def warm(self, directory='emails'):
+        """Compile templates of directory in every template dir; returns their count"""
+        names = set()
+        for template_dir in self.engine.dirs:
+            root = Path(template_dir)
+            names.update(str(path.relative_to(root)) for path in (root / directory).glob('*.html'))
+        for name in sorted(names):
+            self._plan(name)
+        logger.info(f"Compiled {len(names)} email templates")
+        return len(names)
+
+    def clear(self):
+        with self._lock:
+            self._engine = None
+            self._plans = {}
+            self._layouts = {}
+
+    def _plan(self, template_name):
+        """(template, content block or None, layout name, layout variables), computed once per template"""
+        plan = self._plans.get(template_name)
+        if plan is None:
+            template = self.engine.get_template(template_name)
+            plan = (template, *self._split(template))
+            with self._lock:
+                self._plans[template_name] = plan
+        return plan
+
+    def _split(self, template):
+        """Content block and layout of a template that only fills `content` of a constant layout"""
+        extends = template.nodelist.get_nodes_by_type(ExtendsNode)
+        if not extends or set(extends[0].blocks) != {'content'}:
+            return None, None, ()
+        layout_name = extends[0].parent_name.var
+        if not isinstance(layout_name, str):
+            return None, None, ()
+
+        block = extends[0].blocks['content']
+        if 'block' in self._variables(block.nodelist):
+            # {{ block.super }} needs the full inheritance machinery
+            return None, None, ()
+
+        layout = self.engine.get_template(layout_name)
+        nodes = layout.nodelist.get_nodes_by_type(Node)
+        if any(not isinstance(node, (TextNode, VariableNode, BlockNode)) for node in nodes):
+            # Tags ({% if %}, {% include %}, ...) may use variables we can't key the cache on
+            return None, None, ()
+        return block, layout_name, tuple(sorted(self._variables(layout.nodelist)))
+
+    @staticmethod
+    def _variables(nodelist):
+        """Root names of variables used by nodes (filter arguments included)"""
+        names = set()
+        for node in nodelist.get_nodes_by_type(VariableNode):
+            variables = [node.filter_expression.var]
+            variables += [arg for func, args in node.filter_expression.filters for lookup, arg in args if lookup]
+            for variable in variables:
+                lookups = getattr(variable, 'lookups', None)
+                if lookups:
+                    names.add(lookups[0])
+        return names
+
+    def _layout(self, layout_name, variables, context):
+        """Layout rendered around the placeholder, split into (head, tail)"""
+        key = (layout_name, tuple((name in context, repr(context.get(name))) for name in variables))
+        parts = self._layouts.get(key)
+        if parts is None:
+            layout = self.engine.from_string(
+                f'{{% extends "{layout_name}" %}}{{% block content %}}{CONTENT_PLACEHOLDER}{{% endblock %}}'
+            )
+            rendered = layout.render(Context({name: context[name] for name in variables if name in context}))
+            parts = tuple(rendered.split(CONTENT_PLACEHOLDER))
+            with self._lock:
+                if len(self._layouts) >= self.LAYOUT_CACHE_SIZE:
+                    self._layouts.clear()
+                self._layouts[key] = parts
+        return parts
+
+
+email_renderer = EmailTemplateRenderer()
+
+
+@worker_process_init.connect
+def warm_email_templates(**kwargs):
+    if settings.EMAIL_TEMPLATE_CACHE_ENABLED:
+        email_renderer.warm()
@@ -0,0 +1,252 @@
+import hashlib
+import logging
+import random
+import uuid
+from typing import List, Dict, Any, Optional
+from django.conf import settings
+from django.utils import timezone
+from redis.exceptions import RedisError
+from core.firebase.service import firebase_service
+from core.redis.client import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class PushDelivery:
+    """
+    Push delivery pipeline on top of FirebaseService.send_each
+
+    A push message is {'key', 'user_id', 'token', 'data'}, where key is an
+    idempotency key unique per notification and device. Before a message is
+    sent its key is claimed in Redis (SET NX); messages whose key is already
+    claimed were sent by an earlier attempt and are skipped, so retries of a
+    task never notify a device twice (delivery is at most once per key).
+
+    Failed messages are sorted by FCM error: tokens FCM reports as dead are
+    deactivated in UserFCMToken, retryable errors (quota, unavailable,
+    internal) are sent again by deliver_push_task with exponential backoff,
+    other permanent errors and messages out of retries are stored as
+    PushDeadLetter rows.
+    """
+
+    KEY_PREFIX = 'push:sent:'
+
+    @staticmethod
+    def new_key_prefix() -> str:
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def make_message(prefix: str, user_id: int, token: str, data: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Push message to one device
+
+        Args:
+            prefix: Idempotency key prefix, stable across retries of the notification
+            user_id: Owner of the token
+            token: FCM token
+            data: FCM data payload
+        """
+        return {
+            'key': f"{prefix}:{user_id}:{hashlib.sha1(token.encode()).hexdigest()[:16]}",
+            'user_id': user_id,
+            'token': token,
+            'data': data
+        }
+
+    def enqueue(self, messages: List[Dict[str, Any]], title: str, body: str, countdown: float = 0, attempt: int = 0):
+        """Send messages from a Celery worker (notifications queue)"""
+        from .tasks import deliver_push_task
+        for start in range(0, len(messages), firebase_service.MAX_BATCH_SIZE):
+            deliver_push_task.apply_async(
+                kwargs={
+                    'messages': messages[start:start + firebase_service.MAX_BATCH_SIZE],
+                    'title': title,
+                    'body': body,
+                    'attempt': attempt
+                },
+                countdown=countdown
+            )
+
+    def send(self, messages: List[Dict[str, Any]], title: str, body: str, attempt: int = 0) -> Dict[str, int]:
+        """
+        Send messages now; failures are scheduled for retry or dead-lettered
+
+        Args:
+            messages: Push messages (any number, batched by MAX_BATCH_SIZE)
+            title: Push notification title
+            body: Push notification body
+            attempt: Number of earlier attempts for these messages
+
+        Returns:
+            Dict with counts: sent, failed (= retrying + dead + messages to
+            pruned tokens), pruned tokens and skipped duplicates
+        """
+        result = {'sent': 0, 'failed': 0, 'retrying': 0, 'dead': 0, 'pruned': 0, 'duplicates': 0}
+        if not messages:
+            return result
+        if not firebase_service.available:
+            logger.warning(f"Push backend unavailable, {len(messages)} push messages dropped")
+            return result
+
+        started_at = timezone.now()
+        retry, dead, invalid_tokens = [], [], []
+        for start in range(0, len(messages), firebase_service.MAX_BATCH_SIZE):
+            batch = messages[start:start + firebase_service.MAX_BATCH_SIZE]
+            claimed = self._claim(batch)
+            result['duplicates'] += len(batch) - len(claimed)
+            if not claimed:
+                continue
+
+            success, response = firebase_service.send_each(claimed, title, body)
+            if not success:
+                # Whole request failed (network, auth) - nothing was delivered
+                logger.error(f"Failed to send push batch: {response}")
+                result['failed'] += len(claimed)
+                retry += [(message, 'BatchError', response) for message in claimed]
+                continue
+
+            for message, item in zip(claimed, response.responses):
+                if item.success:
+                    result['sent'] += 1
+                    continue
+
+                result['failed'] += 1
+                if firebase_service.is_invalid_token_error(item.exception):
+                    invalid_tokens.append(message['token'])
+                elif firebase_service.is_retryable_error(item.exception):
+                    retry.append((message, firebase_service.error_code(item.exception), str(item.exception)))
+                else:
+                    dead.append((message, firebase_service.error_code(item.exception), str(item.exception)))
+
+        if invalid_tokens:
+            result['pruned'] = self._prune_tokens(invalid_tokens, started_at)
+
+        if retry:
+            self._release([message for message, code, error in retry])
+            if attempt < settings.NOTIFICATION_PUSH_MAX_RETRIES:
+                countdown = self.backoff(attempt)
+                self.enqueue([message for message, code, error in retry], title, body, countdown, attempt + 1)
+                result['retrying'] = len(retry)
+                logger.warning(f"{len(retry)} push messages failed, retry {attempt + 1} in {countdown:.0f}s")
+            else:
+                dead += retry
+
+        if dead:
+            self._dead_letter(dead, title, body, attempt + 1)
+            result['dead'] = len(dead)
+
+        logger.info(
+            f"Push delivery: {result['sent']} sent, {result['failed']} failed, "
+            f"{result['pruned']} tokens pruned, {result['duplicates']} duplicates skipped"
+        )
+        return result
+
+    def requeue(self, dead_letters) -> int:
+        """Send dead-lettered messages again (e.g. after an FCM outage) and delete their rows"""
+        from apps.notifications.models import PushDeadLetter
+
+        dead_letters = list(dead_letters)
+        groups = {}
+        for letter in dead_letters:
+            groups.setdefault((letter.title, letter.body), []).append({
+                'key': letter.idempotency_key,
+                'user_id': letter.user_id,
+                'token': letter.token,
+                'data': letter.data
+            })
+
+        for (title, body), messages in groups.items():
+            self._release(messages)
+            self.enqueue(messages, title, body)
+        PushDeadLetter.objects.filter(id__in=[letter.id for letter in dead_letters]).delete()
+        return len(dead_letters)
+
+    @staticmethod
+    def backoff(attempt: int) -> float:
+        """Exponential backoff with jitter: base * 2^attempt, capped, randomized down to half"""
+        delay = min(
+            settings.NOTIFICATION_PUSH_RETRY_BACKOFF * 2 ** attempt,
+            settings.NOTIFICATION_PUSH_RETRY_BACKOFF_MAX
+        )
+        return random.uniform(delay / 2, delay)
+
+    @staticmethod
+    def _prune_tokens(tokens: List[str], started_at) -> int:
+        """
+        Deactivate dead tokens in one UPDATE and unsubscribe them from their
+        topics; tokens registered again while the push was in flight are left alone
+        """
+        from apps.authentication.models import UserFCMToken
+        from .tasks import unsubscribe_topics_task
+
+        dead = list(UserFCMToken.objects.filter(
+            token__in=tokens,
+            is_active=True,
+            updated_at__lt=started_at
+        ).values_list('id', 'user_id', 'token'))
+        if not dead:
+            return 0
+
+        pruned = UserFCMToken.objects.filter(
+            id__in=[token_id for token_id, user_id, token in dead],
+            is_active=True,
+            updated_at__lt=started_at
+        ).update(is_active=False)
+        logger.info(f"Deactivated {pruned} invalid FCM tokens")
+
+        tokens_by_user = {}
+        for token_id, user_id, token in dead:
+            tokens_by_user.setdefault(user_id, []).append(token)
+        for user_id, user_tokens in tokens_by_user.items():
+            unsubscribe_topics_task.delay(user_id, user_tokens)
+        return pruned
+
+    def _claim(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Messages whose idempotency key was not claimed before"""
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for message in messages:
+                pipe.set(self.KEY_PREFIX + message['key'], 1, nx=True, ex=settings.NOTIFICATION_PUSH_IDEMPOTENCY_TTL)
+            claimed = pipe.execute()
+        except RedisError as e:
+            # Delivery matters more than deduplication
+            logger.warning(f"Push idempotency check unavailable, sending without it: {e}")
+            return messages
+        return [message for message, ok in zip(messages, claimed) if ok]
+
+    def _release(self, messages: List[Dict[str, Any]]):
+        """Let failed messages be claimed again by their retry"""
+        try:
+            redis_client.delete(*[self.KEY_PREFIX + message['key'] for message in messages])
+        except RedisError as e:
+            logger.error(f"Failed to release push idempotency keys: {e}")
+
+    @staticmethod
+    def _dead_letter(failures: List[tuple], title: str, body: str, attempts: int):
+        from apps.notifications.models import PushDeadLetter
+
+        PushDeadLetter.objects.bulk_create([
+            PushDeadLetter(
+                user_id=message['user_id'],
+                notification_id=PushDelivery._notification_id(message['data']),
+                notification_type=message['data'].get('notification_type', ''),
+                token=message['token'],
+                idempotency_key=message['key'],
+                title=title,
+                body=body,
+                data=message['data'],
+                error_code=code,
+                error_message=error,
+                attempts=attempts
+            )
+            for message, code, error in failures
+        ])
+        logger.error(f"{len(failures)} push messages moved to dead letters")
+
+    @staticmethod
+    def _notification_id(data: Dict[str, str]) -> Optional[int]:
+        value = data.get('notification_id')
+        return int(value) if value and value.isdigit() else None
+
+
+push_delivery = PushDelivery()
@@ -0,0 +1,106 @@
+import json
+import logging
+from typing import List, Dict, Any
+from django.conf import settings
+from django.utils import timezone
+from redis.exceptions import RedisError
+from core.redis.client import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+# -1: window was quiet, send now (and open a window); 0: buffered;
+# n > 0: first buffered item, flush in n seconds
+ADD_SCRIPT = """
+if redis.call('SET', KEYS[1], 1, 'NX', 'EX', ARGV[2]) then
+    return -1
+end
+local length = redis.call('RPUSH', KEYS[2], ARGV[1])
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[2]) * 10)
+if length == 1 then
+    local ttl = redis.call('TTL', KEYS[1])
+    if ttl < 1 then
+        ttl = 1
+    end
+    return ttl
+end
+return 0
+"""
+
+# Take buffered items; a digest sent now opens the next window
+TAKE_SCRIPT = """
+local items = redis.call('LRANGE', KEYS[2], 0, -1)
+redis.call('DEL', KEYS[2])
+if #items > 0 then
+    redis.call('SET', KEYS[1], 1, 'EX', ARGV[1])
+end
+return items
+"""
+
+
+class NotificationDigest:
+    """
+    Per-user coalescing of bursty notification types.
+
+    The first notification of a type goes out immediately and opens a
+    window of NOTIFICATION_DIGEST_WINDOW_SECONDS. Notifications of the same
+    type for the same user arriving within the window are buffered in Redis
+    and sent together as one digest (one Notification row and one push)
+    when the window closes. Redis failures disable coalescing.
+    """
+
+    def __init__(self):
+        self._add = None
+        self._take = None
+
+    @property
+    def window(self):
+        return settings.NOTIFICATION_DIGEST_WINDOW_SECONDS
+
+    def enabled_for(self, notification_type: str) -> bool:
+        return self.window > 0 and notification_type in settings.NOTIFICATION_DIGEST_TYPES
+
+    def _keys(self, user_id, notification_type):
+        key = f'notifications:digest:{user_id}:{notification_type}'
+        return key, f'{key}:items'
+
+    def coalesce(self, user_ids: List[int], notification_type: str, item: Dict[str, Any]) -> List[int]:
+        """
+        Buffer item for users inside a window of this type.
+        Returns ids of users to notify right away.
+        """
+        from .tasks import flush_notification_digest_task
+
+        if not user_ids:
+            return []
+        payload = json.dumps({**item, 'created_at': timezone.now().isoformat()}, default=str)
+        try:
+            if self._add is None:
+                self._add = redis_client.register_script(ADD_SCRIPT)
+            pipe = redis_client.pipeline(transaction=False)
+            for user_id in user_ids:
+                self._add(keys=self._keys(user_id, notification_type), args=[payload, self.window], client=pipe)
+            results = pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Notification digest unavailable, sending {notification_type} directly: {e}")
+            return list(user_ids)
+
+        send_now = []
+        for user_id, state in zip(user_ids, results):
+            if state < 0:
+                send_now.append(user_id)
+            elif state > 0:
+                flush_notification_digest_task.apply_async(args=[user_id, notification_type], countdown=state)
+        if len(send_now) < len(user_ids):
+            logger.info(f"{len(user_ids) - len(send_now)} {notification_type} notifications buffered for digests")
+        return send_now
+
+    def take(self, user_id: int, notification_type: str) -> List[Dict[str, Any]]:
+        """Buffered items of the user (oldest first); emptying the buffer"""
+        if self._take is None:
+            self._take = redis_client.register_script(TAKE_SCRIPT)
+        items = self._take(keys=self._keys(user_id, notification_type), args=[self.window])
+        return [json.loads(item) for item in items]
+
+
+notification_digest = NotificationDigest()
@@ -0,0 +1,114 @@
+import logging
+import time
+from datetime import timedelta
+from typing import Dict, Any, Optional
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from .unread import unread_counter
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationRetention:
+    """
+    Deletes notifications older than their retention window
+
+    Windows are NOTIFICATION_RETENTION_DAYS, overridden per notification type
+    by NOTIFICATION_RETENTION_DAYS_BY_TYPE. Rows go in batches of
+    NOTIFICATION_RETENTION_BATCH_SIZE: each batch is one short DELETE of the
+    oldest rows (walking the created_at indexes) committed on its own, with a
+    pause between batches so replicas and vacuum keep up. Deletes are raw SQL
+    - no model instances, signals or cascades; nothing references
+    notifications by foreign key.
+    """
+
+    def windows(self) -> Dict[Optional[str], int]:
+        """Map notification type -> retention days; None is the default for other types"""
+        return {**settings.NOTIFICATION_RETENTION_DAYS_BY_TYPE, None: settings.NOTIFICATION_RETENTION_DAYS}
+
+    def run(self, batch_size: int = None, sleep: float = None, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Delete expired notifications
+
+        Args:
+            batch_size: Rows per DELETE
+            sleep: Pause between batches, seconds
+            dry_run: Only count expired rows
+
+        Returns:
+            Dict with deleted rows (total and per type), batches and duration
+        """
+        batch_size = batch_size or settings.NOTIFICATION_RETENTION_BATCH_SIZE
+        if sleep is None:
+            sleep = settings.NOTIFICATION_RETENTION_BATCH_SLEEP_MS / 1000
+
+        started = time.monotonic()
+        now = timezone.now()
+        typed = [notification_type for notification_type in self.windows() if notification_type is not None]
+        report = {'deleted': 0, 'by_type': {}, 'batches': 0, 'dry_run': dry_run}
+        unread_users = set()
+
+        for notification_type, days in self.windows().items():
+            condition, params = self._condition(notification_type, typed, now - timedelta(days=days))
+            if dry_run:
+                deleted = self._count(condition, params)
+            else:
+                deleted = 0
+                while True:
+                    rows = self._delete_batch(condition, params, batch_size)
+                    report['batches'] += 1
+                    deleted += len(rows)
+                    unread_users.update(user_id for user_id, is_read in rows if not is_read)
+                    if len(rows) < batch_size:
+                        break
+                    if sleep:
+                        time.sleep(sleep)
+
+            report['by_type'][notification_type or 'default'] = deleted
+            report['deleted'] += deleted
+
+        # Deleted unread notifications: count these users again on next read
+        unread_counter.invalidate(unread_users)
+
+        report['duration_seconds'] = round(time.monotonic() - started, 3)
+        logger.info(
+            f"Notification retention: {'would delete' if dry_run else 'deleted'} {report['deleted']} rows "
+            f"in {report['batches']} batches, {report['duration_seconds']}s ({report['by_type']})"
+        )
+        return report
+
+    @staticmethod
+    def _condition(notification_type, typed, cutoff):
+        if notification_type is not None:
+            return 'notification_type = %s AND created_at < %s', [notification_type, cutoff]
+        if typed:
+            placeholders = ', '.join(['%s'] * len(typed))
+            return f'notification_type NOT IN ({placeholders}) AND created_at < %s', [*typed, cutoff]
+        return 'created_at < %s', [cutoff]
+
+    @staticmethod
+    def _delete_batch(condition, params, batch_size):
+        """Delete up to batch_size oldest matching rows; returns their (user_id, is_read)"""
+        from apps.notifications.models import Notification
+
+        table = Notification._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE id IN ('
+                f'SELECT id FROM {table} WHERE {condition} ORDER BY created_at LIMIT %s'
+                f') RETURNING user_id, is_read',
+                [*params, batch_size]
+            )
+            return cursor.fetchall()
+
+    @staticmethod
+    def _count(condition, params):
+        from apps.notifications.models import Notification
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {Notification._meta.db_table} WHERE {condition}', params)
+            return cursor.fetchone()[0]
+
+
+notification_retention = NotificationRetention()
@@ -1,10 +1,18 @@
 import logging
-from typing import List, Dict, Any, Optional
+from celery.utils import uuid
+from typing import List, Dict, Any, Optional, Callable
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Max
 from django.utils import timezone
+from datetime import timedelta
 from apps.authentication.models import User, UserFCMToken
-from apps.notifications.models import Notification
+from apps.notifications.models import Notification, NotificationBroadcast, NotificationBroadcastCursor
 from core.firebase.service import firebase_service
+from .delivery import push_delivery
+from .digest import notification_digest
+from .topics import notification_topics
+from .unread import unread_counter
 from core.error_handling import ErrorCode
 from core.error_handling.exceptions import CustomValidationError
 
@@ -25,6 +33,7 @@ class NotificationService:
         'WELCOME': 'Welcome',
         'EMAIL_VERIFIED': 'EmailVerified',
         'PASSWORD_RESET': 'PasswordReset',
+        'ANNOUNCEMENT': 'Announcement',
     }
     
     @staticmethod
@@ -35,7 +44,8 @@ class NotificationService:
         title: str = None,
         body: str = None,
         send_push: bool = True,
-        save_to_db: bool = True
+        save_to_db: bool = True,
+        coalesce: bool = True
     ) -> Dict[str, Any]:
         """
         Send notification to user via Firebase and save to database
@@ -48,6 +58,7 @@ class NotificationService:
             body: Push notification body
             send_push: Whether to send push notification
             save_to_db: Whether to save to database
+            coalesce: Whether bursts of digest types may be merged into one digest
             
         Returns:
             Dict with success status and details
@@ -57,11 +68,20 @@ class NotificationService:
                 'success': True,
                 'notification_id': None,
                 'push_sent': False,
+                'push_queued': False,
                 'push_error': None,
                 'db_saved': False,
-                'db_error': None
+                'db_error': None,
+                'coalesced': False
             }
             
+            if coalesce and send_push and save_to_db and notification_digest.enabled_for(notification_type):
+                item = {'data': data, 'title': title, 'body': body}
+                if not notification_digest.coalesce([user.id], notification_type, item):
+                    # Will be sent with the digest when the window closes
+                    result['coalesced'] = True
+                    return result
+            
             # Save to database
             if save_to_db:
                 try:
@@ -73,42 +93,46 @@ class NotificationService:
                         )
                         result['notification_id'] = notification.id
                         result['db_saved'] = True
+                        transaction.on_commit(lambda: unread_counter.add([user.id]))
                         logger.info(f"Notification saved to DB: {notification.id}")
                 except Exception as e:
                     result['db_error'] = str(e)
                     logger.error(f"Failed to save notification to DB: {e}")
             
-            # Send push notification
+            # Send push notification (through Celery unless NOTIFICATION_PUSH_ASYNC is off)
             if send_push:
                 try:
                     # Get user's FCM tokens
-                    fcm_tokens = UserFCMToken.objects.filter(
+                    fcm_tokens = list(UserFCMToken.objects.filter(
                         user=user,
                         is_active=True
-                    ).values_list('token', flat=True)
+                    ).values_list('token', flat=True))
                     
                     if fcm_tokens:
-                        # Prepare push notification data
-                        push_data = {
-                            'notification_type': notification_type,
-                            'notification_id': str(result['notification_id']) if result['notification_id'] else None,
-                            **(data or {})
-                        }
-                        
-                        # Send to all user's devices
-                        success, response = firebase_service.send_to_multiple(
-                            tokens=list(fcm_tokens),
-                            title=title or NotificationService._get_default_title(notification_type),
-                            body=body or NotificationService._get_default_body(notification_type),
-                            data=push_data
+                        push_data = NotificationService._get_push_data(
+                            notification_type, result['notification_id'], data
                         )
+                        prefix = (
+                            f"notification:{result['notification_id']}" if result['notification_id']
+                            else push_delivery.new_key_prefix()
+                        )
+                        messages = [
+                            push_delivery.make_message(prefix, user.id, token, push_data)
+                            for token in fcm_tokens
+                        ]
+                        title = title or NotificationService._get_default_title(notification_type)
+                        body = body or NotificationService._get_default_body(notification_type)
                         
-                        if success:
-                            result['push_sent'] = True
-                            logger.info(f"Push notification sent to {len(fcm_tokens)} devices for user {user.username}")
+                        if settings.NOTIFICATION_PUSH_ASYNC:
+                            # Queue after commit so the worker sees the saved notification
+                            transaction.on_commit(lambda: push_delivery.enqueue(messages, title, body))
+                            result['push_queued'] = True
+                            logger.info(f"Push notification queued for {len(messages)} devices of user {user.username}")
                         else:
-                            result['push_error'] = response
-                            logger.error(f"Failed to send push notification: {response}")
+                            delivery = push_delivery.send(messages, title, body)
+                            result['push_sent'] = delivery['sent'] > 0
+                            if not result['push_sent']:
+                                result['push_error'] = f"Push not delivered: {delivery}"
                     else:
                         result['push_error'] = "No active FCM tokens found for user"
                         logger.warning(f"No FCM tokens found for user {user.username}")
@@ -124,70 +148,205 @@ class NotificationService:
             raise CustomValidationError(ErrorCode.INTERNAL_SERVER_ERROR)
     
     @staticmethod
-    def send_to_multiple_users(
-        users: List[User],
+    def coalesce_recipients(
+        user_ids: List[int],
         notification_type: str,
         data: Dict[str, Any] = None,
         title: str = None,
         body: str = None,
         send_push: bool = True,
         save_to_db: bool = True
+    ) -> List[int]:
+        """
+        Buffer the notification for users inside a digest window of its type
+        
+        Returns:
+            IDs of users to notify right away (all of them when the type is not
+            in NOTIFICATION_DIGEST_TYPES)
+        """
+        if send_push and save_to_db and notification_digest.enabled_for(notification_type):
+            item = {'data': data, 'title': title, 'body': body}
+            return notification_digest.coalesce(user_ids, notification_type, item)
+        return list(user_ids)
+    
+    @staticmethod
+    def send_bulk(
+        user_ids: List[int],
+        notification_type: str,
+        data: Dict[str, Any] = None,
+        title: str = None,
+        body: str = None,
+        send_push: bool = True,
+        save_to_db: bool = True,
+        progress: Optional[Callable[[int, int], None]] = None,
+        idempotency_prefix: Optional[str] = None,
+        coalesce: bool = True,
+        saved: Optional[Dict[int, int]] = None,
+        on_saved: Optional[Callable[[Dict[int, int]], None]] = None
     ) -> Dict[str, Any]:
         """
-        Send notification to multiple users
+        Send the same notification to many users
+        
+        Users are processed in chunks of NOTIFICATION_BULK_CHUNK_SIZE: one
+        bulk INSERT of Notification rows and one token query per chunk, and
+        pushes to all devices of the chunk packed into FCM batches of up to
+        500 messages. A chunk is finished (saved and pushed) before the next
+        one starts. Failed pushes are retried per token in the background
+        (see PushDelivery).
         
         Args:
-            users: List of target users
+            user_ids: IDs of target users
             notification_type: Type of notification
             data: Additional data for the notification
             title: Push notification title
             body: Push notification body
             send_push: Whether to send push notifications
             save_to_db: Whether to save to database
+            progress: Called with (processed users, total users) after each chunk
+            idempotency_prefix: Prefix of push idempotency keys; pass the same
+                value when repeating a failed call so devices are not notified twice
+            coalesce: Whether bursts of digest types may be merged into digests
+            saved: Notification ID per user whose row a failed earlier call already
+                created (those rows are not created again)
+            on_saved: Called with {user ID: notification ID} of a chunk once its rows
+                exist, before its pushes are sent
             
         Returns:
-            Dict with results for each user
+            Dict with totals
         """
-        results = {
-            'total_users': len(users),
-            'successful': 0,
-            'failed': 0,
-            'user_results': []
+        user_ids = list(dict.fromkeys(user_ids))
+        total_users = len(user_ids)
+        chunk_size = settings.NOTIFICATION_BULK_CHUNK_SIZE
+        idempotency_prefix = idempotency_prefix or push_delivery.new_key_prefix()
+        
+        if coalesce:
+            user_ids = NotificationService.coalesce_recipients(
+                user_ids, notification_type, data, title, body, send_push, save_to_db
+            )
+        
+        title = title or NotificationService._get_default_title(notification_type)
+        body = body or NotificationService._get_default_body(notification_type)
+        
+        result = {
+            'total_users': total_users,
+            'coalesced': total_users - len(user_ids),
+            'notifications_created': 0,
+            'push_sent': 0,
+            'push_failed': 0,
+            'push_retrying': 0,
+            'tokens_pruned': 0,
+            'users_without_tokens': 0
         }
         
-        for user in users:
-            try:
-                result = NotificationService.send_notification(
-                    user=user,
-                    notification_type=notification_type,
-                    data=data,
-                    title=title,
-                    body=body,
-                    send_push=send_push,
-                    save_to_db=save_to_db
-                )
-                
-                results['user_results'].append({
-                    'user_id': user.id,
-                    'username': user.username,
-                    'result': result
-                })
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[start:start + chunk_size]
+            
+            notification_ids = {}
+            if save_to_db:
+                notification_ids = {user_id: saved[user_id] for user_id in chunk if saved and user_id in saved}
+                notifications = Notification.objects.bulk_create([
+                    Notification(user_id=user_id, notification_type=notification_type, data=data or {})
+                    for user_id in chunk if user_id not in notification_ids
+                ])
+                if notifications:
+                    unread_counter.add([notification.user_id for notification in notifications])
+                notification_ids.update({notification.user_id: notification.id for notification in notifications})
+                result['notifications_created'] += len(notifications)
+                if on_saved:
+                    on_saved(notification_ids)
+            
+            if send_push:
+                tokens = list(UserFCMToken.objects.filter(
+                    user_id__in=chunk,
+                    is_active=True
+                ).values_list('user_id', 'token'))
+                result['users_without_tokens'] += len(set(chunk) - {user_id for user_id, token in tokens})
                 
-                if result['success']:
-                    results['successful'] += 1
-                else:
-                    results['failed'] += 1
-                    
-            except Exception as e:
-                results['failed'] += 1
-                results['user_results'].append({
-                    'user_id': user.id,
-                    'username': user.username,
-                    'error': str(e)
-                })
-                logger.error(f"Failed to send notification to user {user.username}: {e}")
+                messages = [
+                    push_delivery.make_message(
+                        idempotency_prefix,
+                        user_id,
+                        token,
+                        NotificationService._get_push_data(notification_type, notification_ids.get(user_id), data)
+                    )
+                    for user_id, token in tokens
+                ]
+                delivery = push_delivery.send(messages, title, body)
+                result['push_sent'] += delivery['sent']
+                result['push_failed'] += delivery['failed']
+                result['push_retrying'] += delivery['retrying']
+                result['tokens_pruned'] += delivery['pruned']
+            
+            if progress:
+                progress(start + len(chunk), len(user_ids))
         
-        return results
+        logger.info(
+            f"Bulk notification {notification_type}: {result['notifications_created']} saved, "
+            f"{result['push_sent']} pushes sent, {result['push_failed']} failed "
+            f"({result['push_retrying']} retrying), {result['tokens_pruned']} tokens pruned"
+        )
+        return result
+    
+    @staticmethod
+    def send_to_multiple_users(
+        users: List[User],
+        notification_type: str,
+        data: Dict[str, Any] = None,
+        title: str = None,
+        body: str = None,
+        send_push: bool = True,
+        save_to_db: bool = True,
+        async_send: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Send notification to multiple users
+        
+        Args:
+            users: List of target users (or user IDs)
+            notification_type: Type of notification
+            data: Additional data for the notification
+            title: Push notification title
+            body: Push notification body
+            send_push: Whether to send push notifications
+            save_to_db: Whether to save to database
+            async_send: Whether to send via Celery (notifications queue); the task is
+                sent once the current transaction commits
+            
+        Returns:
+            Dict with total_users, queued and task_id when queued (totals are in the
+            task result), otherwise totals of send_bulk
+        """
+        user_ids = [user if isinstance(user, int) else user.id for user in users]
+        if not user_ids:
+            return {'total_users': 0, 'queued': False}
+        
+        if async_send:
+            from .tasks import send_bulk_notification_task
+            # Callers may be inside a transaction that is rolled back; the ID is known before sending
+            task_id = uuid()
+            transaction.on_commit(lambda: send_bulk_notification_task.apply_async(
+                kwargs={
+                    'user_ids': user_ids,
+                    'notification_type': notification_type,
+                    'data': data,
+                    'title': title,
+                    'body': body,
+                    'send_push': send_push,
+                    'save_to_db': save_to_db
+                },
+                task_id=task_id
+            ))
+            return {'total_users': len(user_ids), 'queued': True, 'task_id': task_id}
+        
+        return NotificationService.send_bulk(
+            user_ids=user_ids,
+            notification_type=notification_type,
+            data=data,
+            title=title,
+            body=body,
+            send_push=send_push,
+            save_to_db=save_to_db
+        )
     
     @staticmethod
     def send_to_admins(
@@ -196,7 +355,8 @@ class NotificationService:
         title: str = None,
         body: str = None,
         send_push: bool = True,
-        save_to_db: bool = True
+        save_to_db: bool = True,
+        async_send: bool = True
     ) -> Dict[str, Any]:
         """
         Send notification to all admin users
@@ -208,21 +368,182 @@ class NotificationService:
             body: Push notification body
             send_push: Whether to send push notifications
             save_to_db: Whether to save to database
+            async_send: Whether to send via Celery (notifications queue, after commit)
             
         Returns:
-            Dict with results
+            Dict with results (see send_to_multiple_users)
         """
-        admin_users = User.objects.filter(role='admin')
+        admin_ids = list(User.objects.filter(role='admin').values_list('id', flat=True))
         return NotificationService.send_to_multiple_users(
-            users=list(admin_users),
+            users=admin_ids,
             notification_type=notification_type,
             data=data,
             title=title,
             body=body,
             send_push=send_push,
-            save_to_db=save_to_db
+            save_to_db=save_to_db,
+            async_send=async_send
         )
     
+    @staticmethod
+    def send_digest(user: User, notification_type: str, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Send notifications buffered by NotificationDigest
+        
+        A single item is sent as is; several are rolled into one grouped
+        notification (data: digest, count, items) with one push.
+        
+        Args:
+            user: Target user
+            notification_type: Type of buffered notifications
+            items: Buffered {'data', 'title', 'body', 'created_at'} (oldest first)
+            
+        Returns:
+            Dict with results of send_notification
+        """
+        if len(items) == 1:
+            item = items[0]
+            return NotificationService.send_notification(
+                user, notification_type, data=item['data'], title=item['title'], body=item['body'], coalesce=False
+            )
+        
+        max_items = settings.NOTIFICATION_DIGEST_MAX_ITEMS
+        return NotificationService.send_notification(
+            user,
+            notification_type,
+            data={
+                'digest': True,
+                'count': len(items),
+                'items': [{'data': item['data'], 'created_at': item['created_at']} for item in items[-max_items:]]
+            },
+            title=f"{NotificationService._get_default_title(notification_type)} ({len(items)})",
+            body=f"You have {len(items)} new notifications",
+            coalesce=False
+        )
+    
+    @staticmethod
+    def broadcast(
+        topic: str,
+        notification_type: str = 'Announcement',
+        data: Dict[str, Any] = None,
+        title: str = None,
+        body: str = None,
+        created_by: User = None
+    ) -> NotificationBroadcast:
+        """
+        Send one notification to all devices subscribed to an FCM topic
+        
+        One topic message replaces per-user sends; in-app notifications are
+        created when recipients open their inbox (materialize_broadcasts).
+        
+        Args:
+            topic: FCM topic (see NotificationTopics)
+            notification_type: Type of notification
+            data: Additional data for the notification
+            title: Push notification title
+            body: Push notification body
+            created_by: Sender
+            
+        Returns:
+            Saved broadcast (push is sent by a Celery task after commit)
+        """
+        from .tasks import send_broadcast_task
+        
+        broadcast = NotificationBroadcast.objects.create(
+            topic=topic,
+            notification_type=notification_type,
+            title=title or NotificationService._get_default_title(notification_type),
+            body=body or NotificationService._get_default_body(notification_type),
+            data=data or {},
+            created_by=created_by
+        )
+        transaction.on_commit(lambda: send_broadcast_task.delay(broadcast.id))
+        logger.info(f"Broadcast {broadcast.id} to {topic} queued")
+        return broadcast
+    
+    @staticmethod
+    def broadcast_to_role(role: str, **kwargs) -> NotificationBroadcast:
+        """Broadcast to all users with the role"""
+        return NotificationService.broadcast(notification_topics.role_topic(role), **kwargs)
+    
+    @staticmethod
+    def broadcast_to_service(service_id: int, **kwargs) -> NotificationBroadcast:
+        """Broadcast to the provider and customers of a service"""
+        return NotificationService.broadcast(notification_topics.service_topic(service_id), **kwargs)
+    
+    @staticmethod
+    def send_broadcast_push(broadcast_id: int) -> bool:
+        """Send topic message of a broadcast (at most once)"""
+        if not NotificationBroadcast.objects.filter(id=broadcast_id, push_sent=False).update(push_sent=True):
+            return False
+        
+        broadcast = NotificationBroadcast.objects.get(id=broadcast_id)
+        push_data = NotificationService._get_push_data(
+            broadcast.notification_type, None, {**broadcast.data, 'broadcast_id': broadcast.id}
+        )
+        success, response = firebase_service.send_to_topic(broadcast.topic, broadcast.title, broadcast.body, push_data)
+        if not success:
+            NotificationBroadcast.objects.filter(id=broadcast_id).update(push_sent=False)
+            raise RuntimeError(response)
+        return True
+    
+    @staticmethod
+    def materialize_broadcasts(user: User) -> int:
+        """
+        Create inbox notifications of broadcasts the user has not seen yet
+        
+        Called when the user opens the inbox. Only broadcasts to the user's
+        current topics, sent after they joined and within the retention
+        window are materialized. Broadcasts younger than
+        NOTIFICATION_BROADCAST_COMMIT_LAG_SECONDS are left for a later call:
+        one with a lower ID may still be committing, and the cursor would
+        pass it.
+        
+        Args:
+            user: Inbox owner
+            
+        Returns:
+            Number of created notifications
+        """
+        cursor, _ = NotificationBroadcastCursor.objects.get_or_create(user=user)
+        settled_before = timezone.now() - timedelta(seconds=settings.NOTIFICATION_BROADCAST_COMMIT_LAG_SECONDS)
+        last_broadcast_id = NotificationBroadcast.objects.filter(
+            created_at__lt=settled_before
+        ).aggregate(last_id=Max('id'))['last_id']
+        if not last_broadcast_id or last_broadcast_id <= cursor.last_broadcast_id:
+            return 0
+        
+        since = max(user.date_joined, timezone.now() - timedelta(days=settings.NOTIFICATION_RETENTION_DAYS))
+        matching = list(NotificationBroadcast.objects.filter(
+            topic__in=notification_topics.topics_for_user(user),
+            id__gt=cursor.last_broadcast_id,
+            id__lte=last_broadcast_id,
+            created_at__gte=since
+        ).order_by('id').only('id', 'notification_type', 'data', 'created_at'))
+        
+        with transaction.atomic():
+            # Compare-and-set: a concurrent request may have materialized them already
+            moved = NotificationBroadcastCursor.objects.filter(
+                user=user,
+                last_broadcast_id=cursor.last_broadcast_id
+            ).update(last_broadcast_id=last_broadcast_id)
+            if not moved or not matching:
+                return 0
+            
+            # Inbox order follows broadcast time
+            notifications = Notification.objects.bulk_create([
+                Notification(
+                    user=user,
+                    notification_type=broadcast.notification_type,
+                    data={**broadcast.data, 'broadcast_id': broadcast.id},
+                    created_at=broadcast.created_at
+                )
+                for broadcast in matching
+            ])
+            transaction.on_commit(lambda: unread_counter.add([user.id], len(notifications)))
+        
+        return len(notifications)
+    
     @staticmethod
     def register_fcm_token(user: User, token: str, device_type: str = 'web') -> bool:
         """
@@ -237,7 +558,15 @@ class NotificationService:
             True if successful, False otherwise
         """
         try:
+            from .tasks import sync_topic_subscriptions_task, unsubscribe_topics_task
+            
             with transaction.atomic():
+                replaced_tokens = list(UserFCMToken.objects.filter(
+                    user=user,
+                    device_type=device_type,
+                    is_active=True
+                ).exclude(token=token).values_list('token', flat=True))
+                
                 # Deactivate old tokens for this user and device type
                 UserFCMToken.objects.filter(
                     user=user,
@@ -254,6 +583,11 @@ class NotificationService:
                     }
                 )
                 
+                # Topic subscriptions follow the active tokens
+                transaction.on_commit(lambda: sync_topic_subscriptions_task.delay(user.id))
+                if replaced_tokens:
+                    transaction.on_commit(lambda: unsubscribe_topics_task.delay(user.id, replaced_tokens))
+                
                 logger.info(f"FCM token {'created' if created else 'updated'} for user {user.username}")
                 return True
                 
@@ -273,13 +607,31 @@ class NotificationService:
             True if successful, False otherwise
         """
         try:
+            from .tasks import unsubscribe_topics_task
+            
+            fcm_token = UserFCMToken.objects.filter(token=token).first()
             UserFCMToken.objects.filter(token=token).update(is_active=False)
+            if fcm_token:
+                transaction.on_commit(lambda: unsubscribe_topics_task.delay(fcm_token.user_id, [token]))
             logger.info(f"FCM token unregistered: {token}")
             return True
         except Exception as e:
             logger.error(f"Failed to unregister FCM token: {e}")
             return False
     
+    @staticmethod
+    def _get_push_data(notification_type: str, notification_id: Optional[int], data: Dict[str, Any] = None) -> Dict[str, str]:
+        """FCM data payload (values must be strings; nested values stay in the in-app notification)"""
+        push_data = {
+            'notification_type': notification_type,
+            'notification_id': notification_id,
+            **(data or {})
+        }
+        return {
+            key: str(value) for key, value in push_data.items()
+            if value is not None and not isinstance(value, (dict, list))
+        }
+    
     @staticmethod
     def _get_default_title(notification_type: str) -> str:
         """Get default title for notification type"""
@@ -293,6 +645,7 @@ class NotificationService:
             'Welcome': 'Welcome!',
             'EmailVerified': 'Email Verified',
             'PasswordReset': 'Password Reset',
+            'Announcement': 'Announcement',
         }
         return titles.get(notification_type, 'Notification')
     
@@ -309,6 +662,7 @@ class NotificationService:
             'Welcome': 'Welcome to our platform!',
             'EmailVerified': 'Your email has been verified successfully',
             'PasswordReset': 'Password reset instructions sent',
+            'Announcement': 'You have a new announcement',
         }
         return bodies.get(notification_type, 'You have a new notification')
 
@@ -0,0 +1,152 @@
+from celery import shared_task
+from .delivery import push_delivery
+from .service import notification_service
+from .topics import notification_topics
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def deliver_push_task(messages, title, body, attempt=0):
+    """
+    Celery task for sending push messages
+    
+    Failed messages are retried per token by new tasks with exponential
+    backoff, so this task itself never retries (it would resend the whole
+    batch).
+    """
+    return push_delivery.send(messages, title, body, attempt=attempt)
+
+
+@shared_task(bind=True, max_retries=3)
+def send_bulk_notification_task(self, user_ids, notification_type, data=None, title=None, body=None,
+                                 send_push=True, save_to_db=True, idempotency_prefix=None, coalesce=True,
+                                 saved=None):
+    """
+    Celery task for sending one notification to many users
+    
+    Users inside a digest window are buffered once, before the first
+    attempt; retries get the remaining users of the list left after that.
+    Progress is reported as PROGRESS state with {'done', 'total'} after every
+    chunk. On failure only users of unfinished chunks are retried; rows the
+    failed chunk already created are reused (saved) and its pushes carry the
+    same idempotency keys, so nobody gets the notification twice.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    total_users = len(user_ids)
+    if coalesce:
+        user_ids = notification_service.coalesce_recipients(
+            user_ids, notification_type, data, title, body, send_push, save_to_db
+        )
+    # Passed on to retries, so pushes sent before a failure are not sent again
+    idempotency_prefix = idempotency_prefix or push_delivery.new_key_prefix()
+    processed = 0
+    # [user ID, notification ID] pairs (JSON has no int keys) of rows of the unfinished chunk
+    saved_chunk = saved or []
+    
+    def record_saved(notification_ids):
+        nonlocal saved_chunk
+        saved_chunk = [[user_id, notification_id] for user_id, notification_id in notification_ids.items()]
+    
+    def progress(done, total):
+        nonlocal processed, saved_chunk
+        processed = done
+        saved_chunk = []
+        if not self.request.id:
+            return
+        try:
+            self.update_state(state='PROGRESS', meta={'done': done, 'total': total})
+        except Exception as e:
+            # Progress is informational - never fail the delivery because of it
+            logger.warning(f"Failed to report bulk notification progress: {e}")
+    
+    try:
+        result = notification_service.send_bulk(
+            user_ids=user_ids,
+            notification_type=notification_type,
+            data=data,
+            title=title,
+            body=body,
+            send_push=send_push,
+            save_to_db=save_to_db,
+            progress=progress,
+            idempotency_prefix=idempotency_prefix,
+            coalesce=False,
+            saved={user_id: notification_id for user_id, notification_id in saved or []},
+            on_saved=record_saved
+        )
+        result['total_users'] = total_users
+        result['coalesced'] = total_users - len(user_ids)
+        return result
+    except Exception as e:
+        logger.error(f"Bulk notification {notification_type} failed after {processed} of {len(user_ids)} users: {e}")
+        if self.request.retries < self.max_retries:
+            raise self.retry(
+                countdown=30,
+                exc=e,
+                kwargs={
+                    'user_ids': user_ids[processed:],
+                    'notification_type': notification_type,
+                    'data': data,
+                    'title': title,
+                    'body': body,
+                    'send_push': send_push,
+                    'save_to_db': save_to_db,
+                    'idempotency_prefix': idempotency_prefix,
+                    'coalesce': False,
+                    'saved': saved_chunk
+                }
+            )
+        raise
+
+
+@shared_task(bind=True, max_retries=3)
+def send_broadcast_task(self, broadcast_id):
+    """Celery task for sending the topic message of a broadcast"""
+    try:
+        sent = notification_service.send_broadcast_push(broadcast_id)
+        return f"Broadcast {broadcast_id} {'sent' if sent else 'already sent'}"
+    except Exception as e:
+        logger.error(f"Failed to send broadcast {broadcast_id}: {e}")
+        if self.request.retries < self.max_retries:
+            raise self.retry(countdown=30 * 2 ** self.request.retries, exc=e)
+        return f"Broadcast {broadcast_id} failed: {str(e)}"
+
+
+@shared_task
+def sync_topic_subscriptions_task(user_id):
+    """Subscribe user's active tokens to their role and service topics"""
+    from apps.authentication.models import User
+    
+    user = User.objects.filter(id=user_id).first()
+    if not user:
+        return f"User {user_id} not found"
+    result = notification_topics.sync_user(user)
+    return f"Synced {result['tokens']} tokens of user {user_id} to {len(result['subscribed'])} topics"
+
+
+@shared_task
+def unsubscribe_topics_task(user_id, tokens):
+    """Remove replaced or unregistered tokens from all topics of the user"""
+    from apps.authentication.models import User
+    
+    user = User.objects.filter(id=user_id).first()
+    topics = notification_topics.topics_for_user(user) if user else []
+    topics += [notification_topics.role_topic(role) for role, name in User.ROLE_CHOICES]
+    notification_topics.unsubscribe(tokens, list(dict.fromkeys(topics)))
+    return f"Unsubscribed {len(tokens)} tokens from {len(topics)} topics"
+
+
+@shared_task
+def flush_notification_digest_task(user_id, notification_type):
+    """Send notifications buffered for the user during a digest window"""
+    from apps.authentication.models import User
+    from .digest import notification_digest
+    
+    items = notification_digest.take(user_id, notification_type)
+    user = User.objects.filter(id=user_id).first()
+    if not items or not user:
+        return f"No {notification_type} digest for user {user_id}"
+    notification_service.send_digest(user, notification_type, items)
+    return f"Sent {notification_type} digest of {len(items)} notifications to user {user_id}"
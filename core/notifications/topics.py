@@ -0,0 +1,75 @@
+import logging
+from typing import List, Dict, Any
+from django.conf import settings
+from apps.authentication.models import User, UserFCMToken
+from core.firebase.service import firebase_service
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationTopics:
+    """
+    FCM topic subscriptions of user devices
+
+    Every active token is subscribed to the topic of its user's role and to
+    the topics of services the user provides or has booked, so one topic
+    message reaches a whole audience. Subscriptions are synced when tokens
+    are registered and bookings created (see tasks); sync_notification_topics
+    re-syncs everything, e.g. after role changes.
+    """
+
+    @staticmethod
+    def role_topic(role: str) -> str:
+        return f"{settings.NOTIFICATION_TOPIC_PREFIX}-role-{role}"
+
+    @staticmethod
+    def service_topic(service_id: int) -> str:
+        return f"{settings.NOTIFICATION_TOPIC_PREFIX}-service-{service_id}"
+
+    def topics_for_user(self, user: User) -> List[str]:
+        """Topics the user's devices should be subscribed to"""
+        from apps.bookings.models import Booking
+        from apps.services.models import Service
+
+        service_ids = set(Service.objects.filter(provider=user).values_list('id', flat=True))
+        service_ids.update(
+            Booking.objects.filter(customer=user).exclude(status='cancelled').values_list('service_id', flat=True)
+        )
+        return [self.role_topic(user.role)] + [self.service_topic(service_id) for service_id in sorted(service_ids)]
+
+    def sync_user(self, user: User) -> Dict[str, Any]:
+        """
+        Subscribe user's active tokens to their topics and remove them from
+        the topics of other roles (the role may have changed)
+        """
+        tokens = list(UserFCMToken.objects.filter(user=user, is_active=True).values_list('token', flat=True))
+        result = {'tokens': len(tokens), 'subscribed': [], 'failed': 0}
+        if not tokens:
+            return result
+
+        for topic in self.topics_for_user(user):
+            success, response = firebase_service.subscribe_to_topic(tokens, topic)
+            if success:
+                result['subscribed'].append(topic)
+                result['failed'] += response
+            else:
+                logger.error(f"Failed to subscribe user {user.id} to {topic}: {response}")
+
+        other_roles = [role for role, name in User.ROLE_CHOICES if role != user.role]
+        self.unsubscribe(tokens, [self.role_topic(role) for role in other_roles])
+        return result
+
+    def subscribe(self, tokens: List[str], topics: List[str]):
+        for topic in topics:
+            success, response = firebase_service.subscribe_to_topic(tokens, topic)
+            if not success:
+                logger.error(f"Failed to subscribe {len(tokens)} tokens to {topic}: {response}")
+
+    def unsubscribe(self, tokens: List[str], topics: List[str]):
+        for topic in topics:
+            success, response = firebase_service.unsubscribe_from_topic(tokens, topic)
+            if not success:
+                logger.error(f"Failed to unsubscribe {len(tokens)} tokens from {topic}: {response}")
+
+
+notification_topics = NotificationTopics()
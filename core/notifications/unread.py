@@ -0,0 +1,206 @@
+import json
+import logging
+import uuid
+from typing import Dict, Iterable, Optional
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from redis.exceptions import RedisError
+from core.redis.client import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+# Change warm counters; while a cold one is being counted, collect the change for the load.
+# The TTL is not refreshed, so a counter that drifted is counted again when it expires.
+INCR_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    if redis.call('EXISTS', KEYS[2]) == 1 then
+        redis.call('HINCRBY', KEYS[2], 'delta', ARGV[1])
+    end
+    return false
+end
+local value = redis.call('INCRBY', KEYS[1], ARGV[1])
+if value < 0 then
+    redis.call('INCRBY', KEYS[1], -value)
+    value = 0
+end
+return value
+"""
+
+# Mark a cold counter as loading (one loader at a time)
+LOAD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 or redis.call('EXISTS', KEYS[2]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[2], 'token', ARGV[1], 'delta', 0)
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+return 1
+"""
+
+# Store the database count plus changes made during the load, if the load is still current
+STORE_SCRIPT = """
+if redis.call('HGET', KEYS[2], 'token') ~= ARGV[1] then
+    return false
+end
+local value = tonumber(ARGV[2]) + tonumber(redis.call('HGET', KEYS[2], 'delta'))
+if value < 0 then
+    value = 0
+end
+redis.call('SET', KEYS[1], value, 'EX', ARGV[3])
+redis.call('DEL', KEYS[2])
+return value
+"""
+
+
+def notifications_group(user_id):
+    """Channel layer group of the user's notification WebSockets"""
+    return f'notifications_{user_id}'
+
+
+def unread_count_frame(count):
+    return {'type': 'unread_count', 'unread_count': count}
+
+
+class UnreadCounter:
+    """
+    Per-user number of unread notifications, denormalized into Redis.
+
+    A counter is loaded from the database (index on user, is_read) on the
+    first read and then moved by INCRBY as notifications are created, read
+    and deleted, so polling clients don't run COUNT(*). Every change is
+    pushed to the user's notification WebSockets. Redis failures fall back
+    to counting in the database; a counter that may have drifted is
+    dropped and counted again on the next read.
+
+    A cold counter is marked as loading before it is counted: changes made
+    meanwhile are collected on the marker and added to the count when it is
+    stored, so they are not lost.
+    """
+
+    # Seconds a load may take before its changes are given up
+    LOAD_TIMEOUT = 30
+
+    def __init__(self):
+        self._incr = None
+        self._load = None
+        self._store = None
+
+    @property
+    def ttl(self):
+        return settings.NOTIFICATION_UNREAD_COUNT_TTL
+
+    def _key(self, user_id):
+        return f'notifications:unread:{user_id}'
+
+    def _keys(self, user_id):
+        return [self._key(user_id), f'notifications:unread:{user_id}:loading']
+
+    @staticmethod
+    def count_from_db(user_id) -> int:
+        from apps.notifications.models import Notification
+        return Notification.objects.filter(user_id=user_id, is_read=False).count()
+
+    def get(self, user_id) -> int:
+        """Unread notifications of the user"""
+        try:
+            value = redis_client.get(self._key(user_id))
+        except RedisError as e:
+            logger.warning(f"Unread counter unavailable: {e}")
+            return self.count_from_db(user_id)
+        if value is not None:
+            return int(value)
+
+        token = uuid.uuid4().hex
+        try:
+            if self._load is None:
+                self._load = redis_client.register_script(LOAD_SCRIPT)
+            loading = self._load(keys=self._keys(user_id), args=[token, self.LOAD_TIMEOUT])
+        except RedisError as e:
+            logger.warning(f"Unread counter unavailable: {e}")
+            return self.count_from_db(user_id)
+
+        count = self.count_from_db(user_id)
+        if not loading:
+            # Another request is loading it (or has just stored it)
+            return count
+        try:
+            if self._store is None:
+                self._store = redis_client.register_script(STORE_SCRIPT)
+            value = self._store(keys=self._keys(user_id), args=[token, count, self.ttl])
+        except RedisError as e:
+            logger.warning(f"Failed to store unread counter of user {user_id}: {e}")
+            return count
+        return int(value) if value is not None else count
+
+    def add(self, user_ids: Iterable[int], amount: int = 1, notify: bool = True) -> Dict[int, Optional[int]]:
+        """
+        Move counters of users by amount (negative to decrease) in one round
+        trip. Returns map user_id -> new value (None for cold counters).
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        try:
+            if self._incr is None:
+                self._incr = redis_client.register_script(INCR_SCRIPT)
+            pipe = redis_client.pipeline(transaction=False)
+            for user_id in user_ids:
+                self._incr(keys=self._keys(user_id), args=[amount], client=pipe)
+            values = dict(zip(user_ids, pipe.execute()))
+        except RedisError as e:
+            logger.warning(f"Failed to update unread counters: {e}")
+            self.invalidate(user_ids)
+            return {}
+
+        if notify:
+            self.publish({user_id: value for user_id, value in values.items() if value is not None})
+        return values
+
+    def reset(self, user_id, notify: bool = True):
+        """User has no unread notifications left"""
+        try:
+            redis_client.set(self._key(user_id), 0, ex=self.ttl)
+        except RedisError as e:
+            logger.warning(f"Failed to reset unread counter of user {user_id}: {e}")
+            self.invalidate([user_id])
+        if notify:
+            self.publish({user_id: 0})
+
+    def refresh(self, user_id, notify: bool = True) -> int:
+        """Count again from the database (after changes that can't be tracked by amount)"""
+        self.invalidate([user_id])
+        count = self.get(user_id)
+        if notify:
+            self.publish({user_id: count})
+        return count
+
+    def invalidate(self, user_ids: Iterable[int]):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        try:
+            # Loads in progress may have read the old state: their results are dropped too
+            redis_client.delete(*[key for user_id in user_ids for key in self._keys(user_id)])
+        except RedisError as e:
+            logger.error(f"Failed to invalidate unread counters: {e}")
+
+    @staticmethod
+    def publish(counts: Dict[int, int]):
+        """Send new counters to the users' notification WebSockets"""
+        if not counts:
+            return
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        try:
+            for user_id, count in counts.items():
+                async_to_sync(channel_layer.group_send)(notifications_group(user_id), {
+                    'type': 'notification.frame',
+                    'text': json.dumps(unread_count_frame(count))
+                })
+        except Exception as e:
+            logger.warning(f"Failed to publish unread counters: {e}")
+
+
+unread_counter = UnreadCounter()
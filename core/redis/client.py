@@ -0,0 +1,28 @@
+import redis
+from django.conf import settings
+
+
+class RedisClient:
+    """Shared Redis connection for application data (caches, buffers, counters)"""
+    
+    def __init__(self):
+        # redis-py connects lazily on the first command
+        self.client = redis.Redis(
+            host=settings.REDIS_HOST or 'redis',
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            password=settings.REDIS_PASSWORD or None,
+            decode_responses=True,
+            socket_connect_timeout=2,
+            socket_timeout=2,
+            health_check_interval=30
+        )
+    
+    def pipeline(self, transaction=True):
+        return self.client.pipeline(transaction=transaction)
+    
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+redis_client = RedisClient()